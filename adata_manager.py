@@ -0,0 +1,268 @@
+# adata_manager.py - Versão async do data_manager.py (modo ASGI)
+#
+# Mesmas funções e mesma semântica; o SQL vem dos statements registrados em
+# data_manager.py e rollups.py, então os dois modos não divergem.
+
+import uuid
+import asyncio
+
+from adb import query, read_query, transaction, in_transaction, after_commit
+from db import pin_primary
+import cache
+import rollups
+import sessions
+import dashboard as dashboard_data
+import data_manager as dm
+from data_manager import (
+    CACHED_COLLECTIONS, VERSIONED_COLLECTIONS, MAX_PAGE_SIZE,
+    _cache_key, _list_query, _search_params, _table_statement, encode_cursor, invalidate_cache,
+)
+
+# Funções auxiliares de Autenticação (Users)
+
+async def find_user_by_username(username):
+    results = await read_query(dm.FIND_USER_BY_USERNAME, (username,))
+    if not results:
+        # Conta recém-criada pode ainda não ter chegado à réplica (login logo após o registro)
+        results = await query(dm.FIND_USER_BY_USERNAME, (username,))
+    return results[0] if results else None
+
+async def create_user(username, password_hash):
+    new_id = str(uuid.uuid4())
+    await query(dm.CREATE_USER, (new_id, username, password_hash))
+    return {'id': new_id, 'username': username}
+
+async def update_password_hash(user_id, password_hash):
+    await query(dm.UPDATE_PASSWORD_HASH, (password_hash, user_id))
+
+# Sessões (mesmos statements e regras de sessions.py)
+
+async def create_session(user_id):
+    sid, jti, params = sessions.new_session(user_id)
+    await query(sessions.CREATE_SESSION, params)
+    return sid, jti
+
+async def rotate_session(sid, user_id, jti):
+    new_jti, params = sessions.rotate_params(sid, user_id, jti)
+    if await query(sessions.ROTATE_SESSION, params):
+        return new_jti
+    session = await query(sessions.FIND_SESSION, (sid,))
+    if sessions.reused(session, user_id):
+        await revoke_session(sid, user_id)
+        print(f"Aviso: refresh token reutilizado na sessão {sid}; sessão revogada.")
+    raise sessions.SessionInvalid()
+
+async def revoke_session(sid, user_id):
+    async with transaction():
+        version = (await query(sessions.BUMP_REVOCATION_VERSION))[0]['version']
+        revoked = await query(sessions.REVOKE_SESSION, (sessions.utcnow(), version, sid, user_id))
+    sessions.deny(row['id'] for row in revoked or [])
+    return bool(revoked)
+
+async def revoke_user_sessions(user_id):
+    now = sessions.utcnow()
+    async with transaction():
+        version = (await query(sessions.BUMP_REVOCATION_VERSION))[0]['version']
+        revoked = await query(sessions.REVOKE_USER_SESSIONS, (now, version, user_id, now))
+    sessions.deny(row['id'] for row in revoked or [])
+    return len(revoked or [])
+
+async def is_session_revoked(sid):
+    """Versão async de sessions.is_revoked (deny set do processo)."""
+    if sessions.claim_sync():
+        try:
+            version = (await query(sessions.REVOCATION_VERSION))[0]['version']
+            since = sessions.pending_since(version)
+            if since is not None:
+                rows = await query(sessions.REVOKED_SINCE, (since, sessions.utcnow()))
+                sessions.apply_revoked(version, rows, since)
+        except Exception as e:
+            print(f"Aviso: falha ao sincronizar sessões revogadas: {e}")
+        finally:
+            sessions.release_sync()
+    return sessions.denied(sid)
+
+# --- Funções CRUD Genéricas ---
+
+async def find_page(table_name, user_id, filters=None, limit=None, cursor=None):
+    stmt, params, spec = _list_query(table_name, user_id, filters, cursor, limit is not None)
+    if limit is not None:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        params.append(limit + 1)
+
+    items = await read_query(stmt, tuple(params), user_id)
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last[spec['sort']], last['id'])
+    return items, next_cursor
+
+async def search_transactions(user_id, term, limit=None, cursor=None):
+    params, limit, offset, term = _search_params(user_id, term, limit, cursor)
+    items = await query(dm.SEARCH_TRANSACTIONS, params)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(offset + limit, term)
+    return items, next_cursor
+
+async def find_all(table_name, user_id, order_by='id', filters=None, limit=None, cursor=None):
+    if filters or limit is not None or cursor:
+        return (await find_page(table_name, user_id, filters, limit, cursor))[0]
+    stmt = _table_statement(table_name, 'find_all', order_by)
+    if order_by in CACHED_COLLECTIONS.get(table_name, ()) and not in_transaction():
+        return await cache.aget_or_load(
+            _cache_key(table_name, user_id, order_by),
+            lambda: query(stmt, (user_id,))
+        )
+    return await read_query(stmt, (user_id,), user_id)
+
+async def find_by_id(table_name, item_id, user_id):
+    results = await read_query(_table_statement(table_name, 'find_by_id'), (item_id, user_id), user_id)
+    return results[0] if results else None
+
+async def delete(table_name, item_id, user_id):
+    async with transaction():
+        results = await query(_table_statement(table_name, 'delete'), (item_id, user_id))
+        if table_name == 'transactions':
+            for row in results:
+                await _rollup_remove(row)
+        for row in results:
+            await record_tombstone(table_name, row['id'], user_id)
+        if results:
+            await record_change(table_name, user_id)
+    return len(results) > 0
+
+# --- Versões por coleção / rollups ---
+
+async def get_version(collection, user_id):
+    results = await query(dm.GET_VERSION, (user_id, collection))
+    return results[0]['version'] if results else 0
+
+async def record_change(collection, user_id):
+    pin_primary(user_id)
+    if collection not in VERSIONED_COLLECTIONS:
+        return
+    after_commit(lambda: invalidate_cache(collection, user_id))
+    await query(dm.BUMP_VERSION, (user_id, collection))
+
+async def next_change_seq(user_id, count=1):
+    return (await query(dm.RESERVE_CHANGE_SEQ, (user_id, count)))[0]['seq']
+
+async def record_tombstone(collection, item_id, user_id):
+    await query(dm.RECORD_TOMBSTONE, (user_id, collection, item_id, await next_change_seq(user_id)))
+
+async def _rollup_add(row):
+    upsert_params, _ = rollups.delta_params(row, 1)
+    await query(rollups.UPSERT, upsert_params)
+
+async def _rollup_remove(row):
+    upsert_params, bucket = rollups.delta_params(row, -1)
+    await query(rollups.UPSERT, upsert_params)
+    await query(rollups.PRUNE, bucket)
+
+async def summary(user_id, date_from=None, date_to=None, group='month'):
+    stmt, params = rollups.summary_query(user_id, date_from, date_to, group)
+    return await query(stmt, params)
+
+# --- Implementação CRUD Específica ---
+
+# Transações
+async def create_transaction(item, user_id):
+    new_id = str(uuid.uuid4())
+    params = (new_id, user_id, item['date'], item['description'], item['category'], item['type'], item['amount'])
+    async with transaction():
+        created = (await query(dm.CREATE_TRANSACTION, params + (await next_change_seq(user_id),)))[0]
+        await _rollup_add(created)
+        await record_change('transactions', user_id)
+    return created
+
+async def update_transaction(item_id, item, user_id):
+    params = (item['date'], item['description'], item['category'], item['type'], item['amount'])
+    async with transaction():
+        previous = await query(dm.LOCK_TRANSACTION, (item_id, user_id))
+        if not previous:
+            return None
+        seq = await next_change_seq(user_id)
+        results = await query(dm.UPDATE_TRANSACTION, params + (seq, item_id, user_id))
+        await _rollup_remove(previous[0])
+        await _rollup_add(results[0])
+        await record_change('transactions', user_id)
+    return results[0]
+
+# Metas
+async def create_goal(item, user_id):
+    new_id = str(uuid.uuid4())
+    params = (new_id, user_id, item['name'], item['amount'], item.get('saved', 0), item['target_date'])
+    async with transaction():
+        created = (await query(dm.CREATE_GOAL, params + (await next_change_seq(user_id),)))[0]
+        await record_change('goals', user_id)
+    return created
+
+async def update_goal(item_id, item, user_id):
+    target_date_clean = item['target_date'].split('T')[0] if 'T' in item['target_date'] else item['target_date']
+    params = (item['name'], item['amount'], item['saved'], target_date_clean)
+    async with transaction():
+        if not await query(dm.LOCK_GOAL, (item_id, user_id)):
+            return None
+        seq = await next_change_seq(user_id)
+        results = await query(dm.UPDATE_GOAL, params + (seq, item_id, user_id))
+        await record_change('goals', user_id)
+    return results[0]
+
+# Contas (Bills)
+async def create_bill(item, user_id):
+    new_id = str(uuid.uuid4())
+    params = (new_id, user_id, item['description'], item['amount'], item['due_date'], item.get('paid', False))
+    async with transaction():
+        created = (await query(dm.CREATE_BILL, params + (await next_change_seq(user_id),)))[0]
+        await record_change('bills', user_id)
+    return created
+
+async def update_bill(item_id, item, user_id):
+    params = (item['description'], item['amount'], item['due_date'], item['paid'])
+    async with transaction():
+        if not await query(dm.LOCK_BILL, (item_id, user_id)):
+            return None
+        seq = await next_change_seq(user_id)
+        results = await query(dm.UPDATE_BILL, params + (seq, item_id, user_id))
+        await record_change('bills', user_id)
+    return results[0]
+
+# Categorias
+async def find_all_categories(user_id):
+    return await find_all('categories', user_id, order_by='name')
+
+async def find_categories_or_defaults(user_id):
+    """Mesmo que data_manager.find_categories_or_defaults."""
+    categories = await find_all_categories(user_id)
+    if categories:
+        return categories
+    async with transaction():
+        await next_change_seq(user_id, 0)
+        if not await query(dm.HAS_CATEGORIES, (user_id,)):
+            for name in dm.DEFAULT_CATEGORIES:
+                await create_category(name, user_id)
+    return await find_all_categories(user_id)
+
+async def find_category_by_name(name, user_id):
+    results = await query(dm.FIND_CATEGORY_BY_NAME, (user_id, name))
+    return results[0] if results else None
+
+async def create_category(name, user_id):
+    new_id = str(uuid.uuid4())
+    async with transaction():
+        seq = await next_change_seq(user_id)
+        created = (await query(dm.CREATE_CATEGORY, (new_id, user_id, name, seq)))[0]
+        await record_change('categories', user_id)
+    return created
+
+# Dashboard (mesmas consultas de dashboard.load, concorrentes no event loop)
+async def dashboard(user_id):
+    return dashboard_data.build(*await asyncio.gather(
+        find_page('transactions', user_id, limit=dashboard_data.DASHBOARD_TRANSACTIONS),
+        find_all('goals', user_id),
+        find_page('bills', user_id, dashboard_data.bills_filters(), limit=dashboard_data.DASHBOARD_BILLS),
+        find_categories_or_defaults(user_id),
+    ))
@@ -0,0 +1,188 @@
+# adb.py - Versão async do db.py (modo ASGI, ver asgi.py)
+#
+# Usa psycopg 3 (AsyncConnectionPool) com as mesmas variáveis de ambiente do
+# pool síncrono. Os Statement do registro de db.py são reaproveitados: o texto
+# usa os mesmos placeholders "%s" e o psycopg 3 faz o PREPARE no servidor.
+# read_query() usa as réplicas de DATABASE_REPLICA_URLS com as mesmas regras
+# de db.read_query (saúde, atraso e pin de primário vêm de db.py).
+#
+# Só Postgres: com DATABASE_URL=sqlite://... get_pool() falha e o modo async
+# não sobe (o SQLite não tem driver async aqui; use "gunicorn app:app").
+# Dependências opcionais: pip install -r requirements-async.txt
+
+import time
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+
+import metrics
+from db import (
+    DATABASE_URL, POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_TIMEOUT, POOL_MAX_LIFETIME,
+    REPLICA_POOL_MAX_SIZE, USE_PREPARED, BACKEND, Statement, _record_query,
+    get_replicas, _pick_replica, _pinned,
+)
+
+_pool = None
+_replica_pools = {}  # nome da réplica -> AsyncConnectionPool
+_pool_lock = asyncio.Lock()
+# Conexão da transação atual e callbacks pós-commit, por task
+_conn = contextvars.ContextVar('adb_conn', default=None)
+_callbacks = contextvars.ContextVar('adb_callbacks', default=None)
+
+
+async def _open_pool(dsn, min_size, max_size):
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+
+    pool = AsyncConnectionPool(
+        dsn,
+        min_size=min_size,
+        max_size=max_size,
+        timeout=POOL_TIMEOUT,
+        max_lifetime=POOL_MAX_LIFETIME,
+        check=AsyncConnectionPool.check_connection,
+        kwargs={'row_factory': dict_row},
+        open=False,
+    )
+    await pool.open()
+    return pool
+
+
+async def get_pool():
+    global _pool
+    if _pool is not None:
+        return _pool
+    if not DATABASE_URL:
+        raise Exception("DATABASE_URL não configurada no ambiente do Render.")
+    if BACKEND != 'postgres':
+        raise Exception("O modo async (asgi.py) só suporta o backend Postgres.")
+
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await _open_pool(DATABASE_URL, POOL_MIN_SIZE, POOL_MAX_SIZE)
+    return _pool
+
+
+async def _replica_pool(replica):
+    pool = _replica_pools.get(replica.name)
+    if pool is not None:
+        return pool
+    async with _pool_lock:
+        if replica.name not in _replica_pools:
+            _replica_pools[replica.name] = await _open_pool(replica.dsn, 0, REPLICA_POOL_MAX_SIZE)
+    return _replica_pools[replica.name]
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+    while _replica_pools:
+        _, pool = _replica_pools.popitem()
+        await pool.close()
+
+
+def pool_stats():
+    return dict(_pool.get_stats()) if _pool is not None else {}
+
+
+@asynccontextmanager
+async def transaction():
+    """Equivalente async de db.transaction(): uma conexão e um commit para o bloco."""
+    conn = _conn.get()
+    if conn is not None:
+        yield conn
+        return
+
+    pool = await get_pool()
+    callbacks = []
+    # pool.connection() faz commit ao sair sem erro e rollback se houver exceção
+    async with pool.connection() as conn:
+        conn_token = _conn.set(conn)
+        callbacks_token = _callbacks.set(callbacks)
+        try:
+            yield conn
+        finally:
+            _conn.reset(conn_token)
+            _callbacks.reset(callbacks_token)
+    for callback in callbacks:
+        callback()
+
+
+def in_transaction():
+    return _conn.get() is not None
+
+
+def after_commit(callback):
+    callbacks = _callbacks.get()
+    if callbacks is not None:
+        callbacks.append(callback)
+    else:
+        callback()
+
+
+async def _execute(conn, text, params):
+    async with conn.cursor() as cur:
+        if isinstance(text, Statement):
+            await cur.execute(text.text, params, prepare=USE_PREPARED)
+            returns_rows = text.returns_rows
+        else:
+            await cur.execute(text, params)
+            returns_rows = cur.description is not None
+        if returns_rows:
+            return await cur.fetchall()
+        return None
+
+
+async def query(text, params=None):
+    """Executa uma consulta e retorna a lista de dicionários (None sem linhas)."""
+    conn = _conn.get()
+    started = time.perf_counter()
+    try:
+        if conn is not None:
+            data = await _execute(conn, text, params)
+        else:
+            pool = await get_pool()
+            async with pool.connection() as conn:
+                data = await _execute(conn, text, params)
+    except Exception as e:
+        _record_query(text, started, failed=True)
+        raise Exception(f"Erro na consulta SQL: {e}")
+    _record_query(text, started, len(data) if data else 0)
+    return data
+
+
+def _replica_for(user_id):
+    if not get_replicas() or _pinned(user_id):
+        return None
+    return _pick_replica()
+
+
+async def read_query(text, params=None, user_id=None):
+    """Equivalente async de db.read_query (réplica se possível, senão o primário)."""
+    if _conn.get() is not None or not get_replicas():
+        return await query(text, params)
+    # O pin pode estar no Redis e a réplica pode medir o atraso agora: fora do event loop
+    replica = await asyncio.to_thread(_replica_for, user_id)
+    if replica is None:
+        return await query(text, params)
+
+    import psycopg
+    started = time.perf_counter()
+    try:
+        pool = await _replica_pool(replica)
+        async with pool.connection() as conn:
+            data = await _execute(conn, text, params)
+    except (psycopg.OperationalError, psycopg.InterfaceError) as e:
+        # Problema da réplica (queda, conflito com recovery, pool esgotado): tenta no primário
+        _record_query(text, started, failed=True)
+        replica.eject(str(e).strip())
+        return await query(text, params)
+    except Exception as e:
+        _record_query(text, started, failed=True)
+        raise Exception(f"Erro na consulta SQL: {e}")
+    _record_query(text, started, len(data) if data else 0)
+    replica.reads += 1
+    metrics.DB_REPLICA_READS.inc(replica.name)
+    return data
@@ -0,0 +1,230 @@
+# api.py - Regras das rotas comuns a app.py (Flask) e asgi.py (Quart)
+#
+# Leitura e validação dos parâmetros, mapeamento de erros, ETag, CORS e a
+# forma das respostas ficam aqui; cada front end faz só a E/S (data_manager
+# ou adata_manager) e devolve o que estas funções montam. Erros e respostas
+# prontas são tuplas (corpo, status[, headers]), que Flask e Quart aceitam do
+# mesmo jeito (como ratelimit.rejection).
+
+import os
+import hashlib
+
+import jwt
+from werkzeug.exceptions import HTTPException
+
+import db
+import cache
+import hashing
+import ratelimit
+import streaming
+import serialization
+from auth import SECRET_KEY
+from data_manager import _parse_date
+
+# CORS: flask_cors em app.py e finish_request em asgi.py usam as mesmas listas
+CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "Idempotency-Key", "If-None-Match"]
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", "ETag", "Content-Disposition", "X-Row-Count", "Retry-After"]
+
+# Mapeamento para o data_manager
+FILE_MAP = {
+    'transactions': 'transactions',
+    'goals': 'goals',
+    'bills': 'bills',
+    'categories': 'categories'
+}
+
+# Parâmetros de query aceitos nas listagens -> filtros do data_manager
+LIST_FILTER_ARGS = {
+    'from': 'date_from',
+    'to': 'date_to',
+    'min_amount': 'amount_min',
+    'max_amount': 'amount_max',
+    'category': 'category',
+    'type': 'type',
+    'paid': 'paid',
+}
+
+NOT_FOUND = {
+    'transactions': 'Transação não encontrada',
+    'goals': 'Meta não encontrada',
+    'bills': 'Conta não encontrada',
+    'categories': 'Categoria não encontrada',
+}
+DELETED = {
+    'transactions': 'Transação deletada com sucesso',
+    'goals': 'Meta deletada com sucesso',
+    'bills': 'Conta deletada com sucesso',
+    'categories': 'Categoria deletada com sucesso',
+}
+
+INVALID_VALUE = 'Valor fora do formato esperado (datas AAAA-MM-DD, valores numéricos).'
+
+
+def error(message, status, headers=None):
+    if headers:
+        return {'error': message}, status, headers
+    return {'error': message}, status
+
+
+# --- Parâmetros ---
+
+def parse_limit(value):
+    """?limit= como inteiro (None se ausente); ValueError se inválido."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        raise ValueError('Parâmetro "limit" inválido.')
+
+
+def list_args(req):
+    """(filtros, limit, cursor) de uma listagem a partir de req.args."""
+    filters = {}
+    for arg, key in LIST_FILTER_ARGS.items():
+        value = req.args.get(arg)
+        if value is None or value == '':
+            continue
+        if key == 'paid':
+            value = value.lower() in ('1', 'true', 'yes')
+        filters[key] = value
+    return filters, parse_limit(req.args.get('limit')), req.args.get('cursor')
+
+
+def search_args(req):
+    """(termo, limit, cursor) de GET /api/transactions/search."""
+    return req.args.get('q'), parse_limit(req.args.get('limit')), req.args.get('cursor')
+
+
+def summary_args(req):
+    """Argumentos de rollups.summary a partir de req.args (datas validadas
+    aqui, com a mesma mensagem da exportação)."""
+    date_from, date_to = req.args.get('from'), req.args.get('to')
+    return {
+        'date_from': _parse_date(date_from, 'from') if date_from else None,
+        'date_to': _parse_date(date_to, 'to') if date_to else None,
+        'group': req.args.get('group', 'month'),
+    }
+
+
+def category_name(data):
+    name = (data or {}).get('name')
+    if not name:
+        raise ValueError('Nome da categoria é obrigatório.')
+    return name
+
+
+# --- Respostas ---
+
+def page(req, items, next_cursor):
+    """(corpo, headers) de uma página: lista ou colunas; cursor em X-Next-Cursor."""
+    body = serialization.columnar(items) if serialization.wants_columns(req) else items
+    return body, {'X-Next-Cursor': next_cursor} if next_cursor else {}
+
+
+def updated(collection, row):
+    """Resposta do PUT: a linha atualizada ou 404."""
+    if not row:
+        return error(NOT_FOUND[collection], 404)
+    # Contrato antigo de PUT /api/transactions/<id>: 404 mesmo quando atualiza
+    return row, 404 if collection == 'transactions' else 200
+
+
+def deleted(collection, ok):
+    """Resposta do DELETE: mensagem de sucesso ou 404."""
+    if ok:
+        return {'message': DELETED[collection]}, 200
+    return error(NOT_FOUND[collection], 404)
+
+
+def health(pool_stats, **extra):
+    """Corpo de GET /health (extra: campos do modo, ex.: mode='asgi')."""
+    return {
+        'status': 'ok',
+        **extra,
+        'pid': os.getpid(),
+        'db_pool': pool_stats,
+        'cache': cache.stats(),
+        'rate_limit': ratelimit.stats(),
+    }
+
+
+# --- Autenticação ---
+
+def bearer_token(auth_header):
+    if auth_header and auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+
+def access_claims(auth_header):
+    """(claims, None) do access token do header, ou (None, resposta de erro)."""
+    token = bearer_token(auth_header)
+    if not token:
+        return None, error('Token não fornecido.', 401)
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=['HS256']), None
+    except jwt.ExpiredSignatureError:
+        return None, error('Token expirado.', 401)
+    except jwt.InvalidTokenError:
+        return None, error('Token inválido.', 403)
+
+
+def session_closed():
+    return error('Sessão encerrada.', 401)
+
+
+def admit_user(req, user_id):
+    """Limite de taxa e de concorrência do usuário; None ou a resposta 429.
+
+    Com None a vaga de concorrência fica reservada: o front end guarda o
+    user_id em g.inflight_user e a libera em release_inflight.
+    """
+    wait = ratelimit.check_user(req, user_id)
+    if wait:
+        return ratelimit.rejection(wait)
+    if not ratelimit.enter_user(user_id):
+        return ratelimit.rejection(1)
+    return None
+
+
+# --- GET condicional ---
+
+def collection_etag(req, collection, version):
+    """ETag da resposta: versão da coleção + variante (usuário, query string, formato).
+
+    A query string distingue páginas/filtros; o formato negociado pelo Accept
+    (JSON ou NDJSON em streaming) também muda o corpo.
+    """
+    fmt = streaming.wants_stream(req) or 'json'
+    variant = hashlib.sha1(
+        f"{req.user_id}?{req.query_string.decode('latin-1')}#{fmt}".encode('utf-8')
+    ).hexdigest()[:16]
+    return f"{collection}-{version}-{variant}"
+
+
+def set_cache_headers(response, etag):
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    # O corpo depende do Accept (NDJSON x JSON): caches e clientes guardam por formato
+    response.vary.add('Accept')
+
+
+# --- Erros ---
+
+def error_response(e):
+    """Resposta para uma exceção levantada numa rota, ou None se não é tratada aqui.
+
+    ValueError traz a mensagem para o cliente (validação do data_manager);
+    valores recusados pelo banco viram 400 sem o texto do driver; bcrypt
+    sem vaga vira 503. O resto (e as HTTPException) segue o tratamento
+    padrão do framework.
+    """
+    if isinstance(e, HTTPException):
+        return None
+    if isinstance(e, hashing.HashingBusy):
+        return ratelimit.overloaded()
+    if isinstance(e, ValueError):
+        return error(str(e), 400)
+    if db.is_data_error(e):
+        return error(INVALID_VALUE, 400)
+    return None
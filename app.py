@@ -1,35 +1,58 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response, g, Response
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from flask_bcrypt import Bcrypt
-import jwt
 import uuid
 import os
+import hmac
+import time
 from functools import wraps
 # app.py
 
 from data_manager import (
     find_user_by_username, # Usado no auth.py (e importado implicitamente)
     # Funções de Leitura (Gerais)
-    find_all, 
+    find_page, stream_all,
     # Funções CRUD para Transações
     create_transaction, update_transaction as dm_update_transaction, delete,
+    search_transactions as dm_search_transactions,
     # Funções CRUD para Metas
     create_goal, update_goal as dm_update_goal, 
     # Funções CRUD para Contas
     create_bill, update_bill as dm_update_bill,
     # Funções CRUD para Categorias
-    find_all_categories, create_category, delete_category
+    find_categories_or_defaults, find_category_by_name, create_category, delete_category,
+    # Versões por coleção (ETag)
+    get_version
 )
 from auth import auth_bp # Importa o Blueprint de autenticação
-from db import initialize_db, query as db_query
+import api
+from api import FILE_MAP
+import rollups
+import importer
+import exporter
+import dashboard
+import batch
+import sync
+import sessions
+import ratelimit
+import streaming
+import serialization
+import metrics
+from db import close_pool, pool_stats, query as db_query
+from migrate import check_version
 # 1. Configuração
 DB_INITIALIZED = False
 
 # Chamada de Inicialização
 if not DB_INITIALIZED:
     try:
-        initialize_db()
+        # As migrações rodam no deploy ("python manage.py migrate"); aqui só
+        # conferimos a versão, sem DDL nem locks de catálogo no boot dos workers.
+        check_version()
         DB_INITIALIZED = True
+        # Não deixa conexões abertas atravessarem o fork dos workers do gunicorn
+        close_pool()
     except Exception as e:
         # Se a inicialização falhar (ex: credenciais erradas), o app trava.
         print("FALHA CRÍTICA AO INICIALIZAR O BANCO DE DADOS!")
@@ -38,11 +61,14 @@ if not DB_INITIALIZED:
 app = Flask(__name__)
 CORS(app, resources={r"/*": {
     "origins": "*",  # Aceita todas as origens (incluindo o Ngrok)
-    "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    "allow_headers": ["Content-Type", "Authorization"],
+    "methods": api.CORS_METHODS,
+    "allow_headers": api.CORS_ALLOW_HEADERS,
+    "expose_headers": api.CORS_EXPOSE_HEADERS,
     "supports_credentials": True  # Permite envio de cookies, se usados (boa prática)
 }})
 bcrypt = Bcrypt(app) 
+# JSON rápido (orjson se instalado), Decimal como número e datas ISO
+app.json = serialization.JSONProvider(app)
 
 # Certifique-se de que a pasta 'data' existe
 if not os.path.exists('data'):
@@ -52,80 +78,189 @@ if not os.path.exists('data'):
 SECRET_KEY = os.environ.get('SECRET_KEY', '7c7769737faea4ff3adeda50fada7fa7c0d141f347e6f69d21399d4865ab3c94')
 app.config['SECRET_KEY'] = SECRET_KEY
 
-# Mapeamento para o data_manager
-FILE_MAP = {
-    'transactions': 'transactions',
-    'goals': 'goals',
-    'bills': 'bills',
-    'categories': 'categories'
-}
+# Token exigido em /metrics (Authorization: Bearer ...); sem token a rota
+# responde 404 (as métricas expõem rotas, tráfego e estado do pool)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+def list_page(table_name):
+    """Lista paginada (keyset) a partir de request.args.
+
+    Aceita ?limit=&cursor= e os filtros de LIST_FILTER_ARGS. O corpo continua
+    sendo uma lista JSON; o cursor da próxima página vai no header X-Next-Cursor.
+    Com ?stream=json|ndjson (ou Accept: application/x-ndjson) todas as linhas
+    após o cursor são enviadas em streaming e "limit" é ignorado. Com
+    ?format=columns o corpo é {"columns": [...], "rows": [[...], ...]}.
+    """
+    filters, limit, cursor = api.list_args(request)
+
+    stream_format = streaming.wants_stream(request)
+    if stream_format:
+        rows = stream_all(table_name, request.user_id, filters, cursor=cursor)
+        return streaming.stream_response(rows, stream_format)
+
+    items, next_cursor = find_page(table_name, request.user_id, filters, limit=limit, cursor=cursor)
+    body, headers = api.page(request, items, next_cursor)
+    return jsonify(body), 200, headers
+
+def export_response(collection):
+    """CSV da coleção (?format=csv&from=&to=[&compress=gzip]) como download.
+
+    O COPY termina (e devolve a conexão) antes do primeiro byte ser enviado.
+    """
+    fmt = (request.args.get('format') or 'csv').lower()
+    if fmt not in exporter.FORMATS:
+        return api.error(f'Formato de exportação inválido: use {", ".join(exporter.FORMATS)}.', 400)
+    date_from, date_to = request.args.get('from'), request.args.get('to')
+    compressed = (request.args.get('compress') or '').lower() == 'gzip'
+    file, rows, size = exporter.export_csv(
+        collection, request.user_id, date_from, date_to, compressed=compressed
+    )
+
+    response = Response(
+        exporter.iter_file(file),
+        mimetype='application/gzip' if compressed else 'text/csv',
+    )
+    filename = exporter.export_filename(collection, date_from, date_to, compressed)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Content-Length'] = str(size)
+    response.headers['X-Row-Count'] = str(rows)
+    return response
 
 # 2. Middleware de Autenticação (Decorator)
 def authenticate_token(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        auth_header = request.headers.get('Authorization')
-        
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-
-        if not token:
-            return jsonify({'error': 'Token não fornecido.'}), 401
-
-        try:
-            # Verifica e decodifica o token
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            # Adiciona user_id à requisição (simulando req.user.userId)
-            request.user_id = data['userId'] 
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token expirado.'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Token inválido.'}), 403
+        data, failure = api.access_claims(request.headers.get('Authorization'))
+        if failure:
+            return failure
+        # Adiciona user_id à requisição (simulando req.user.userId)
+        request.user_id = data['userId']
+
+        # Logout: checagem em memória (sessions.py), sem consulta por requisição
+        if data.get('sid') and sessions.is_revoked(data['sid']):
+            return api.session_closed()
+
+        # Limite de taxa e de concorrência por usuário (liberado em release_inflight)
+        failure = api.admit_user(request, request.user_id)
+        if failure:
+            return failure
+        g.inflight_user = request.user_id
 
         return f(*args, **kwargs)
     return decorated
 
+# Middleware de GET condicional (usar sempre depois de @authenticate_token)
+def conditional_get(collection):
+    """Emite ETag a partir da versão da coleção do usuário e responde 304.
+
+    A versão é lida antes da consulta principal: se uma escrita acontecer no
+    meio, o pior caso é o cliente baixar de novo na próxima verificação.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            version = get_version(collection, request.user_id)
+            etag = api.collection_etag(request, collection, version)
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            api.set_cache_headers(response, etag)
+            return response
+        return decorated
+    return decorator
+
+# Métricas por rota: latência e contagem por status
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+# Descarte de carga (concorrência do processo) e limite por IP das rotas /auth/*
+@app.before_request
+def admit_request():
+    if ratelimit.exempt(request):
+        return None
+    if not ratelimit.enter():
+        return ratelimit.overloaded()
+    g.inflight = True
+    username = ratelimit.login_username(request.get_json(silent=True)) if ratelimit.login_route(request) else ''
+    wait = ratelimit.check_ip(request, username)
+    if wait:
+        return ratelimit.rejection(wait)
+    return None
+
+@app.teardown_request
+def release_inflight(exc):
+    if g.pop('inflight', False):
+        ratelimit.leave()
+    user_id = g.pop('inflight_user', None)
+    if user_id is not None:
+        ratelimit.leave_user(user_id)
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Rota (padrão da URL) em vez do caminho, para não criar uma série por id
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, request.method, route)
+        metrics.HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+    return response
+
+# Mesmo mapeamento de erros de asgi.py (api.error_response); o resto segue o
+# tratamento padrão do Flask
+@app.errorhandler(Exception)
+def handle_error(e):
+    response = api.error_response(e)
+    if response is not None:
+        return response
+    if isinstance(e, HTTPException):
+        return e
+    raise e
+
+# Compressão gzip/br negociada por Accept-Encoding
+@app.after_request
+def compress_response(response):
+    return serialization.compress_response(request, response)
+
 # Monta o Blueprint de Autenticação
 app.register_blueprint(auth_bp, url_prefix='/auth')
 
 # 3. Rotas da API (Implementação usando data_manager)
 
+# --- SAÚDE / ESTATÍSTICAS DO PROCESSO ---
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify(api.health(pool_stats())), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if not METRICS_TOKEN:
+        return jsonify({'error': 'Não encontrado.'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        return jsonify({'error': 'Token inválido.'}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # --- CATEGORIAS ---
 # Nota: No frontend, as categorias são extraídas de transactions. 
 # Esta rota será simplificada para retornar uma lista estática/gerenciada.
 @app.route('/api/categories', methods=['GET'])
 @authenticate_token
+@conditional_get('categories')
 def get_categories():
-    user_id = request.user_id
-    # No backend Node.js, você buscava do BD. Aqui, simulamos isso:
-    categories_data = find_all(FILE_MAP['categories'], user_id)
-    # Garante que sempre haja categorias padrão se nenhuma existir
-    if not categories_data:
-        # Cria categorias padrão para o usuário se não existirem
-        default_cats = [
-            {'name': 'Alimentação'}, 
-            {'name': 'Transporte'}
-        ]
-        
-        for cat in default_cats:
-            create_category(cat['name'], user_id) 
-        
-        categories_data = find_all_categories(user_id)
-        
-    return jsonify(categories_data), 200
+    # Garante que sempre haja categorias padrão se nenhuma existir (via cache)
+    return jsonify(find_categories_or_defaults(request.user_id)), 200
 
 @app.route('/api/categories', methods=['POST'])
 @authenticate_token
 def add_category():
-    data = request.get_json()
-    name = data.get('name')
-    if not name:
-        return jsonify({'error': 'Nome da categoria é obrigatório.'}), 400
+    name = api.category_name(request.get_json())
     
     # Verifica se a categoria já existe para o usuário
-    existing_cats = find_all(FILE_MAP['categories'], request.user_id)
-    if any(c['name'] == name for c in existing_cats):
+    if find_category_by_name(name, request.user_id):
         return jsonify({'error': 'Categoria já existe.'}), 409
         
     new_cat = create_category(name, request.user_id)
@@ -134,25 +269,62 @@ def add_category():
 @app.route('/api/categories/<name>', methods=['DELETE'])
 @authenticate_token
 def remove_category(name):
-    # Simula a busca da categoria pelo nome (pois o frontend usa o nome)
-    existing_cats = find_all(FILE_MAP['categories'], request.user_id)
-    category_to_delete = next((c for c in existing_cats if c['name'] == name), None)
+    # Busca a categoria pelo nome (pois o frontend usa o nome)
+    category_to_delete = find_category_by_name(name, request.user_id)
     
     if not category_to_delete:
-        return jsonify({'error': 'Categoria não encontrada'}), 404
+        return api.deleted('categories', False)
 
     # Usa o ID gerado para a exclusão
-    if delete(FILE_MAP['categories'], category_to_delete['id'], request.user_id):
-        return jsonify({'message': 'Categoria deletada com sucesso'}), 200
-    return jsonify({'error': 'Categoria não encontrada'}), 404
+    return api.deleted('categories', delete(FILE_MAP['categories'], category_to_delete['id'], request.user_id))
+
+
+# --- LOTE (várias operações em uma transação) ---
+@app.route('/api/batch', methods=['POST'])
+@authenticate_token
+def run_batch():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return api.error('"operations" deve ser uma lista não vazia.', 400)
+    committed, results = batch.run_batch(
+        data.get('operations'), request.user_id, mode=data.get('mode', 'atomic')
+    )
+    # 200 mesmo com falhas no modo best_effort: o status de cada uma vai em "results"
+    return jsonify({'committed': committed, 'results': results}), 200 if committed else 422
+
+
+# --- SINCRONIZAÇÃO INCREMENTAL ---
+@app.route('/api/sync', methods=['GET'])
+@authenticate_token
+def sync_changes():
+    page = sync.changes_since(
+        request.user_id,
+        cursor=request.args.get('since'),
+        limit=request.args.get('limit'),
+    )
+    return jsonify(page)
 
 
 # --- TRANSAÇÕES (Simulação CRUD) ---
 @app.route('/api/transactions', methods=['GET'])
 @authenticate_token
+@conditional_get('transactions')
 def get_transactions():
-    transactions = find_all(FILE_MAP['transactions'], request.user_id)
-    return jsonify(transactions), 200
+    return list_page(FILE_MAP['transactions'])
+
+@app.route('/api/transactions/export', methods=['GET'])
+@authenticate_token
+def export_transactions():
+    return export_response('transactions')
+
+@app.route('/api/transactions/search', methods=['GET'])
+@authenticate_token
+@conditional_get('transactions')
+def search_transactions():
+    term, limit, cursor = api.search_args(request)
+    items, next_cursor = dm_search_transactions(request.user_id, term, limit=limit, cursor=cursor)
+    body, headers = api.page(request, items, next_cursor)
+    return jsonify(body), 200, headers
 
 @app.route('/api/transactions', methods=['POST'])
 @authenticate_token
@@ -160,6 +332,27 @@ def add_transaction():
     new_transaction = create_transaction(request.get_json(), request.user_id)
     return jsonify(new_transaction), 201
 
+@app.route('/api/transactions/import', methods=['POST'])
+@authenticate_token
+def import_transactions():
+    # Aceita o arquivo no corpo (text/csv, application/x-ndjson) ou em multipart ("file")
+    upload = request.files.get('file')
+    content_type = upload.mimetype if upload else request.content_type
+    fmt = importer.detect_format(content_type, request.args.get('format'))
+    if not fmt:
+        return api.error('Formato não suportado. Use CSV ou NDJSON.', 415)
+
+    stream = upload.stream if upload else request.stream
+    atomic = request.args.get('atomic', '').lower() in ('1', 'true', 'yes')
+    report = importer.import_transactions(
+        stream, fmt, request.user_id,
+        upload_key=request.headers.get('Idempotency-Key'),
+        atomic=atomic
+    )
+    if report.get('aborted'):
+        return jsonify(report), 422
+    return jsonify(report), 200
+
 @app.route('/api/transactions/<id>', methods=['PUT'])
 @authenticate_token
 def update_transaction(**kwargs):
@@ -167,9 +360,7 @@ def update_transaction(**kwargs):
     if not item_id:
         return jsonify({'error': 'ID da meta é obrigatório.'}), 400
     updated = dm_update_transaction(item_id, request.get_json(), request.user_id)
-    # if updated:
-    #     return jsonify(updated)
-    return jsonify(updated) if updated else jsonify({'error': 'Transação não encontrada'}), 404
+    return api.updated('transactions', updated)
 
 @app.route('/api/transactions/<id>', methods=['DELETE'])
 @authenticate_token
@@ -177,16 +368,27 @@ def delete_transaction(**kwargs):
     item_id = kwargs.get('id')
     if not item_id:
         return jsonify({'error': 'ID da meta é obrigatório.'}), 400
-    if delete(FILE_MAP['transactions'], item_id, request.user_id):
-        return jsonify({'message': 'Transação deletada com sucesso'}), 200
-    return jsonify({'error': 'Transação não encontrada'}), 404
+    return api.deleted('transactions', delete(FILE_MAP['transactions'], item_id, request.user_id))
+
+# --- RESUMO (totais mensais pré-agregados) ---
+@app.route('/api/summary', methods=['GET'])
+@authenticate_token
+@conditional_get('transactions')
+def get_summary():
+    return jsonify(rollups.summary(request.user_id, **api.summary_args(request))), 200
+
+# --- DASHBOARD (abertura do app numa requisição) ---
+@app.route('/api/dashboard', methods=['GET'])
+@authenticate_token
+def get_dashboard():
+    return jsonify(dashboard.load(request.user_id)), 200
 
 # --- METAS (Simulação CRUD) ---
 @app.route('/api/goals', methods=['GET'])
 @authenticate_token
+@conditional_get('goals')
 def get_goals():
-    goals = find_all(FILE_MAP['goals'], request.user_id)
-    return jsonify(goals), 200
+    return list_page(FILE_MAP['goals'])
 
 @app.route('/api/goals', methods=['POST'])
 @authenticate_token
@@ -200,10 +402,7 @@ def update_goal(**kwargs):
     item_id = kwargs.get('id')
     if not item_id:
         return jsonify({'error': 'ID da meta é obrigatório.'}), 400
-    updated = dm_update_goal(item_id, request.get_json(), request.user_id)
-    if updated:
-        return jsonify(updated)
-    return jsonify({'error': 'Meta não encontrada'}), 404
+    return api.updated('goals', dm_update_goal(item_id, request.get_json(), request.user_id))
 
 @app.route('/api/goals/<id>', methods=['DELETE'])
 @authenticate_token
@@ -211,16 +410,19 @@ def delete_goal(**kwargs):
     item_id = kwargs.get('id')
     if not item_id:
         return jsonify({'error': 'ID da meta é obrigatório.'}), 400
-    if delete(FILE_MAP['goals'], item_id, request.user_id):
-        return jsonify({'message': 'Meta deletada com sucesso'}), 200
-    return jsonify({'error': 'Meta não encontrada'}), 404
+    return api.deleted('goals', delete(FILE_MAP['goals'], item_id, request.user_id))
 
 # --- CONTAS A PAGAR (Simulação CRUD) ---
+@app.route('/api/bills/export', methods=['GET'])
+@authenticate_token
+def export_bills():
+    return export_response('bills')
+
 @app.route('/api/bills', methods=['GET'])
 @authenticate_token
+@conditional_get('bills')
 def get_bills():
-    bills = find_all(FILE_MAP['bills'], request.user_id)
-    return jsonify(bills), 200
+    return list_page(FILE_MAP['bills'])
 
 @app.route('/api/bills', methods=['POST'])
 @authenticate_token
@@ -234,10 +436,7 @@ def update_bill(**kwargs):
     item_id = kwargs.get('id')
     if not item_id:
         return jsonify({'error': 'ID da meta é obrigatório.'}), 400
-    updated = dm_update_bill(item_id, request.get_json(), request.user_id)
-    if updated:
-        return jsonify(updated)
-    return jsonify({'error': 'Conta não encontrada'}), 404
+    return api.updated('bills', dm_update_bill(item_id, request.get_json(), request.user_id))
 
 @app.route('/api/bills/<id>', methods=['DELETE'])
 @authenticate_token
@@ -245,8 +444,6 @@ def delete_bill(**kwargs):
     item_id = kwargs.get('id')
     if not item_id:
         return jsonify({'error': 'ID da meta é obrigatório.'}), 400
-    if delete(FILE_MAP['bills'], item_id, request.user_id):
-        return jsonify({'message': 'Conta deletada com sucesso'}), 200
-    return jsonify({'error': 'Conta não encontrada'}), 404
+    return api.deleted('bills', delete(FILE_MAP['bills'], item_id, request.user_id))
 
 
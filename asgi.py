@@ -0,0 +1,391 @@
+# asgi.py - Modo async (ASGI): mesmas rotas de app.py/auth.py sobre adb/adata_manager
+#
+#   uvicorn asgi:application --workers 2
+#
+# As rotas quentes (auth, CRUD, listagens com ETag, resumo, saúde) são servidas
+# pelo app Quart abaixo: enquanto espera o Postgres ou o bcrypt, o worker
+# atende outras requisições. O resto (OPTIONS/CORS, importação, streaming de
+# listagens) cai no app Flask de app.py via WsgiToAsgi, então nenhuma rota
+# deixa de existir no modo async. O modo síncrono (gunicorn app:app) continua
+# sendo o padrão. /metrics também vem do app Flask e inclui as métricas dos
+# dois lados (o registro de metrics.py é por processo).
+#
+# Parâmetros, validação, erros e forma das respostas vêm de api.py e auth.py,
+# os mesmos do app Flask: as rotas daqui só trocam a E/S (adata_manager).
+# Só Postgres (ver adb.py): com SQLite use o modo síncrono.
+# Dependências: pip install -r requirements-async.txt
+
+import time
+from functools import wraps
+
+from quart import Quart, request, jsonify, make_response, g
+from werkzeug.exceptions import HTTPException, NotFound, MethodNotAllowed
+from asgiref.wsgi import WsgiToAsgi
+
+import adb
+import adata_manager as adm
+import api
+import auth
+import hashing
+import metrics
+import streaming
+import serialization
+import sessions
+import ratelimit
+from api import FILE_MAP
+from app import app as flask_app, SECRET_KEY
+
+quart_app = Quart(__name__)
+quart_app.config['SECRET_KEY'] = SECRET_KEY
+quart_app.json = serialization.JSONProvider(quart_app)
+
+
+@quart_app.before_serving
+async def open_pool():
+    await adb.get_pool()
+
+
+@quart_app.after_serving
+async def close_pool():
+    await adb.close_pool()
+
+
+@quart_app.before_request
+async def start_timer():
+    g.request_started = time.perf_counter()
+
+
+# Mesmas regras de app.admit_request/release_inflight (o contador é do processo)
+@quart_app.before_request
+async def admit_request():
+    if ratelimit.exempt(request):
+        return None
+    if not ratelimit.enter():
+        return ratelimit.overloaded()
+    g.inflight = True
+    username = ratelimit.login_username(await request.get_json(silent=True)) if ratelimit.login_route(request) else ''
+    wait = ratelimit.check_ip(request, username)
+    if wait:
+        return ratelimit.rejection(wait)
+    return None
+
+
+@quart_app.teardown_request
+async def release_inflight(exc):
+    if g.pop('inflight', False):
+        ratelimit.leave()
+    user_id = g.pop('inflight_user', None)
+    if user_id is not None:
+        ratelimit.leave_user(user_id)
+
+
+@quart_app.after_request
+async def finish_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, request.method, route)
+        metrics.HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+    # Equivalente ao flask_cors de app.py para as respostas do modo async
+    response.headers['Access-Control-Allow-Origin'] = request.headers.get('Origin', '*')
+    response.headers['Access-Control-Allow-Credentials'] = 'true'
+    response.headers['Access-Control-Expose-Headers'] = ', '.join(api.CORS_EXPOSE_HEADERS)
+    return await serialization.acompress_response(request, response)
+
+
+# Mesmo mapeamento de erros de app.handle_error
+@quart_app.errorhandler(Exception)
+async def handle_error(e):
+    response = api.error_response(e)
+    if response is not None:
+        return response
+    if isinstance(e, HTTPException):
+        return e
+    raise e
+
+
+# Middleware de Autenticação (mesma lógica de app.authenticate_token)
+def authenticate_token(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        data, failure = api.access_claims(request.headers.get('Authorization'))
+        if failure:
+            return failure
+        request.user_id = data['userId']
+
+        if data.get('sid') and await adm.is_session_revoked(data['sid']):
+            return api.session_closed()
+
+        failure = api.admit_user(request, request.user_id)
+        if failure:
+            return failure
+        g.inflight_user = request.user_id
+
+        return await f(*args, **kwargs)
+    return decorated
+
+
+def conditional_get(collection):
+    """Versão async de app.conditional_get (ETag pela versão da coleção)."""
+    def decorator(f):
+        @wraps(f)
+        async def decorated(*args, **kwargs):
+            version = await adm.get_version(collection, request.user_id)
+            etag = api.collection_etag(request, collection, version)
+
+            if request.if_none_match.contains_weak(etag):
+                response = await make_response('', 304)
+            else:
+                response = await make_response(await f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            api.set_cache_headers(response, etag)
+            return response
+        return decorated
+    return decorator
+
+
+async def list_page(table_name):
+    """Versão async de app.list_page (sem streaming: esse caso vai para o app Flask)."""
+    filters, limit, cursor = api.list_args(request)
+    items, next_cursor = await adm.find_page(table_name, request.user_id, filters, limit=limit, cursor=cursor)
+    body, headers = api.page(request, items, next_cursor)
+    return jsonify(body), 200, headers
+
+
+# --- AUTENTICAÇÃO (mesmas regras de auth.py) ---
+@quart_app.route('/auth/register', methods=['POST'])
+async def register():
+    username, password = auth.credentials(await request.get_json())
+    failure = auth.registration_error(username, password)
+    if failure:
+        return failure
+
+    if await adm.find_user_by_username(username):
+        return auth.USERNAME_TAKEN
+
+    password_hash = await hashing.ahash_password(password)
+    return auth.registered(await adm.create_user(username, password_hash))
+
+
+@quart_app.route('/auth/login', methods=['POST'])
+async def login():
+    username, password = auth.credentials(await request.get_json())
+
+    user = await adm.find_user_by_username(username)
+
+    if not user or not await hashing.acheck_password(password, user['password_hash']):
+        return auth.BAD_CREDENTIALS
+
+    if hashing.needs_rehash(user['password_hash']):
+        try:
+            await adm.update_password_hash(user['id'], await hashing.ahash_password(password))
+        except Exception as e:
+            print(f"Aviso: não foi possível atualizar o hash da senha: {e}")
+
+    sid, jti = await adm.create_session(user['id'])
+    return auth.logged_in(user, sid, jti)
+
+
+@quart_app.route('/auth/token/refresh', methods=['POST'])
+async def refresh_token():
+    decoded, failure = auth.refresh_claims(await request.get_json())
+    if failure:
+        return failure
+
+    try:
+        new_jti = await adm.rotate_session(decoded['sid'], decoded['userId'], decoded['jti'])
+    except sessions.SessionInvalid:
+        return auth.SESSION_ENDED
+    return auth.refreshed(decoded, new_jti)
+
+
+@quart_app.route('/auth/logout', methods=['POST'])
+async def logout():
+    data = await request.get_json(silent=True) or {}
+    claims, failure = auth.logout_request(data, request.headers.get('Authorization'))
+    if failure:
+        return failure
+
+    if data.get('all'):
+        revoked = await adm.revoke_user_sessions(claims['userId'])
+    elif claims.get('sid'):
+        revoked = int(await adm.revoke_session(claims['sid'], claims['userId']))
+    else:
+        revoked = 0
+    return auth.logged_out(revoked)
+
+
+# --- SAÚDE ---
+@quart_app.route('/health', methods=['GET'])
+async def health():
+    return jsonify(api.health(adb.pool_stats(), mode='asgi')), 200
+
+
+# --- DASHBOARD ---
+@quart_app.route('/api/dashboard', methods=['GET'])
+@authenticate_token
+async def get_dashboard():
+    return jsonify(await adm.dashboard(request.user_id)), 200
+
+
+# --- CATEGORIAS ---
+@quart_app.route('/api/categories', methods=['GET'])
+@authenticate_token
+@conditional_get('categories')
+async def get_categories():
+    return jsonify(await adm.find_categories_or_defaults(request.user_id)), 200
+
+
+@quart_app.route('/api/categories', methods=['POST'])
+@authenticate_token
+async def add_category():
+    name = api.category_name(await request.get_json())
+    if await adm.find_category_by_name(name, request.user_id):
+        return api.error('Categoria já existe.', 409)
+    return jsonify(await adm.create_category(name, request.user_id)), 201
+
+
+@quart_app.route('/api/categories/<name>', methods=['DELETE'])
+@authenticate_token
+async def remove_category(name):
+    category_to_delete = await adm.find_category_by_name(name, request.user_id)
+    if not category_to_delete:
+        return api.deleted('categories', False)
+    return api.deleted('categories', await adm.delete(FILE_MAP['categories'], category_to_delete['id'], request.user_id))
+
+
+# --- TRANSAÇÕES ---
+@quart_app.route('/api/transactions', methods=['GET'])
+@authenticate_token
+@conditional_get('transactions')
+async def get_transactions():
+    return await list_page(FILE_MAP['transactions'])
+
+
+@quart_app.route('/api/transactions/search', methods=['GET'])
+@authenticate_token
+@conditional_get('transactions')
+async def search_transactions():
+    term, limit, cursor = api.search_args(request)
+    items, next_cursor = await adm.search_transactions(request.user_id, term, limit=limit, cursor=cursor)
+    body, headers = api.page(request, items, next_cursor)
+    return jsonify(body), 200, headers
+
+
+@quart_app.route('/api/transactions', methods=['POST'])
+@authenticate_token
+async def add_transaction():
+    return jsonify(await adm.create_transaction(await request.get_json(), request.user_id)), 201
+
+
+@quart_app.route('/api/transactions/<id>', methods=['PUT'])
+@authenticate_token
+async def update_transaction(id):
+    return api.updated('transactions', await adm.update_transaction(id, await request.get_json(), request.user_id))
+
+
+@quart_app.route('/api/transactions/<id>', methods=['DELETE'])
+@authenticate_token
+async def delete_transaction(id):
+    return api.deleted('transactions', await adm.delete(FILE_MAP['transactions'], id, request.user_id))
+
+
+# --- RESUMO ---
+@quart_app.route('/api/summary', methods=['GET'])
+@authenticate_token
+@conditional_get('transactions')
+async def get_summary():
+    return jsonify(await adm.summary(request.user_id, **api.summary_args(request))), 200
+
+
+# --- METAS ---
+@quart_app.route('/api/goals', methods=['GET'])
+@authenticate_token
+@conditional_get('goals')
+async def get_goals():
+    return await list_page(FILE_MAP['goals'])
+
+
+@quart_app.route('/api/goals', methods=['POST'])
+@authenticate_token
+async def add_goal():
+    return jsonify(await adm.create_goal(await request.get_json(), request.user_id)), 201
+
+
+@quart_app.route('/api/goals/<id>', methods=['PUT'])
+@authenticate_token
+async def update_goal(id):
+    return api.updated('goals', await adm.update_goal(id, await request.get_json(), request.user_id))
+
+
+@quart_app.route('/api/goals/<id>', methods=['DELETE'])
+@authenticate_token
+async def delete_goal(id):
+    return api.deleted('goals', await adm.delete(FILE_MAP['goals'], id, request.user_id))
+
+
+# --- CONTAS A PAGAR ---
+@quart_app.route('/api/bills', methods=['GET'])
+@authenticate_token
+@conditional_get('bills')
+async def get_bills():
+    return await list_page(FILE_MAP['bills'])
+
+
+@quart_app.route('/api/bills', methods=['POST'])
+@authenticate_token
+async def add_bill():
+    return jsonify(await adm.create_bill(await request.get_json(), request.user_id)), 201
+
+
+@quart_app.route('/api/bills/<id>', methods=['PUT'])
+@authenticate_token
+async def update_bill(id):
+    return api.updated('bills', await adm.update_bill(id, await request.get_json(), request.user_id))
+
+
+@quart_app.route('/api/bills/<id>', methods=['DELETE'])
+@authenticate_token
+async def delete_bill(id):
+    return api.deleted('bills', await adm.delete(FILE_MAP['bills'], id, request.user_id))
+
+
+# --- Despacho: Quart para as rotas acima, Flask (WSGI) para o resto ---
+_wsgi_fallback = WsgiToAsgi(flask_app)
+_async_routes = quart_app.url_map.bind('')
+
+
+class _Headers:
+    def __init__(self, scope):
+        self._headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+
+    def get(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+
+class _ScopeRequest:
+    """Só o necessário para streaming.wants_stream() a partir do scope ASGI."""
+
+    def __init__(self, scope):
+        from urllib.parse import parse_qs
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        self.args = {k: v[0] for k, v in query.items()}
+        self.headers = _Headers(scope)
+
+
+def _served_async(scope):
+    if scope['method'] == 'OPTIONS':
+        return False
+    try:
+        _async_routes.match(scope['path'], scope['method'])
+    except (NotFound, MethodNotAllowed):
+        return False
+    # Listagens em streaming usam o cursor nomeado do caminho síncrono
+    return scope['method'] != 'GET' or not streaming.wants_stream(_ScopeRequest(scope))
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan' or (scope['type'] == 'http' and _served_async(scope)):
+        return await quart_app(scope, receive, send)
+    return await _wsgi_fallback(scope, receive, send)
@@ -1,104 +1,192 @@
-from flask import Blueprint, request, jsonify
-from flask_bcrypt import Bcrypt
+from flask import Blueprint, request
 import jwt
 import datetime
 import os
 import uuid # Mantenha o uuid, embora não seja usado diretamente neste arquivo
-from data_manager import find_user_by_username, create_user
+from data_manager import find_user_by_username, create_user, update_password_hash
+import hashing
+import sessions
 
 auth_bp = Blueprint('auth', __name__)
-bcrypt = Bcrypt()
 
 # Chave Secreta
 SECRET_KEY = os.environ.get('SECRET_KEY', '7c7769737faea4ff3adeda50fada7fa7c0d141f347e6f69d21399d4865ab3c94')
 
-@auth_bp.route('/register', methods=['POST'])
-def register():
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
+# Validade do access token (o refresh token vale sessions.SESSION_LIFETIME)
+ACCESS_TOKEN_LIFETIME = datetime.timedelta(minutes=15)
+
+
+# --- Regras comuns às rotas daqui e às de asgi.py ---
+# Erros são tuplas (corpo, status), aceitas por Flask e Quart.
+
+def make_token(user_id, username, token_type, lifetime, **claims):
+    return jwt.encode({
+        'userId': user_id,
+        'username': username,
+        'type': token_type,
+        'exp': datetime.datetime.utcnow() + lifetime,
+        **claims
+    }, SECRET_KEY, algorithm='HS256')
+
 
+def session_tokens(user_id, username, sid, jti):
+    """Access token (curta validade) e refresh token da sessão.
+
+    A sessão (sid) vai nos dois tokens; o refresh token leva também o jti
+    rotativo, trocado a cada renovação.
+    """
+    return {
+        'token': make_token(user_id, username, 'access', ACCESS_TOKEN_LIFETIME, sid=sid),
+        'refreshToken': make_token(user_id, username, 'refresh', sessions.SESSION_LIFETIME, sid=sid, jti=jti),
+    }
+
+
+def credentials(data):
+    data = data or {}
+    return data.get('username'), data.get('password')
+
+
+def registration_error(username, password):
     if not username or not password:
-        return jsonify({'error': 'Username e senha são obrigatórios.'}), 400
+        return {'error': 'Username e senha são obrigatórios.'}, 400
+    return None
 
-    if find_user_by_username(username):
-        return jsonify({'error': 'Nome de usuário já existe.'}), 409
 
-    password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
-    user = create_user(username, password_hash)
+USERNAME_TAKEN = ({'error': 'Nome de usuário já existe.'}, 409)
+BAD_CREDENTIALS = ({'error': 'Usuário ou senha incorretos.'}, 400)
+SESSION_ENDED = ({'error': 'Sessão encerrada. Faça login novamente.'}, 403)
 
-    return jsonify({
+
+def registered(user):
+    return {
         'message': 'Usuário registrado com sucesso!',
         'user': {'id': user['id'], 'username': user['username']}
-    }), 201
+    }, 201
+
+
+def logged_in(user, sid, jti):
+    return {
+        **session_tokens(user['id'], user['username'], sid, jti),
+        'message': 'Login bem-sucedido!',
+        'username': user['username']
+    }
+
+
+def refresh_claims(data):
+    """(claims, None) do refreshToken do corpo, ou (None, resposta de erro)."""
+    refresh_token = (data or {}).get('refreshToken')
+    if not refresh_token:
+        return None, ({'error': 'Refresh Token é obrigatório.'}, 401)
+    try:
+        decoded = jwt.decode(refresh_token, SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        return None, ({'error': 'Refresh Token expirado. Faça login novamente.'}, 403)
+    except jwt.InvalidTokenError:
+        return None, ({'error': 'Refresh Token inválido.'}, 403)
+    if decoded.get('type') != 'refresh':
+        return None, ({'error': 'Token inválido para renovação.'}, 403)
+    # Refresh tokens emitidos antes das sessões não podem ser revogados
+    if not decoded.get('sid') or not decoded.get('jti'):
+        return None, ({'error': 'Sessão antiga. Faça login novamente.'}, 403)
+    return decoded, None
+
+
+def refreshed(decoded, new_jti):
+    return session_tokens(decoded['userId'], decoded['username'], decoded['sid'], new_jti), 200
+
+
+def logout_claims(data, auth_header):
+    """Claims do token usado no logout: o refreshToken do corpo ou o access token.
+
+    A expiração não é verificada (encerrar uma sessão com token vencido é
+    válido); a assinatura sim. Levanta jwt.InvalidTokenError.
+    """
+    token = data.get('refreshToken')
+    if not token and auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+    if not token:
+        return None
+    return jwt.decode(token, SECRET_KEY, algorithms=['HS256'], options={'verify_exp': False})
+
+
+def logout_request(data, auth_header):
+    """(claims, None) ou (None, resposta de erro) do logout."""
+    try:
+        claims = logout_claims(data, auth_header)
+    except jwt.InvalidTokenError:
+        return None, ({'error': 'Token inválido.'}, 403)
+    if not claims:
+        return None, ({'error': 'Token não fornecido.'}, 401)
+    return claims, None
+
+
+def logged_out(revoked):
+    return {'message': 'Logout realizado.', 'revoked': revoked}, 200
+
+
+# --- Rotas ---
+
+@auth_bp.route('/register', methods=['POST'])
+def register():
+    username, password = credentials(request.get_json())
+    failure = registration_error(username, password)
+    if failure:
+        return failure
+
+    if find_user_by_username(username):
+        return USERNAME_TAKEN
+
+    # O bcrypt roda no pool de processos de hashing.py, fora da thread da requisição
+    password_hash = hashing.hash_password(password)
+    return registered(create_user(username, password_hash))
 
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
+    username, password = credentials(request.get_json())
 
     user = find_user_by_username(username)
 
-    if not user or not bcrypt.check_password_hash(user['password_hash'], password):
-        return jsonify({'error': 'Usuário ou senha incorretos.'}), 400
+    if not user or not hashing.check_password(password, user['password_hash']):
+        return BAD_CREDENTIALS
 
-    # 1. Geração do Access Token (curta validade: 15 minutos)
-    access_token = jwt.encode({
-        'userId': user['id'], 
-        'username': user['username'],
-        'type': 'access',
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=15)
-    }, SECRET_KEY, algorithm='HS256')
-    
-    # 2. Geração do Refresh Token (longa validade: 30 dias)
-    refresh_token = jwt.encode({
-        'userId': user['id'], 
-        'username': user['username'],
-        'type': 'refresh',
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30)
-    }, SECRET_KEY, algorithm='HS256')
+    # Hashes gerados com custo menor que o atual são atualizados no login
+    if hashing.needs_rehash(user['password_hash']):
+        try:
+            update_password_hash(user['id'], hashing.hash_password(password))
+        except Exception as e:
+            print(f"Aviso: não foi possível atualizar o hash da senha: {e}")
 
-    return jsonify({
-        'token': access_token,             # Access Token principal (usado nas APIs)
-        'refreshToken': refresh_token,     # Token de renovação (usado para obter novos access tokens)
-        'message': 'Login bem-sucedido!', 
-        'username': user['username']
-    })
+    sid, jti = sessions.create_session(user['id'])
+    return logged_in(user, sid, jti)
 
 
 @auth_bp.route('/token/refresh', methods=['POST'])
 def refresh_token():
-    data = request.get_json()
-    refresh_token = data.get('refreshToken')
-
-    if not refresh_token:
-        return jsonify({'error': 'Refresh Token é obrigatório.'}), 401
+    decoded, failure = refresh_claims(request.get_json())
+    if failure:
+        return failure
 
+    # Troca o jti: o refresh token apresentado deixa de valer
     try:
-        # Tenta verificar se o Refresh Token é válido
-        decoded = jwt.decode(refresh_token, SECRET_KEY, algorithms=['HS256'])
-
-        if decoded.get('type') != 'refresh':
-            return jsonify({'error': 'Token inválido para renovação.'}), 403
-
-        # Se válido, gera um NOVO Access Token (15 minutos)
-        new_access_token = jwt.encode(
-            { 'userId': decoded['userId'], 
-              'username': decoded['username'], 
-              'type': 'access',
-              'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=15)
-            },
-            SECRET_KEY,
-            algorithm='HS256'
-        )
-
-        return jsonify({'token': new_access_token}), 200
-        
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Refresh Token expirado. Faça login novamente.'}), 403
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Refresh Token inválido.'}), 403
-    except Exception as e:
-        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
\ No newline at end of file
+        new_jti = sessions.rotate_session(decoded['sid'], decoded['userId'], decoded['jti'])
+    except sessions.SessionInvalid:
+        return SESSION_ENDED
+    return refreshed(decoded, new_jti)
+
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    data = request.get_json(silent=True) or {}
+    claims, failure = logout_request(data, request.headers.get('Authorization'))
+    if failure:
+        return failure
+
+    # {"all": true} encerra todas as sessões do usuário (todos os dispositivos)
+    if data.get('all'):
+        revoked = sessions.revoke_user_sessions(claims['userId'])
+    elif claims.get('sid'):
+        revoked = int(sessions.revoke_session(claims['sid'], claims['userId']))
+    else:
+        revoked = 0
+    return logged_out(revoked)
@@ -0,0 +1,133 @@
+# batch.py - Várias operações CRUD em uma requisição e uma transação (POST /api/batch)
+#
+# Cada operação tem o formato de uma chamada avulsa da API:
+#   {"method": "PUT", "path": "/api/goals/<id>", "body": {...}}
+# e é executada pelas mesmas funções do data_manager, em ordem, na conexão de
+# um único transaction(). Modos:
+#   atomic      -> a primeira falha desfaz tudo (nada é gravado)
+#   best_effort -> cada operação roda em um SAVEPOINT; as que falham são
+#                  desfeitas sozinhas e as demais são gravadas
+
+import os
+import re
+
+import api
+from db import transaction, savepoint, is_data_error
+from data_manager import (
+    create_transaction, update_transaction, delete,
+    create_goal, update_goal, create_bill, update_bill,
+    find_category_by_name, create_category, delete_category,
+)
+
+MAX_BATCH_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', '200'))
+MODES = ('atomic', 'best_effort')
+
+_PATH = re.compile(r'^/?(?:api/)?(transactions|goals|bills|categories)(?:/([^/]+))?/?$')
+
+_CREATE = {
+    'transactions': create_transaction,
+    'goals': create_goal,
+    'bills': create_bill,
+}
+_UPDATE = {
+    'transactions': update_transaction,
+    'goals': update_goal,
+    'bills': update_bill,
+}
+_NOT_FOUND = api.NOT_FOUND
+
+
+class _Failed(Exception):
+    """Operação que não deu certo: desfaz o SAVEPOINT (ou o lote inteiro)."""
+
+    def __init__(self, index, result):
+        super().__init__(result.get('error'))
+        self.index = index
+        self.result = result
+
+
+def _error(status, message):
+    return {'status': status, 'error': message}
+
+
+def _apply(op, user_id):
+    """Executa uma operação e devolve {'status': ..., 'body'|'error': ...}."""
+    if not isinstance(op, dict):
+        return _error(400, 'Cada operação deve ser um objeto.')
+    method = str(op.get('method', '')).upper()
+    match = _PATH.match(str(op.get('path', '')))
+    if not match:
+        return _error(400, 'Caminho não suportado no lote.')
+    collection, item_id = match.groups()
+    body = op.get('body') or {}
+
+    try:
+        if collection == 'categories':
+            if method == 'POST' and not item_id:
+                name = body.get('name')
+                if not name:
+                    return _error(400, 'Nome da categoria é obrigatório.')
+                if find_category_by_name(name, user_id):
+                    return _error(409, 'Categoria já existe.')
+                return {'status': 201, 'body': create_category(name, user_id)}
+            if method == 'DELETE' and item_id:
+                if delete_category(item_id, user_id):
+                    return {'status': 200, 'body': {'message': 'Categoria deletada com sucesso'}}
+                return _error(404, _NOT_FOUND[collection])
+        elif method == 'POST' and not item_id:
+            return {'status': 201, 'body': _CREATE[collection](body, user_id)}
+        elif method == 'PUT' and item_id:
+            updated = _UPDATE[collection](item_id, body, user_id)
+            if updated:
+                return {'status': 200, 'body': updated}
+            return _error(404, _NOT_FOUND[collection])
+        elif method == 'DELETE' and item_id:
+            if delete(collection, item_id, user_id):
+                return {'status': 200, 'body': {'message': 'Deletado com sucesso'}}
+            return _error(404, _NOT_FOUND[collection])
+    except (KeyError, TypeError, AttributeError) as e:
+        return _error(400, f'Operação inválida: campo ausente ou mal formado ({e}).')
+    except ValueError as e:
+        return _error(400, str(e))
+    except Exception as e:
+        if is_data_error(e):
+            return _error(400, f'Operação inválida: {api.INVALID_VALUE}')
+        # O texto do driver fica no log, não na resposta
+        print(f"Erro na operação do lote ({method} {op.get('path')}): {e}")
+        return _error(500, 'Erro interno ao executar a operação.')
+    return _error(405, f'Método {method} não suportado para {op.get("path")}.')
+
+
+def run_batch(operations, user_id, mode='atomic'):
+    """Executa as operações em ordem. Retorna (gravado?, [resultado por operação])."""
+    if mode not in MODES:
+        raise ValueError(f'Modo inválido: use {" ou ".join(MODES)}.')
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('"operations" deve ser uma lista não vazia.')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise ValueError(f'Máximo de {MAX_BATCH_OPERATIONS} operações por lote.')
+
+    results = []
+    try:
+        with transaction():
+            for index, op in enumerate(operations):
+                if mode == 'atomic':
+                    result = _apply(op, user_id)
+                    if result['status'] >= 400:
+                        raise _Failed(index, result)
+                    results.append(result)
+                    continue
+                try:
+                    with savepoint():
+                        result = _apply(op, user_id)
+                        if result['status'] >= 400:
+                            raise _Failed(index, result)
+                except _Failed as failed:
+                    result = failed.result
+                results.append(result)
+    except _Failed as failed:
+        # Lote desfeito: a falha aparece na sua posição, as outras como não gravadas
+        skipped = _error(424, 'Não gravada: o lote foi desfeito.')
+        results = [failed.result if i == failed.index else skipped for i in range(len(operations))]
+        return False, results
+    return True, results
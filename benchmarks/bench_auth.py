@@ -0,0 +1,109 @@
+# benchmarks/bench_auth.py
+#
+# Custo por requisição do app.authenticate_token (o decorator inteiro, dentro
+# de um request context do Flask, em volta de uma view vazia):
+#   1. token sem sid (tokens antigos): só jwt.decode
+#   2. token com sid: jwt.decode + deny set em memória (sessions.is_revoked),
+#      com [revogadas] sessões no conjunto
+#   3. alternativa descartada: jwt.decode + SELECT da sessão a cada requisição
+# O caso 2 inclui a sincronização periódica (SESSION_DENY_SYNC_INTERVAL); para
+# vê-la em toda chamada rode com SESSION_DENY_SYNC_INTERVAL=0.
+#
+# Uso: DATABASE_URL=postgres://... python benchmarks/bench_auth.py [iterações] [revogadas]
+# (sqlite:///:memory: também serve; a diferença para o caso 3 fica menor
+# porque o SQLite não tem ida e volta de rede)
+
+import os
+import sys
+import time
+import datetime
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+
+import db
+import migrate
+import sessions
+import data_manager as dm
+from app import app, authenticate_token, SECRET_KEY
+
+
+def make_token(user_id, **claims):
+    return jwt.encode({
+        'userId': user_id, 'username': 'bench', 'type': 'access',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=15), **claims
+    }, SECRET_KEY, algorithm='HS256')
+
+
+@authenticate_token
+def view():
+    return 'ok'
+
+
+def db_lookup(sid):
+    """O que authenticate_token faria sem o deny set: uma consulta por requisição."""
+    session = db.query(sessions.FIND_SESSION, (sid,))
+    return not session or session[0]['revoked_at'] is not None
+
+
+def run(label, fn, token, iterations):
+    headers = {'Authorization': f'Bearer {token}'}
+    with app.test_request_context('/api/bench', headers=headers):
+        fn()  # aquecimento
+    timings = []
+    for _ in range(iterations):
+        with app.test_request_context('/api/bench', headers=headers):
+            started = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[max(0, int(len(timings) * 0.99) - 1)]
+    print(f"{label:<38} p50={p50:8.1f} µs   p99={p99:8.1f} µs   resposta={result!r}")
+    return p50
+
+
+def main():
+    if not db.DATABASE_URL:
+        print("Defina DATABASE_URL para rodar o benchmark.")
+        return 1
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    revoked = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    migrate.migrate()
+
+    user_id = dm.create_user(f'bench-auth-{os.getpid()}-{time.time_ns()}', 'x')['id']
+    try:
+        print(f"Revogando {revoked} sessões ({db.BACKEND})...")
+        with db.transaction():
+            for _ in range(revoked):
+                sessions.create_session(user_id)
+        sessions.revoke_user_sessions(user_id)
+        sid, _ = sessions.create_session(user_id)
+        sessions.sync()
+        print(f"deny set: {len(sessions._denied)} sessão(ões)\n")
+
+        base = run("só jwt.decode (token sem sid)", view, make_token(user_id), iterations)
+        deny = run("jwt.decode + deny set", view, make_token(user_id, sid=sid), iterations)
+
+        # Mesmo decorator, trocando a checagem em memória por uma consulta
+        original = sessions.is_revoked
+        sessions.is_revoked = db_lookup
+        try:
+            lookup = run("jwt.decode + SELECT da sessão", view,
+                         make_token(user_id, sid=sid), max(1000, iterations // 10))
+        finally:
+            sessions.is_revoked = original
+
+        print(f"\nacréscimo do deny set: {deny - base:+.1f} µs por requisição; "
+              f"da consulta ao banco: {lookup - base:+.1f} µs")
+    finally:
+        db.query("DELETE FROM sessions WHERE user_id = %s", (user_id,), fetch_all=False)
+        db.query("DELETE FROM users WHERE id = %s", (user_id,), fetch_all=False)
+        db.close_pool()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# benchmarks/bench_dashboard.py
+#
+# Abertura do app para um usuário com N transações (mais metas, contas e
+# categorias):
+#   1. antes: as quatro requisições do frontend em sequência
+#      (/api/transactions, /api/goals, /api/bills, /api/categories)
+#   2. dashboard.load com as consultas em sequência
+#   3. dashboard.load com as consultas em paralelo (DASHBOARD_WORKERS)
+#   4. GET /api/dashboard (JWT + consultas paralelas + JSON)
+# As requisições passam pelo test client do Flask (sem rede): num celular,
+# cada ida e volta a menos vale mais do que aparece aqui. Metas e categorias
+# vêm do cache depois da primeira leitura, como em produção; para medir só o
+# banco rode com CACHE_ENABLED=0.
+#
+# Uso: DATABASE_URL=postgres://... python benchmarks/bench_dashboard.py [transações] [iterações]
+# (com SQLite dashboard.load roda sempre em sequência: o ganho do paralelo
+# é o de sobrepor as idas e voltas ao Postgres)
+
+import io
+import os
+import csv
+import sys
+import time
+import uuid
+import random
+import datetime
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Um único usuário fazendo centenas de requisições: sem limite de taxa aqui
+os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+
+import jwt
+
+import db
+import migrate
+import dashboard
+import data_manager as dm
+from app import app, SECRET_KEY
+
+STARTUP_PATHS = ['/api/transactions?limit=20', '/api/goals', '/api/bills?paid=false', '/api/categories']
+
+
+def seed(count, rng):
+    user_id = dm.create_user(f'bench-dashboard-{uuid.uuid4()}', 'x')['id']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    start = datetime.date(2020, 1, 1)
+    for _ in range(count):
+        writer.writerow([
+            str(uuid.uuid4()), user_id,
+            (start + datetime.timedelta(days=rng.randrange(2000))).isoformat(),
+            f"Compra {rng.randrange(10000)}", rng.choice(['Alimentação', 'Transporte', 'Lazer']),
+            rng.choice(['Despesa', 'Receita']), f"{rng.randrange(100, 500000) / 100:.2f}",
+        ])
+    buffer.seek(0)
+    with db.transaction():
+        db.copy_in(
+            "COPY transactions (id, user_id, date, description, category, type, amount) "
+            "FROM STDIN WITH (FORMAT csv)", buffer)
+    today = datetime.date.today()
+    for i in range(20):
+        dm.create_goal({'name': f'Meta {i}', 'amount': '1000.00', 'saved': f'{i * 75}.00',
+                        'target_date': (today + datetime.timedelta(days=30 * i)).isoformat()}, user_id)
+    for i in range(60):
+        dm.create_bill({'description': f'Conta {i}', 'amount': '99.90', 'paid': i % 3 == 0,
+                        'due_date': (today + datetime.timedelta(days=i - 15)).isoformat()}, user_id)
+    for name in ['Alimentação', 'Transporte', 'Lazer', 'Moradia', 'Saúde', 'Renda']:
+        dm.create_category(name, user_id)
+    if db.BACKEND == 'postgres':
+        db.query("ANALYZE transactions", fetch_all=False)
+    return user_id
+
+
+def run(label, fn, iterations):
+    fn()  # aquecimento (PREPARE, cache)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[max(0, int(len(timings) * 0.99) - 1)]
+    print(f"{label:<38} p50={p50:8.2f} ms   p99={p99:8.2f} ms")
+    return p50
+
+
+def main():
+    if not db.DATABASE_URL:
+        print("Defina DATABASE_URL para rodar o benchmark.")
+        return 1
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    migrate.migrate()
+
+    print(f"Criando {count} transações ({db.BACKEND}, {dashboard.DASHBOARD_WORKERS} threads)...")
+    user_id = seed(count, random.Random(7))
+    token = jwt.encode({
+        'userId': user_id, 'username': 'bench', 'type': 'access',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }, SECRET_KEY, algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+
+    def startup_requests():
+        for path in STARTUP_PATHS:
+            assert client.get(path, headers=headers).status_code == 200
+
+    def dashboard_request():
+        assert client.get('/api/dashboard', headers=headers).status_code == 200
+
+    try:
+        print()
+        before = run("antes: 4 requisições em sequência", startup_requests, iterations)
+        serial = run("dashboard.load em sequência", lambda: dashboard.load(user_id, parallel=False), iterations)
+        parallel = run("dashboard.load em paralelo", lambda: dashboard.load(user_id), iterations)
+        after = run("GET /api/dashboard", dashboard_request, iterations)
+        print(f"\nsequência - paralelo: {serial - parallel:+.2f} ms; "
+              f"4 requisições - dashboard: {before - after:+.2f} ms")
+    finally:
+        db.query("DELETE FROM users WHERE id = %s", (user_id,), fetch_all=False)
+        db.close_pool()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
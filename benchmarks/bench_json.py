@@ -0,0 +1,102 @@
+# benchmarks/bench_json.py
+#
+# Serialização e compressão de uma listagem de 10k transações (linhas como o
+# db.query devolve: dicionários com Decimal, date e strings):
+#   1. DefaultJSONProvider do Flask (json da stdlib, sort_keys, data HTTP)
+#   2. serialization.dumps_bytes com json da stdlib
+#   3. serialization.dumps_bytes com orjson (se instalado)
+#   4. os mesmos, no formato colunar (?format=columns)
+# e o tamanho/tempo de gzip e brotli (se instalado) sobre o corpo resultante.
+#
+# Uso: python benchmarks/bench_json.py [linhas] [repetições]
+# Não precisa de banco.
+
+import os
+import sys
+import time
+import uuid
+import random
+import datetime
+import statistics
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serialization
+
+
+def make_rows(count):
+    rng = random.Random(42)
+    user_id = str(uuid.uuid4())
+    categories = ['Alimentação', 'Transporte', 'Moradia', 'Lazer', 'Saúde']
+    start = datetime.date(2024, 1, 1)
+    return [{
+        'id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'date': start + datetime.timedelta(days=rng.randrange(600)),
+        'description': f"Compra {rng.randrange(10000)}",
+        'category': rng.choice(categories),
+        'type': rng.choice(['Despesa', 'Receita']),
+        'amount': Decimal(rng.randrange(1, 5000000)) / 100,
+        'changed_seq': i + 1,
+    } for i in range(count)]
+
+
+def timed(fn, repeat):
+    fn()  # aquecimento
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rows = make_rows(count)
+    flask_default = DefaultJSONProvider(Flask(__name__))
+    orjson = serialization.orjson
+
+    baseline_ms, baseline = timed(lambda: flask_default.dumps(rows).encode('utf-8'), repeat)
+    serialization.orjson = None
+    stdlib_ms, _ = timed(lambda: serialization.dumps_bytes(rows), repeat)
+    stdlib_cols_ms, _ = timed(lambda: serialization.dumps_bytes(serialization.columnar(rows)), repeat)
+    serialization.orjson = orjson
+
+    print(f"{count} linhas, mediana de {repeat} repetições\n")
+    print(f"{'flask default (stdlib)':<32} {baseline_ms:8.2f} ms  {len(baseline):>9} bytes")
+    print(f"{'provider (stdlib)':<32} {stdlib_ms:8.2f} ms")
+    print(f"{'provider (stdlib) colunar':<32} {stdlib_cols_ms:8.2f} ms")
+
+    bodies = {}
+    if orjson is not None:
+        rows_ms, bodies['linhas'] = timed(lambda: serialization.dumps_bytes(rows), repeat)
+        cols_ms, bodies['colunar'] = timed(
+            lambda: serialization.dumps_bytes(serialization.columnar(rows)), repeat)
+        print(f"{'provider (orjson)':<32} {rows_ms:8.2f} ms  {len(bodies['linhas']):>9} bytes")
+        print(f"{'provider (orjson) colunar':<32} {cols_ms:8.2f} ms  {len(bodies['colunar']):>9} bytes")
+        print(f"\nganho do orjson sobre o default:      {baseline_ms / rows_ms:6.1f}x")
+    else:
+        print("(orjson não instalado: pip install orjson)")
+        bodies['linhas'] = serialization.dumps_bytes(rows)
+        bodies['colunar'] = serialization.dumps_bytes(serialization.columnar(rows))
+
+    encodings = ['gzip'] + (['br'] if serialization.brotli is not None else [])
+    print()
+    for label, body in bodies.items():
+        for encoding in encodings:
+            ms, compressed = timed(lambda: serialization.compress(body, encoding), max(3, repeat // 4))
+            print(f"{label:<8} {encoding:<5} {ms:8.2f} ms  {len(body):>9} -> {len(compressed):>8} bytes"
+                  f"  ({len(compressed) / len(body):5.1%})")
+    if serialization.brotli is None:
+        print("(brotli não instalado: pip install brotli)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
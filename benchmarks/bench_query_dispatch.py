@@ -0,0 +1,90 @@
+# benchmarks/bench_query_dispatch.py
+#
+# Mede o overhead por consulta de três caminhos de execução do db.query:
+#   1. legado: psycopg2.connect() por chamada + sql.Composed renderizado com
+#      as_string() para decidir se é SELECT + lista de colunas refeita
+#   2. pool + sql.Composed recomposto a cada chamada (sem registro)
+#   3. pool + Statement registrado (PREPARE uma vez, depois só EXECUTE)
+#
+# Uso: DATABASE_URL=postgres://... python benchmarks/bench_query_dispatch.py [iterações]
+# A consulta é "SELECT * FROM categories WHERE user_id = %s ORDER BY name" para
+# um usuário inexistente, então o tempo medido é praticamente só overhead.
+
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from psycopg2 import sql
+
+import db
+from data_manager import _table_statement
+
+USER_ID = 'bench-user-inexistente'
+
+
+def legacy_query(text, params):
+    conn = psycopg2.connect(db.DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        check_text = text.as_string(conn)
+        cur.execute(text, params)
+        if check_text.strip().upper().startswith('SELECT'):
+            result = cur.fetchall()
+            col_names = [desc[0] for desc in cur.description]
+            data = [dict(zip(col_names, row)) for row in result]
+        conn.commit()
+        return data
+    finally:
+        conn.close()
+
+
+def composed():
+    return sql.SQL("SELECT * FROM {} WHERE user_id = %s ORDER BY {}").format(
+        sql.Identifier('categories'), sql.Identifier('name')
+    )
+
+
+def run(label, fn, iterations):
+    fn()  # aquecimento (conexão do pool, PREPARE)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{label:<38} p50={p50:9.1f} us   p99={p99:9.1f} us")
+    return p50
+
+
+def main():
+    if not db.DATABASE_URL:
+        print("Defina DATABASE_URL para rodar o benchmark.")
+        return 1
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    stmt = _table_statement('categories', 'find_all', 'name')
+
+    legacy = run("legado (connect por consulta)", lambda: legacy_query(composed(), (USER_ID,)),
+                 max(50, iterations // 20))
+    pooled = run("pool + Composed recomposto", lambda: db.query(composed(), (USER_ID,)), iterations)
+
+    db.USE_PREPARED = False
+    registry = run("pool + Statement (sem PREPARE)", lambda: db.query(stmt, (USER_ID,)), iterations)
+    db.USE_PREPARED = True
+    prepared = run("pool + Statement + PREPARE/EXECUTE", lambda: db.query(stmt, (USER_ID,)), iterations)
+
+    print()
+    print(f"ganho do pool sobre o legado:         {legacy / pooled:6.1f}x")
+    print(f"ganho do registro sobre o Composed:   {pooled / registry:6.2f}x")
+    print(f"ganho do PREPARE sobre o registro:    {registry / prepared:6.2f}x")
+    db.close_pool()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# benchmarks/bench_search.py
+#
+# Latência de GET /api/transactions/search para um usuário com 100k transações
+# (mais 100k de outro usuário, para o índice não ser só de uma pessoa):
+#   - data_manager.search_transactions com termos seletivos, prefixos,
+#     substrings, acentuados e amplos
+#   - o caminho antigo para comparação: baixar a lista inteira
+#     (find_page sem limit) e filtrar no cliente
+# Os usuários do benchmark são criados e removidos pelo próprio script.
+#
+# Uso: DATABASE_URL=postgres://... python benchmarks/bench_search.py [linhas] [iterações]
+# (com sqlite:///arquivo.db roda sem índice de trigramas, só para comparação)
+
+import io
+import os
+import csv
+import sys
+import time
+import uuid
+import random
+import datetime
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import migrate
+import data_manager as dm
+
+WORDS = [
+    'Padaria', 'Mercado', 'Farmácia', 'Posto', 'Restaurante', 'Açougue', 'Livraria',
+    'Academia', 'Cinema', 'Estacionamento', 'Pedágio', 'Uber', 'Aluguel', 'Condomínio',
+    'Luz', 'Água', 'Internet', 'Celular', 'Salário', 'Freela', 'Pix', 'Presente',
+    'Consulta', 'Exame', 'Seguro', 'Viagem', 'Hotel', 'Passagem', 'Lanche', 'Café',
+]
+PLACES = ['São Paulo', 'Pão de Açúcar', 'Centro', 'Shopping', 'Bairro', 'Online', 'Loja 42']
+CATEGORIES = ['Alimentação', 'Transporte', 'Moradia', 'Lazer', 'Saúde', 'Educação', 'Renda']
+
+QUERIES = [
+    ('seletivo', 'livraria loja'),
+    ('prefixo', 'farm'),
+    ('substring', 'cougue'),
+    ('acentuado', 'PEDAGIO'),
+    ('categoria', 'educacao'),
+    ('amplo', 'ao'),
+]
+
+
+def seed(count, rng):
+    user_id = dm.create_user(f'bench-search-{uuid.uuid4()}', 'x')['id']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    start = datetime.date(2020, 1, 1)
+    for _ in range(count):
+        writer.writerow([
+            str(uuid.uuid4()), user_id,
+            (start + datetime.timedelta(days=rng.randrange(2000))).isoformat(),
+            f"{rng.choice(WORDS)} {rng.choice(PLACES)} {rng.randrange(1000)}",
+            rng.choice(CATEGORIES), rng.choice(['Despesa', 'Receita']),
+            f"{rng.randrange(100, 500000) / 100:.2f}",
+        ])
+    buffer.seek(0)
+    with db.transaction():
+        db.copy_in(
+            "COPY transactions (id, user_id, date, description, category, type, amount) "
+            "FROM STDIN WITH (FORMAT csv)", buffer)
+    if db.BACKEND == 'postgres':
+        db.query("ANALYZE transactions", fetch_all=False)
+    return user_id
+
+
+def run(label, fn, iterations):
+    fn()  # aquecimento (PREPARE, cache do banco)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[max(0, int(len(timings) * 0.99) - 1)]
+    print(f"{label:<34} p50={p50:8.2f} ms   p99={p99:8.2f} ms   resultados={len(result[0])}")
+    return p50
+
+
+def client_filter(user_id, term):
+    items, _ = dm.find_page('transactions', user_id)
+    term = term.lower()
+    return [i for i in items if term in i['description'].lower() or term in (i['category'] or '').lower()], None
+
+
+def main():
+    if not db.DATABASE_URL:
+        print("Defina DATABASE_URL para rodar o benchmark.")
+        return 1
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    migrate.migrate()
+
+    rng = random.Random(7)
+    print(f"Criando {count} transações para dois usuários ({db.BACKEND})...")
+    user_id = seed(count, rng)
+    other_id = seed(count, rng)
+    try:
+        print()
+        for label, term in QUERIES:
+            run(f"busca {label} ({term!r})",
+                lambda: dm.search_transactions(user_id, term, limit=50), iterations)
+        run("busca amplo, página 5",
+            lambda: dm.search_transactions(user_id, 'ao', limit=50,
+                                           cursor=dm.encode_cursor(200, 'ao')), iterations)
+        run("antes: lista inteira + filtro local", lambda: client_filter(user_id, 'farm'),
+            max(3, iterations // 50))
+    finally:
+        db.query("DELETE FROM users WHERE id IN (%s, %s)", (user_id, other_id), fetch_all=False)
+        db.close_pool()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
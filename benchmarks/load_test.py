@@ -0,0 +1,131 @@
+# benchmarks/load_test.py
+#
+# Teste de carga simples (só stdlib) para comparar os dois modos de serviço
+# com o mesmo número de processos (mesmo orçamento de memória):
+#
+#   gunicorn -w 2 -b 127.0.0.1:8000 app:app
+#   uvicorn asgi:application --workers 2 --port 8001
+#
+#   python benchmarks/load_test.py http://127.0.0.1:8000 http://127.0.0.1:8001 \
+#       --concurrency 64 --duration 30
+#
+# Para cada URL base: registra um usuário de teste, faz login e dispara uma
+# mistura de requisições (listagem de transações, resumo, categorias e um
+# login a cada LOGIN_EVERY requisições, que exercita o bcrypt). Reporta
+# requisições por segundo, p50/p99 e erros. Compare também o RSS dos workers
+# (ps -o rss) para confirmar que o orçamento de memória é o mesmo.
+# Suba os servidores com RATE_LIMIT_ENABLED=0 e SHED_MAX_INFLIGHT=0: o teste
+# usa um único usuário e um único IP, e mediria os 429/503 em vez do serviço.
+
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+LOGIN_EVERY = 20
+READ_PATHS = [
+    '/api/transactions?limit=50',
+    '/api/summary',
+    '/api/categories',
+]
+
+
+class Client:
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = None
+
+    def request(self, method, path, body=None, token=None):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            self.conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+        return response.status, data
+
+
+def setup_user(base_url):
+    client = Client(base_url)
+    credentials = {'username': f'load-{uuid.uuid4().hex[:12]}', 'password': 'load-test-password'}
+    client.request('POST', '/auth/register', credentials)
+    status, data = client.request('POST', '/auth/login', credentials)
+    if status != 200:
+        raise SystemExit(f"{base_url}: login falhou ({status}): {data[:200]!r}")
+    return credentials, json.loads(data)['token']
+
+
+def run(base_url, concurrency, duration):
+    credentials, token = setup_user(base_url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        client = Client(base_url)
+        local, local_errors, n = [], 0, index
+        while time.monotonic() < deadline:
+            n += 1
+            if n % LOGIN_EVERY == 0:
+                method, path, body = 'POST', '/auth/login', credentials
+            else:
+                method, path, body = 'GET', READ_PATHS[n % len(READ_PATHS)], None
+            started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body, token)
+                if status >= 400:
+                    local_errors += 1
+            except Exception:
+                local_errors += 1
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99_ms': p99 * 1000,
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara RPS e p99 entre servidores do app.")
+    parser.add_argument('urls', nargs='+', help="URLs base (ex.: http://127.0.0.1:8000)")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    args = parser.parse_args()
+
+    print(f"{'url':<32}{'reqs':>8}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'erros':>8}")
+    for url in args.urls:
+        r = run(url, args.concurrency, args.duration)
+        print(f"{url:<32}{r['requests']:>8}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
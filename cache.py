@@ -0,0 +1,214 @@
+# cache.py - Cache read-through para coleções pequenas (categorias, metas, contas)
+#
+# Backend em processo (LRU com TTL e limite de memória) por padrão. Com
+# CACHE_URL=redis://... os workers do gunicorn compartilham um Redis e uma
+# invalidação feita por um worker vale para todos.
+
+import os
+import time
+import pickle
+import threading
+from collections import OrderedDict
+
+import metrics
+
+CACHE_ENABLED = os.environ.get('CACHE_ENABLED', '1').lower() not in ('0', 'false', 'no')
+CACHE_TTL = float(os.environ.get('CACHE_TTL', '60'))
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+CACHE_URL = os.environ.get('CACHE_URL')
+CACHE_PREFIX = os.environ.get('CACHE_PREFIX', 'fin:')
+
+
+class MemoryBackend:
+    """LRU em processo com expiração por entrada e limite total em bytes."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # chave -> (expira_em, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        cost = len(value) + len(key)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            self.size += cost
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._remove(key)
+
+    def _remove(self, key):
+        _, value = self._data.pop(key)
+        self.size -= len(value) + len(key)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._data), 'bytes': self.size,
+                    'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class RedisBackend:
+    """Backend compartilhado entre workers (requer o pacote "redis")."""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(CACHE_PREFIX + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(CACHE_PREFIX + key, value, ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[CACHE_PREFIX + key for key in keys])
+
+    def stats(self):
+        return {'backend_url': CACHE_URL}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0, 'sets': 0, 'invalidations': 0, 'errors': 0}
+_counters_lock = threading.Lock()
+# chave -> momento da última invalidação; evita gravar um valor lido antes dela
+_invalidated_at = {}
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisBackend(CACHE_URL) if CACHE_URL else MemoryBackend()
+    return _backend
+
+
+_MISS = object()
+
+
+def _lookup(key):
+    try:
+        raw = get_backend().get(key)
+    except Exception as e:
+        print(f"Aviso: falha ao ler o cache: {e}")
+        _count('errors')
+        raw = None
+    if raw is not None:
+        _count('hits')
+        return pickle.loads(raw)
+    _count('misses')
+    return _MISS
+
+
+def _store(key, value, ttl, started):
+    # Se a chave foi invalidada enquanto carregávamos, o valor pode estar velho
+    if _invalidated_at.get(key, 0) >= started:
+        return
+    try:
+        get_backend().set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl)
+        _count('sets')
+    except Exception as e:
+        print(f"Aviso: falha ao gravar no cache: {e}")
+        _count('errors')
+
+
+def get_or_load(key, loader, ttl=CACHE_TTL):
+    """Retorna o valor em cache ou chama loader() e guarda o resultado."""
+    if not CACHE_ENABLED:
+        return loader()
+    value = _lookup(key)
+    if value is _MISS:
+        started = time.monotonic()
+        value = loader()
+        _store(key, value, ttl, started)
+    return value
+
+
+async def aget_or_load(key, loader, ttl=CACHE_TTL):
+    """Versão de get_or_load para a camada async: loader() é uma coroutine function."""
+    if not CACHE_ENABLED:
+        return await loader()
+    value = _lookup(key)
+    if value is _MISS:
+        started = time.monotonic()
+        value = await loader()
+        _store(key, value, ttl, started)
+    return value
+
+
+def invalidate(*keys):
+    if not CACHE_ENABLED or not keys:
+        return
+    now = time.monotonic()
+    if len(_invalidated_at) > 10000:
+        # Marcas antigas não protegem mais nenhuma carga em andamento
+        for stale in [k for k, t in list(_invalidated_at.items()) if now - t > 60]:
+            _invalidated_at.pop(stale, None)
+    for key in keys:
+        _invalidated_at[key] = now
+    try:
+        get_backend().delete(*keys)
+    except Exception as e:
+        print(f"Aviso: falha ao invalidar o cache: {e}")
+        _count('errors')
+    with _counters_lock:
+        _counters['invalidations'] += len(keys)
+
+
+def stats():
+    """Contadores de hit/miss do processo atual + estado do backend."""
+    with _counters_lock:
+        data = dict(_counters)
+    total = data['hits'] + data['misses']
+    data['hit_ratio'] = data['hits'] / total if total else 0.0
+    data['enabled'] = CACHE_ENABLED
+    if CACHE_ENABLED:
+        data.update(get_backend().stats())
+    return data
+
+
+def _collect_metrics():
+    data = stats()
+    samples = [
+        ('cache_requests_total', 'counter', 'Leituras do cache por resultado.', {'result': 'hit'}, data['hits']),
+        ('cache_requests_total', 'counter', 'Leituras do cache por resultado.', {'result': 'miss'}, data['misses']),
+        ('cache_invalidations_total', 'counter', 'Chaves invalidadas após escritas.', None, data['invalidations']),
+        ('cache_errors_total', 'counter', 'Falhas de acesso ao backend do cache.', None, data['errors']),
+    ]
+    if 'bytes' in data:
+        samples.append(('cache_bytes', 'gauge', 'Bytes ocupados pelo cache em processo.', None, data['bytes']))
+        samples.append(('cache_evictions_total', 'counter', 'Entradas removidas por falta de espaço.', None, data['evictions']))
+    return samples
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,84 @@
+# dashboard.py - GET /api/dashboard: a tela inicial do app numa requisição só
+#
+# Substitui as quatro chamadas da abertura do app (transações, metas, contas e
+# categorias): um único JWT decodificado e as quatro consultas em paralelo num
+# pool de threads limitado, cada uma com a própria conexão do pool do banco.
+# O pool é do processo e tem DASHBOARD_WORKERS threads, então dashboards
+# simultâneos nunca ocupam mais que isso de conexões e não esgotam o
+# DB_POOL_MAX das outras rotas. No modo async (asgi.py) as mesmas consultas
+# rodam com asyncio.gather em adata_manager.dashboard.
+
+import os
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import data_manager as dm
+
+DASHBOARD_WORKERS = int(os.environ.get('DASHBOARD_WORKERS', '4'))
+# Transações mais recentes e contas em aberto que vencem nos próximos N dias
+# (as atrasadas entram sempre)
+DASHBOARD_TRANSACTIONS = int(os.environ.get('DASHBOARD_TRANSACTIONS', '20'))
+DASHBOARD_BILLS_DAYS = int(os.environ.get('DASHBOARD_BILLS_DAYS', '30'))
+DASHBOARD_BILLS = int(os.environ.get('DASHBOARD_BILLS', '50'))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is not None and _executor_pid == pid:
+        return _executor
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            # Recriado após o fork dos workers do gunicorn (threads não são herdadas)
+            _executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix='dashboard')
+            _executor_pid = pid
+        return _executor
+
+
+def bills_filters(today=None):
+    today = today or datetime.date.today()
+    return {'paid': False, 'date_to': today + datetime.timedelta(days=DASHBOARD_BILLS_DAYS)}
+
+
+def active_goals(goals):
+    """Metas ainda não atingidas (saved < amount), na ordem da listagem."""
+    return [goal for goal in goals if (goal['saved'] or 0) < goal['amount']]
+
+
+def build(transactions_page, goals, bills_page, categories):
+    """Monta o corpo da resposta a partir dos resultados das quatro consultas."""
+    transactions, transactions_cursor = transactions_page
+    bills, _ = bills_page
+    return {
+        'transactions': transactions,
+        # Continua em GET /api/transactions?cursor=...
+        'transactions_cursor': transactions_cursor,
+        'goals': active_goals(goals),
+        'bills': bills,
+        'categories': categories,
+    }
+
+
+def _queries(user_id):
+    return (
+        lambda: dm.find_page('transactions', user_id, limit=DASHBOARD_TRANSACTIONS),
+        lambda: dm.find_all('goals', user_id),
+        lambda: dm.find_page('bills', user_id, bills_filters(), limit=DASHBOARD_BILLS),
+        lambda: dm.find_categories_or_defaults(user_id),
+    )
+
+
+def load(user_id, parallel=True):
+    """Dados do dashboard; parallel=False roda as consultas em sequência (benchmark)."""
+    queries = _queries(user_id)
+    # No SQLite as consultas são chamadas locais de microssegundos: as threads só custariam
+    if not parallel or DASHBOARD_WORKERS <= 1 or db.BACKEND == 'sqlite':
+        return build(*[run() for run in queries])
+    futures = [_get_executor().submit(run) for run in queries]
+    return build(*[future.result() for future in futures])
@@ -1,129 +1,603 @@
 # data_manager.py - Implementação SQL
 
+import re
 import uuid
-from db import query
-from psycopg2 import sql
+import json
+import base64
+import datetime
+from functools import lru_cache
+from decimal import Decimal, InvalidOperation
+from db import (
+    query, read_query, stream, transaction, in_transaction, after_commit, statement, pin_primary,
+)
+import rollups
+import cache
 
 # Funções auxiliares de Autenticação (Users)
 
+# As consultas fixas ficam no registro de statements do db.py: o SQL é
+# composto uma vez no import e executado com PREPARE/EXECUTE por conexão.
+
+FIND_USER_BY_USERNAME = statement(
+    'users_find_by_username',
+    "SELECT id, username, password_hash FROM users WHERE username = %s"
+)
+CREATE_USER = statement(
+    'users_create',
+    "INSERT INTO users (id, username, password_hash) VALUES (%s, %s, %s) RETURNING id, username"
+)
+UPDATE_PASSWORD_HASH = statement(
+    'users_update_password_hash',
+    "UPDATE users SET password_hash = %s WHERE id = %s",
+    returns_rows=False
+)
+
 def find_user_by_username(username):
-    sql_text = "SELECT id, username, password_hash FROM users WHERE username = %s"
-    results = query(sql_text, (username,))
+    results = read_query(FIND_USER_BY_USERNAME, (username,))
+    if not results:
+        # Conta recém-criada pode ainda não ter chegado à réplica (login logo após o registro)
+        results = query(FIND_USER_BY_USERNAME, (username,))
     return results[0] if results else None
 
 def create_user(username, password_hash):
     new_id = str(uuid.uuid4())
-    sql_text = "INSERT INTO users (id, username, password_hash) VALUES (%s, %s, %s) RETURNING id, username"
-    query(sql_text, (new_id, username, password_hash), fetch_all=False)
+    query(CREATE_USER, (new_id, username, password_hash))
     return {'id': new_id, 'username': username}
 
+def update_password_hash(user_id, password_hash):
+    query(UPDATE_PASSWORD_HASH, (password_hash, user_id))
+
 # --- Funções CRUD Genéricas para a Aplicação ---
 
-# Função para encontrar um item (usada para Transaction, Goal, Bill, Category)
-def find_all(table_name, user_id, order_by='id'):
-    sql_text = sql.SQL("SELECT * FROM {} WHERE user_id = %s ORDER BY {}").format(
-        sql.Identifier(table_name), sql.Identifier(order_by)
+# Colunas devolvidas por tabela. Os statements usam a lista explícita em vez
+# de "*": um PREPARE feito antes de uma migração que adiciona coluna continua
+# com o mesmo tipo de resultado nas conexões já abertas.
+COLUMNS = {
+    'transactions': ('id', 'user_id', 'date', 'description', 'category', 'type', 'amount', 'changed_seq'),
+    'goals': ('id', 'user_id', 'name', 'amount', 'saved', 'target_date', 'changed_seq'),
+    'bills': ('id', 'user_id', 'description', 'amount', 'due_date', 'paid', 'changed_seq'),
+    'categories': ('id', 'user_id', 'name', 'changed_seq'),
+}
+
+def columns(table_name, alias=None):
+    """Lista de colunas para SELECT/RETURNING (com prefixo "alias." se informado)."""
+    prefix = f"{alias}." if alias else ''
+    return ', '.join(prefix + _ident(column) for column in COLUMNS[table_name])
+
+
+# Especificação de listagem paginada (keyset) por tabela:
+#   sort      -> coluna de ordenação (sempre desempatada pelo id)
+#   desc      -> ordem decrescente (transações mais recentes primeiro)
+#   nullable  -> a coluna de ordenação aceita NULL (ordenados por último)
+#   date      -> coluna usada pelos filtros date_from/date_to
+#   equals    -> colunas com filtro de igualdade
+# Cada combinação (user_id, sort, id) tem um índice composto (migração 0002).
+LIST_SPECS = {
+    'transactions': {'sort': 'date', 'desc': True, 'nullable': False,
+                     'date': 'date', 'equals': ('category', 'type')},
+    'goals': {'sort': 'target_date', 'desc': False, 'nullable': True,
+              'date': 'target_date', 'equals': ()},
+    'bills': {'sort': 'due_date', 'desc': False, 'nullable': False,
+              'date': 'due_date', 'equals': ('paid',)},
+}
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort_value, item_id):
+    if isinstance(sort_value, (datetime.date, datetime.datetime)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, item_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Cursor de paginação inválido.')
+    return sort_value, item_id
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.date.fromisoformat(str(value).split('T')[0])
+    except ValueError:
+        raise ValueError(f'Data inválida em "{field}" (use AAAA-MM-DD).')
+
+
+def _parse_amount(value, field):
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f'Valor numérico inválido em "{field}".')
+
+
+def _ident(name):
+    # Equivalente ao sql.Identifier do psycopg2, sem precisar de conexão
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _statement_name(*parts):
+    return re.sub(r'[^a-z0-9_]', '_', '_'.join(parts).lower())
+
+
+def _build_filters(spec, filters):
+    """Normaliza os filtros: (chaves em ordem canônica, parâmetros).
+
+    O SQL depende só das chaves presentes, então cada combinação vira um
+    único statement registrado (ver _list_statement).
+    """
+    keys, params = [], []
+    if not filters:
+        return tuple(keys), params
+    for key in sorted(filters):
+        value = filters[key]
+        if value is None:
+            continue
+        if key in ('date_from', 'date_to'):
+            params.append(_parse_date(value, key))
+        elif key in ('amount_min', 'amount_max'):
+            params.append(_parse_amount(value, key))
+        elif key in spec['equals']:
+            params.append(value)
+        else:
+            raise ValueError(f'Filtro não suportado: "{key}".')
+        keys.append(key)
+    return tuple(keys), params
+
+
+@lru_cache(maxsize=None)
+def _list_statement(table_name, filter_keys, cursor_kind, limited):
+    """Statement do SELECT ordenado por (coluna de data, id) para um formato de consulta.
+
+    cursor_kind: None (primeira página), 'null' (cursor em valor NULL) ou 'value'.
+    """
+    spec = LIST_SPECS[table_name]
+    sort_col = _ident(spec['sort'])
+    where = ["user_id = %s"]
+
+    for key in filter_keys:
+        if key == 'date_from':
+            where.append(f"{_ident(spec['date'])} >= %s")
+        elif key == 'date_to':
+            where.append(f"{_ident(spec['date'])} <= %s")
+        elif key == 'amount_min':
+            where.append("amount >= %s")
+        elif key == 'amount_max':
+            where.append("amount <= %s")
+        else:
+            where.append(f"{_ident(key)} = %s")
+
+    if cursor_kind == 'null':
+        where.append(f"({sort_col} IS NULL AND id > %s)")
+    elif cursor_kind == 'value':
+        op = '<' if spec['desc'] else '>'
+        keyset = f"({sort_col}, id) {op} (%s, %s)"
+        if spec['nullable']:
+            keyset = f"({keyset} OR {sort_col} IS NULL)"
+        where.append(keyset)
+
+    if spec['desc']:
+        order = f"{sort_col} DESC, id DESC"
+    elif spec['nullable']:
+        order = f"{sort_col} ASC NULLS LAST, id ASC"
+    else:
+        order = f"{sort_col} ASC, id ASC"
+
+    sql_text = (
+        f"SELECT {columns(table_name)} FROM {_ident(table_name)} "
+        f"WHERE {' AND '.join(where)} ORDER BY {order}"
+    )
+    if limited:
+        sql_text += " LIMIT %s"
+    name = _statement_name(
+        'list', table_name, *filter_keys, cursor_kind or 'first', 'limit' if limited else 'all'
     )
-    return query(sql_text, (user_id,))
+    return statement(name, sql_text)
+
+
+def _list_query(table_name, user_id, filters=None, cursor=None, limited=False):
+    """Escolhe o statement de listagem e monta os parâmetros."""
+    spec = LIST_SPECS.get(table_name)
+    if spec is None:
+        raise ValueError(f'Paginação não suportada para "{table_name}".')
+
+    filter_keys, filter_params = _build_filters(spec, filters)
+    params = [user_id] + filter_params
+
+    cursor_kind = None
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        if sort_value is None:
+            if not spec['nullable']:
+                raise ValueError('Cursor de paginação inválido.')
+            cursor_kind = 'null'
+            params.append(last_id)
+        else:
+            cursor_kind = 'value'
+            params.extend([_parse_date(sort_value, 'cursor'), last_id])
+
+    return _list_statement(table_name, filter_keys, cursor_kind, limited), params, spec
+
+
+def find_page(table_name, user_id, filters=None, limit=None, cursor=None):
+    """Listagem paginada por keyset ordenada por (coluna de data, id).
+
+    Retorna (itens, próximo_cursor). próximo_cursor é None na última página.
+    Sem limit, retorna todas as linhas que passam nos filtros.
+    """
+    stmt, params, spec = _list_query(table_name, user_id, filters, cursor, limit is not None)
+    if limit is not None:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        # Busca uma linha a mais para saber se existe próxima página
+        params.append(limit + 1)
+
+    items = read_query(stmt, tuple(params), user_id)
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last[spec['sort']], last['id'])
+    return items, next_cursor
+
+
+def stream_all(table_name, user_id, filters=None, cursor=None):
+    """Mesma consulta de find_page, mas gerando as linhas em lotes (cursor no servidor)."""
+    stmt, params, _ = _list_query(table_name, user_id, filters, cursor)
+    return stream(stmt, tuple(params))
+
+
+# Busca em description/category (migração 0005). O LIKE usa a mesma expressão
+# do índice de trigramas; a ordem é: descrição começando com o termo, depois
+# word_similarity, depois as mais recentes.
+SEARCH_TRANSACTIONS = statement('transactions_search', f"""
+    SELECT {columns('transactions', 't')}, word_similarity(search_normalize(%s), transaction_search_text(t.description, t.category)) AS rank
+    FROM transactions t
+    WHERE t.user_id = %s
+      AND transaction_search_text(t.description, t.category) LIKE '%%' || search_normalize(%s) || '%%' ESCAPE '\\'
+    ORDER BY transaction_search_text(t.description, t.category) LIKE search_normalize(%s) || '%%' ESCAPE '\\' DESC,
+             rank DESC, t.date DESC, t.id DESC
+    LIMIT %s OFFSET %s
+    """)
+
+SEARCH_MIN_LENGTH = 2
+SEARCH_MAX_LENGTH = 100
+DEFAULT_SEARCH_LIMIT = 50
+
+
+def _search_params(user_id, term, limit, cursor):
+    """Valida a busca e devolve (params, limit, offset, termo)."""
+    term = ' '.join((term or '').split())
+    if len(term) < SEARCH_MIN_LENGTH:
+        raise ValueError(f'A busca precisa de pelo menos {SEARCH_MIN_LENGTH} caracteres.')
+    if len(term) > SEARCH_MAX_LENGTH:
+        raise ValueError(f'A busca aceita no máximo {SEARCH_MAX_LENGTH} caracteres.')
+    limit = max(1, min(int(limit or DEFAULT_SEARCH_LIMIT), MAX_PAGE_SIZE))
+
+    offset = 0
+    if cursor:
+        # Cursor de busca: [deslocamento, termo]; não vale para outro termo
+        offset, cursor_term = decode_cursor(cursor)
+        if cursor_term != term or not isinstance(offset, int) or offset < 0:
+            raise ValueError('Cursor de paginação inválido.')
+
+    pattern = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    params = (term, user_id, pattern, pattern, limit + 1, offset)
+    return params, limit, offset, term
+
+
+def search_transactions(user_id, term, limit=None, cursor=None):
+    """Transações cujo description/category contém o termo (sem diferenciar
+    maiúsculas nem acentos), ordenadas por relevância.
+
+    Retorna (itens, próximo_cursor), como find_page; cada item traz "rank".
+    """
+    params, limit, offset, term = _search_params(user_id, term, limit, cursor)
+    items = query(SEARCH_TRANSACTIONS, params)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(offset + limit, term)
+    return items, next_cursor
+
+
+# Coleções pequenas servidas pelo cache (cache.py) -> ordenações cacheadas.
+# Cada escrita invalida exatamente as chaves (tabela, usuário, ordenação) daqui.
+CACHED_COLLECTIONS = {
+    'categories': ('id', 'name'),
+    'goals': ('id',),
+    'bills': ('id',),
+}
+
+def _cache_key(table_name, user_id, order_by):
+    return f"{table_name}:{user_id}:{order_by}"
+
+def invalidate_cache(table_name, user_id):
+    orderings = CACHED_COLLECTIONS.get(table_name, ())
+    cache.invalidate(*[_cache_key(table_name, user_id, order) for order in orderings])
+
+# Statements genéricos por (tabela, operação), compostos uma única vez
+@lru_cache(maxsize=None)
+def _table_statement(table_name, operation, order_by=None):
+    table = _ident(table_name)
+    if operation == 'find_all':
+        sql_text = f"SELECT {columns(table_name)} FROM {table} WHERE user_id = %s ORDER BY {_ident(order_by)}"
+        return statement(_statement_name(table_name, 'find_all', order_by), sql_text)
+    if operation == 'find_by_id':
+        sql_text = f"SELECT {columns(table_name)} FROM {table} WHERE id = %s AND user_id = %s"
+    elif operation == 'delete':
+        sql_text = f"DELETE FROM {table} WHERE id = %s AND user_id = %s RETURNING {columns(table_name)}"
+    else:
+        raise ValueError(f"Operação desconhecida: {operation}")
+    return statement(_statement_name(table_name, operation), sql_text)
+
+# Função para encontrar um item (usada para Transaction, Goal, Bill, Category)
+def find_all(table_name, user_id, order_by='id', filters=None, limit=None, cursor=None):
+    if filters or limit is not None or cursor:
+        return find_page(table_name, user_id, filters, limit, cursor)[0]
+    stmt = _table_statement(table_name, 'find_all', order_by)
+    # Dentro de uma transação a leitura tem de ver as escritas ainda não commitadas
+    if order_by in CACHED_COLLECTIONS.get(table_name, ()) and not in_transaction():
+        # O cache é preenchido sempre do primário: uma réplica atrasada deixaria
+        # linhas velhas no cache pelo CACHE_TTL inteiro
+        return cache.get_or_load(
+            _cache_key(table_name, user_id, order_by),
+            lambda: query(stmt, (user_id,))
+        )
+    return read_query(stmt, (user_id,), user_id)
 
 def find_by_id(table_name, item_id, user_id):
-    sql_text = sql.SQL("SELECT * FROM {} WHERE id = %s AND user_id = %s").format(
-        sql.Identifier(table_name)
-    )
-    results = query(sql_text, (item_id, user_id))
+    results = read_query(_table_statement(table_name, 'find_by_id'), (item_id, user_id), user_id)
     return results[0] if results else None
 
 def delete(table_name, item_id, user_id):
-    sql_text = sql.SQL("DELETE FROM {} WHERE id = %s AND user_id = %s RETURNING id").format(
-        sql.Identifier(table_name)
-    )
-    results = query(sql_text, (item_id, user_id))
+    with transaction():
+        results = query(_table_statement(table_name, 'delete'), (item_id, user_id))
+        if table_name == 'transactions':
+            for row in results:
+                rollups.remove(row)
+        for row in results:
+            record_tombstone(table_name, row['id'], user_id)
+        if results:
+            record_change(table_name, user_id)
     return len(results) > 0 # Retorna True se algo foi deletado
 
+# --- Versões por coleção (ETag / GET condicional) ---
+
+# Coleções cujo número de versão é incrementado a cada escrita
+VERSIONED_COLLECTIONS = ('transactions', 'goals', 'bills', 'categories')
+
+GET_VERSION = statement(
+    'collection_versions_get',
+    "SELECT version FROM collection_versions WHERE user_id = %s AND collection = %s"
+)
+BUMP_VERSION = statement(
+    'collection_versions_bump',
+    """
+    INSERT INTO collection_versions (user_id, collection, version) VALUES (%s, %s, 1)
+    ON CONFLICT (user_id, collection) DO UPDATE SET version = collection_versions.version + 1
+    """,
+    returns_rows=False
+)
+
+def get_version(collection, user_id):
+    # Do primário: a versão vira ETag e não pode ser de uma réplica atrasada
+    results = query(GET_VERSION, (user_id, collection))
+    return results[0]['version'] if results else 0
+
+def record_change(collection, user_id):
+    """Registra uma escrita na coleção (chamar dentro da transação da escrita).
+
+    Fixa as leituras do usuário no primário (réplicas), incrementa a versão
+    da coleção e agenda a invalidação do cache para depois do commit.
+    """
+    # Read-your-writes: as próximas leituras do usuário vão ao primário
+    pin_primary(user_id)
+    if collection not in VERSIONED_COLLECTIONS:
+        return
+    after_commit(lambda: invalidate_cache(collection, user_id))
+    query(BUMP_VERSION, (user_id, collection))
+
+# --- Sequência de mudanças por usuário (sync incremental, ver sync.py) ---
+
+# Toda linha gravada recebe changed_seq = próximo número da sequência do
+# usuário, e todo DELETE deixa um tombstone com o número da remoção. A linha
+# de change_sequences fica travada até o commit, então a ordem dos números é
+# a ordem dos commits e um cliente nunca "pula" uma mudança.
+SYNC_COLLECTIONS = ('transactions', 'goals', 'bills', 'categories')
+
+RESERVE_CHANGE_SEQ = statement('change_sequences_reserve', """
+    INSERT INTO change_sequences (user_id, seq) VALUES (%s, %s)
+    ON CONFLICT (user_id) DO UPDATE SET seq = change_sequences.seq + EXCLUDED.seq
+    RETURNING seq
+    """)
+RECORD_TOMBSTONE = statement('tombstones_record', """
+    INSERT INTO tombstones (user_id, collection, id, deleted_seq) VALUES (%s, %s, %s, %s)
+    ON CONFLICT (user_id, collection, id) DO UPDATE
+    SET deleted_seq = EXCLUDED.deleted_seq, deleted_at = CURRENT_TIMESTAMP
+    """, returns_rows=False)
+
+def next_change_seq(user_id, count=1):
+    """Reserva `count` números da sequência do usuário e retorna o último.
+
+    Chamar dentro da transação da escrita.
+    """
+    return query(RESERVE_CHANGE_SEQ, (user_id, count))[0]['seq']
+
+def record_tombstone(collection, item_id, user_id):
+    query(RECORD_TOMBSTONE, (user_id, collection, item_id, next_change_seq(user_id)))
+
 # --- Implementação CRUD Específica ---
 
 # Transações
+CREATE_TRANSACTION = statement('transactions_create', f"""
+    INSERT INTO transactions (id, user_id, date, description, category, type, amount, changed_seq) 
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s) 
+    RETURNING {columns('transactions')}
+    """)
+UPDATE_TRANSACTION = statement('transactions_update', f"""
+    UPDATE transactions 
+    SET date = %s, description = %s, category = %s, type = %s, amount = %s, changed_seq = %s 
+    WHERE id = %s AND user_id = %s 
+    RETURNING {columns('transactions')}
+    """)
+LOCK_TRANSACTION = statement(
+    'transactions_lock_by_id',
+    f"SELECT {columns('transactions')} FROM transactions WHERE id = %s AND user_id = %s FOR UPDATE"
+)
+
 def create_transaction(item, user_id):
     new_id = str(uuid.uuid4())
-    sql_text = """
-    INSERT INTO transactions (id, user_id, date, description, category, type, amount) 
-    VALUES (%s, %s, %s, %s, %s, %s, %s) 
-    RETURNING *
-    """
     params = (new_id, user_id, item['date'], item['description'], item['category'], item['type'], item['amount'])
-    return query(sql_text, params)[0]
+    # O rollup mensal é atualizado na mesma transação do INSERT
+    with transaction():
+        created = query(CREATE_TRANSACTION, params + (next_change_seq(user_id),))[0]
+        rollups.add(created)
+        record_change('transactions', user_id)
+    return created
 
 def update_transaction(item_id, item, user_id):
-    sql_text = """
-    UPDATE transactions 
-    SET date = %s, description = %s, category = %s, type = %s, amount = %s 
-    WHERE id = %s AND user_id = %s 
-    RETURNING *
-    """
-    params = (item['date'], item['description'], item['category'], item['type'], item['amount'], item_id, user_id)
-    results = query(sql_text, params)
-    return results[0] if results else None
+    params = (item['date'], item['description'], item['category'], item['type'], item['amount'])
+    with transaction():
+        # Trava a linha para aplicar no rollup o delta (antigo -> novo)
+        previous = query(LOCK_TRANSACTION, (item_id, user_id))
+        if not previous:
+            return None
+        results = query(UPDATE_TRANSACTION, params + (next_change_seq(user_id), item_id, user_id))
+        rollups.remove(previous[0])
+        rollups.add(results[0])
+        record_change('transactions', user_id)
+    return results[0]
 
 # Metas
+CREATE_GOAL = statement('goals_create', f"""
+    INSERT INTO goals (id, user_id, name, amount, saved, target_date, changed_seq) 
+    VALUES (%s, %s, %s, %s, %s, %s, %s) 
+    RETURNING {columns('goals')}
+    """)
+UPDATE_GOAL = statement('goals_update', f"""
+    UPDATE goals 
+    SET name = %s, amount = %s, saved = %s, target_date = %s, changed_seq = %s 
+    WHERE id = %s AND user_id = %s 
+    RETURNING {columns('goals')}
+    """)
+
 def create_goal(item, user_id):
     new_id = str(uuid.uuid4())
-    sql_text = """
-    INSERT INTO goals (id, user_id, name, amount, saved, target_date) 
-    VALUES (%s, %s, %s, %s, %s, %s) 
-    RETURNING *
-    """
     params = (new_id, user_id, item['name'], item['amount'], item.get('saved', 0), item['target_date'])
-    return query(sql_text, params)[0]
+    with transaction():
+        created = query(CREATE_GOAL, params + (next_change_seq(user_id),))[0]
+        record_change('goals', user_id)
+    return created
+
+# Trava a linha antes de reservar o número da sequência de mudanças: um id
+# inexistente não consome (nem trava) a sequência do usuário
+LOCK_GOAL = statement('goals_lock_by_id', "SELECT id FROM goals WHERE id = %s AND user_id = %s FOR UPDATE")
 
 def update_goal(item_id, item, user_id):
     target_date_clean = item['target_date'].split('T')[0] if 'T' in item['target_date'] else item['target_date']
     
-    sql_text = """
-    UPDATE goals 
-    SET name = %s, amount = %s, saved = %s, target_date = %s 
-    WHERE id = %s AND user_id = %s 
-    RETURNING *
-    """
-    params = (item['name'], item['amount'], item['saved'], target_date_clean, item_id, user_id)
-    results = query(sql_text, params)
-    return results[0] if results else None
+    params = (item['name'], item['amount'], item['saved'], target_date_clean)
+    with transaction():
+        if not query(LOCK_GOAL, (item_id, user_id)):
+            return None
+        results = query(UPDATE_GOAL, params + (next_change_seq(user_id), item_id, user_id))
+        record_change('goals', user_id)
+    return results[0]
 
 # Contas (Bills)
+CREATE_BILL = statement('bills_create', f"""
+    INSERT INTO bills (id, user_id, description, amount, due_date, paid, changed_seq) 
+    VALUES (%s, %s, %s, %s, %s, %s, %s) 
+    RETURNING {columns('bills')}
+    """)
+UPDATE_BILL = statement('bills_update', f"""
+    UPDATE bills 
+    SET description = %s, amount = %s, due_date = %s, paid = %s, changed_seq = %s 
+    WHERE id = %s AND user_id = %s 
+    RETURNING {columns('bills')}
+    """)
+
 def create_bill(item, user_id):
     new_id = str(uuid.uuid4())
-    sql_text = """
-    INSERT INTO bills (id, user_id, description, amount, due_date, paid) 
-    VALUES (%s, %s, %s, %s, %s, %s) 
-    RETURNING *
-    """
     params = (new_id, user_id, item['description'], item['amount'], item['due_date'], item.get('paid', False))
-    return query(sql_text, params)[0]
+    with transaction():
+        created = query(CREATE_BILL, params + (next_change_seq(user_id),))[0]
+        record_change('bills', user_id)
+    return created
+
+LOCK_BILL = statement('bills_lock_by_id', "SELECT id FROM bills WHERE id = %s AND user_id = %s FOR UPDATE")
 
 def update_bill(item_id, item, user_id):
     # Usado para marcar como pago
-    sql_text = """
-    UPDATE bills 
-    SET description = %s, amount = %s, due_date = %s, paid = %s 
-    WHERE id = %s AND user_id = %s 
-    RETURNING *
-    """
-    params = (item['description'], item['amount'], item['due_date'], item['paid'], item_id, user_id)
-    results = query(sql_text, params)
-    return results[0] if results else None
+    params = (item['description'], item['amount'], item['due_date'], item['paid'])
+    with transaction():
+        if not query(LOCK_BILL, (item_id, user_id)):
+            return None
+        results = query(UPDATE_BILL, params + (next_change_seq(user_id), item_id, user_id))
+        record_change('bills', user_id)
+    return results[0]
 
 # Categorias (Simples)
+# Usa o índice único (user_id, name) em vez de carregar a lista inteira
+FIND_CATEGORY_BY_NAME = statement(
+    'categories_find_by_name',
+    f"SELECT {columns('categories')} FROM categories WHERE user_id = %s AND name = %s"
+)
+CREATE_CATEGORY = statement(
+    'categories_create',
+    "INSERT INTO categories (id, user_id, name, changed_seq) VALUES (%s, %s, %s, %s) "
+    f"RETURNING {columns('categories')}"
+)
+DELETE_CATEGORY_BY_NAME = statement(
+    'categories_delete_by_name',
+    "DELETE FROM categories WHERE name = %s AND user_id = %s RETURNING id"
+)
+
 def find_all_categories(user_id):
     return find_all('categories', user_id, order_by='name')
 
+# Criadas na primeira leitura das categorias de um usuário sem nenhuma
+# (GET /api/categories e GET /api/dashboard)
+DEFAULT_CATEGORIES = ('Alimentação', 'Transporte')
+HAS_CATEGORIES = statement('categories_exists', "SELECT 1 FROM categories WHERE user_id = %s LIMIT 1")
+
+def find_categories_or_defaults(user_id):
+    """Categorias do usuário; cria as DEFAULT_CATEGORIES se ele não tiver nenhuma."""
+    categories = find_all_categories(user_id)
+    if categories:
+        return categories
+    # Uma única transação para todas. Reservar 0 números da sequência só trava
+    # a linha do usuário em change_sequences: duas primeiras leituras
+    # simultâneas (dashboard e categorias) não criam as padrão duas vezes
+    with transaction():
+        next_change_seq(user_id, 0)
+        if not query(HAS_CATEGORIES, (user_id,)):
+            for name in DEFAULT_CATEGORIES:
+                create_category(name, user_id)
+    return find_all_categories(user_id)
+
+def find_category_by_name(name, user_id):
+    results = query(FIND_CATEGORY_BY_NAME, (user_id, name))
+    return results[0] if results else None
+
 def create_category(name, user_id):
     new_id = str(uuid.uuid4())
-    sql_text = "INSERT INTO categories (id, user_id, name) VALUES (%s, %s, %s) RETURNING *"
-    return query(sql_text, (new_id, user_id, name))[0]
+    with transaction():
+        created = query(CREATE_CATEGORY, (new_id, user_id, name, next_change_seq(user_id)))[0]
+        record_change('categories', user_id)
+    return created
 
 def delete_category(category_name, user_id):
     # Encontra o ID primeiro, pois o DELETE do frontend usa o NOME
     # Isso requer lógica manual para mapear nome para ID no data_manager
     # Assumindo que você tem um ID para a categoria:
-    sql_text = "DELETE FROM categories WHERE name = %s AND user_id = %s RETURNING id"
-    results = query(sql_text, (category_name, user_id))
-    return len(results) > 0
\ No newline at end of file
+    with transaction():
+        results = query(DELETE_CATEGORY_BY_NAME, (category_name, user_id))
+        for row in results:
+            record_tombstone('categories', row['id'], user_id)
+        if results:
+            record_change('categories', user_id)
+    return len(results) > 0
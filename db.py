@@ -1,85 +1,912 @@
 # db.py
 
 import os
+import time
+import sqlite3
+import threading
+import itertools
+import uuid
+from contextlib import contextmanager
 import psycopg2
+import psycopg2.extensions
+import psycopg2.errors
 from urllib.parse import urlparse
-from psycopg2.sql import Composed # <--- CORREÇÃO!
+
+import cache
+import metrics
 
 # Render deve ter a DATABASE_URL configurada
 DATABASE_URL = os.environ.get('DATABASE_URL')
+# Backend de armazenamento escolhido pelo esquema da URL: postgres://... (padrão)
+# ou sqlite:///arquivo.db / sqlite:///:memory: (testes e benchmarks sem servidor)
+BACKEND = 'sqlite' if (DATABASE_URL or '').startswith('sqlite:') else 'postgres'
 
-def get_connection():
-    if not DATABASE_URL:
+# Configuração do pool de conexões (uma instância por processo/worker do gunicorn)
+POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN', '1'))
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX', '10'))
+# Tempo máximo (s) esperando uma conexão livre antes de falhar
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+# Conexões mais velhas que isso (s) são fechadas e recriadas no checkout
+POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', '1800'))
+# Conexões ociosas há mais que isso (s) recebem um "SELECT 1" antes de serem usadas
+POOL_CHECK_IDLE = float(os.environ.get('DB_POOL_CHECK_IDLE', '30'))
+# Linhas buscadas por ida ao servidor nos cursores nomeados de stream()
+STREAM_BATCH_SIZE = int(os.environ.get('DB_STREAM_BATCH_SIZE', '1000'))
+# PREPARE/EXECUTE nas conexões do pool (desligar atrás de pgbouncer em modo transaction)
+USE_PREPARED = os.environ.get('DB_PREPARED_STATEMENTS', '1').lower() not in ('0', 'false', 'no')
+# Consultas mais lentas que isso (ms) são logadas (0 desliga o log)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '500'))
+
+# Réplicas de leitura (opcional, só Postgres): DSNs separados por vírgula.
+# read_query() distribui as leituras entre elas; escritas e transações
+# continuam no DATABASE_URL (primário).
+REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_POOL_MAX_SIZE = int(os.environ.get('DB_REPLICA_POOL_MAX', str(POOL_MAX_SIZE)))
+# Réplica que falhar (conexão ou atraso) sai do rodízio por esse tempo (s)
+REPLICA_EJECT_SECONDS = float(os.environ.get('DB_REPLICA_EJECT_SECONDS', '30'))
+# Atraso de replicação máximo aceito (s), medido a cada REPLICA_CHECK_INTERVAL s
+REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', '10'))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', '5'))
+# Depois de uma escrita o usuário lê do primário por esse tempo (s): read-your-writes.
+# Uma réplica no rodízio pode estar até REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL
+# atrasada, então o pin nunca é menor que isso.
+_PIN_FLOOR = REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL
+PRIMARY_PIN_SECONDS = float(os.environ.get('DB_PRIMARY_PIN_SECONDS', str(_PIN_FLOOR)))
+if REPLICA_URLS and PRIMARY_PIN_SECONDS < _PIN_FLOOR:
+    print(f"Aviso: DB_PRIMARY_PIN_SECONDS={PRIMARY_PIN_SECONDS:g} é menor que o atraso "
+          f"possível das réplicas; usando {_PIN_FLOOR:g}s.")
+    PRIMARY_PIN_SECONDS = _PIN_FLOOR
+# Processos do servidor (o gunicorn lê a mesma variável): com mais de um, os
+# pins precisam de um backend compartilhado (CACHE_URL=redis://...)
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+
+def get_connection(dsn=None):
+    dsn = dsn or DATABASE_URL
+    if not dsn:
         raise Exception("DATABASE_URL não configurada no ambiente do Render.")
 
     try:
         # A biblioteca psycopg2 se conecta diretamente via URI
-        conn = psycopg2.connect(DATABASE_URL)
+        conn = psycopg2.connect(dsn)
         return conn
     except Exception as e:
         print(f"Erro ao conectar ao PostgreSQL: {e}")
         raise
 
-def query(text, params=None, fetch_all=True):
-    """Executa uma consulta SQL e retorna os resultados como lista de dicionários."""
-    conn = None
-    try:
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        if isinstance(text, Composed):
-            # Obtém a string final da consulta formatada
-            check_text = text.as_string(conn) 
+
+class Statement:
+    """SQL composto uma única vez, com a flag explícita "retorna linhas".
+
+    query() executa instâncias de Statement sem renderizar nem inspecionar o
+    texto: com USE_PREPARED cada conexão do pool faz PREPARE na primeira vez e
+    depois só EXECUTE. Os nomes das colunas também ficam guardados aqui.
+    """
+
+    __slots__ = ('name', 'text', 'returns_rows', 'prepare_sql', 'execute_sql', 'columns')
+
+    def __init__(self, name, text, returns_rows):
+        self.name = name
+        self.text = text
+        self.returns_rows = returns_rows
+        self.columns = None
+
+        # "%s" -> "$1", "$2"... para o PREPARE; "%%" vira "%" literal
+        pieces = text.split('%%')
+        count = 0
+        converted = []
+        for piece in pieces:
+            parts = piece.split('%s')
+            out = parts[0]
+            for part in parts[1:]:
+                count += 1
+                out += f"${count}" + part
+            converted.append(out)
+        self.prepare_sql = f'PREPARE "{name}" AS ' + '%'.join(converted)
+        if count:
+            self.execute_sql = f'EXECUTE "{name}" (' + ', '.join(['%s'] * count) + ')'
         else:
-            check_text = text
-        
+            self.execute_sql = f'EXECUTE "{name}"'
+
+    def __repr__(self):
+        return f"<Statement {self.name}>"
+
+
+# Registro global: (nome) -> Statement
+_statements = {}
+_statements_lock = threading.Lock()
+# id(conexão) -> nomes já preparados nela
+_prepared = {}
+
+
+def statement(name, text, returns_rows=True):
+    """Registra (ou devolve o já registrado) o Statement com esse nome."""
+    stmt = _statements.get(name)
+    if stmt is None:
+        with _statements_lock:
+            stmt = _statements.get(name)
+            if stmt is None:
+                if len(name) > 63:
+                    raise ValueError(f"Nome de statement longo demais: {name}")
+                stmt = Statement(name, text, returns_rows)
+                _statements[name] = stmt
+    return stmt
+
+
+class ConnectionPool:
+    """Pool de conexões thread-safe com health check, reciclagem e estatísticas.
+
+    Checkout bloqueia até POOL_TIMEOUT segundos quando todas as conexões estão
+    em uso. Conexões mais velhas que max_lifetime são recicladas e as que
+    ficaram ociosas por mais de check_idle segundos recebem um "SELECT 1"
+    antes de serem entregues.
+
+    Também é a interface de backend usada por query()/stream()/copy_in()/
+    copy_out(): execute(), iterate(), copy_in() e copy_out() recebem a
+    conexão já reservada. O
+    sqlite_db.SQLitePool implementa os mesmos métodos.
+    """
+
+    dialect = 'postgres'
+
+    def __init__(self, minconn, maxconn, timeout=POOL_TIMEOUT,
+                 max_lifetime=POOL_MAX_LIFETIME, check_idle=POOL_CHECK_IDLE, dsn=None):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        self.pid = os.getpid()
+
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = []   # conexões livres (LIFO: a mais "quente" primeiro)
+        self._meta = {}   # id(conn) -> [criada_em, devolvida_em]
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'failed_checks': 0,
+        }
+        self.in_use = 0
+
+        # Pré-aquece o mínimo de conexões
+        for _ in range(minconn):
+            conn = self._connect()
+            self._idle.append(conn)
+
+    def _connect(self):
+        started = time.perf_counter()
+        conn = get_connection(self.dsn)
+        metrics.DB_CONNECT_LATENCY.observe(time.perf_counter() - started)
+        now = time.monotonic()
+        with self._lock:
+            self._meta[id(conn)] = [now, now]
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._meta.pop(id(conn), None)
+        _prepared.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        meta = self._meta.get(id(conn))
+        if meta is None:
+            return False
+        now = time.monotonic()
+        if self.max_lifetime and now - meta[0] > self.max_lifetime:
+            with self._lock:
+                self._stats['recycled'] += 1
+            return False
+        if self.check_idle is not None and now - meta[1] > self.check_idle:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+            except Exception:
+                with self._lock:
+                    self._stats['failed_checks'] += 1
+                return False
+        return True
+
+    def getconn(self):
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            acquired = self._slots.acquire(timeout=self.timeout)
+            waited = time.monotonic() - started
+            metrics.DB_POOL_WAIT.observe(waited)
+            with self._lock:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += waited
+                if not acquired:
+                    self._stats['timeouts'] += 1
+            if not acquired:
+                raise Exception(
+                    f"Pool de conexões esgotado: nenhuma conexão livre em {self.timeout}s."
+                )
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    conn = self._connect()
+                    break
+                if self._healthy(conn):
+                    break
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self.in_use += 1
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            if not close and not conn.closed:
+                # Devolve a conexão em estado consistente
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        close = True
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    meta = self._meta.get(id(conn))
+                    if meta:
+                        meta[1] = time.monotonic()
+                    self._idle.append(conn)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def execute(self, conn, text, params):
+        return _execute(conn, text, params)
+
+    def iterate(self, conn, text, params, batch_size):
+        # Cursor nomeado (server-side): só um lote fica em memória por vez
+        cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cur.itersize = batch_size
         cur.execute(text, params)
-        
-        # Se for um SELECT, busca os resultados e converte para JSON-friendly
-        if check_text.strip().upper().startswith('SELECT') and fetch_all:
-            result = cur.fetchall()
-            col_names = [desc[0] for desc in cur.description]
-            data = [dict(zip(col_names, row)) for row in result]
-            return data
-        else:
-            # Para INSERT, UPDATE, DELETE e CREATE
-            if cur.description is not None:
-                # Se houver descrição, há linhas retornadas (do RETURNING *)
-                result = cur.fetchall()
+        col_names = None
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            if col_names is None:
                 col_names = [desc[0] for desc in cur.description]
-                data = [dict(zip(col_names, row)) for row in result]
-                conn.commit()
-                # Retorna o primeiro item inserido/atualizado
-                return data 
+            for row in rows:
+                yield dict(zip(col_names, row))
+        cur.close()
+
+    def copy_in(self, conn, copy_sql, file):
+        cur = conn.cursor()
+        try:
+            cur.copy_expert(copy_sql, file)
+        finally:
+            cur.close()
+
+    def copy_out(self, conn, copy_sql, params, file):
+        cur = conn.cursor()
+        try:
+            # COPY não aceita parâmetros: o mogrify interpola os literais escapados
+            cur.copy_expert(cur.mogrify(copy_sql, params).decode('utf-8'), file)
+            return cur.rowcount
+        finally:
+            cur.close()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                'backend': 'postgres',
+                'pid': self.pid,
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'in_use': self.in_use,
+                'idle': len(self._idle),
+                'open': len(self._meta),
+            })
+        return data
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+# Pools herdados de outro processo: mantidos vivos para que o coletor de lixo
+# não feche (e encerre no servidor) conexões que pertencem ao processo pai.
+_inherited_pools = []
+
+
+def get_pool():
+    """Retorna o pool do processo atual, criando-o sob demanda.
+
+    Após um fork (gunicorn --preload) o pool herdado do processo pai é
+    descartado sem fechar os sockets, que continuam pertencendo ao pai.
+    """
+    global _pool
+    if not DATABASE_URL:
+        raise Exception("DATABASE_URL não configurada no ambiente do Render.")
+
+    pid = os.getpid()
+    if _pool is not None and _pool.pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != pid:
+            if _pool is not None:
+                _inherited_pools.append(_pool)
+            if BACKEND == 'sqlite':
+                from sqlite_db import SQLitePool, parse_url
+                _pool = SQLitePool(parse_url(DATABASE_URL), POOL_MAX_SIZE, POOL_TIMEOUT)
             else:
-                conn.commit()
-                return None
-            
-    except Exception as e:
-        if conn:
+                _pool = ConnectionPool(POOL_MIN_SIZE, POOL_MAX_SIZE)
+        return _pool
+
+
+def close_pool():
+    global _pool, _replicas
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        if _replicas_pid == os.getpid():
+            for replica in _replicas:
+                replica.pool.closeall()
+        _replicas = None
+
+
+def pool_stats():
+    """Estatísticas do pool do processo atual (vazio se o pool ainda não existe)."""
+    current = _pool
+    if current is None or current.pid != os.getpid():
+        return {}
+    data = current.stats()
+    if _replicas is not None and _replicas_pid == os.getpid():
+        data['replicas'] = [replica.stats() for replica in _replicas]
+    return data
+
+
+# --- Réplicas de leitura ---
+
+# Atraso da réplica em segundos; 0 quando ela já aplicou tudo que recebeu
+# (um primário ocioso não gera transações novas para "alcançar")
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class Replica:
+    """Uma réplica de leitura: pool próprio e estado de saúde."""
+
+    def __init__(self, dsn):
+        parsed = urlparse(dsn)
+        # Identificação sem usuário/senha, para stats e logs
+        self.name = f"{parsed.hostname or 'local'}:{parsed.port or 5432}{parsed.path}"
+        self.dsn = dsn  # adb.py abre o próprio pool async com o mesmo endereço
+        self.pool = ConnectionPool(0, REPLICA_POOL_MAX_SIZE, dsn=dsn)
+        self.ejected_until = 0.0
+        self.checked_at = 0.0
+        self.lag = None
+        self.reads = 0
+        self.ejections = 0
+        self._check_lock = threading.Lock()
+
+    def available(self):
+        now = time.monotonic()
+        if now < self.ejected_until:
+            return False
+        # Só uma thread mede o atraso; as outras seguem com o último resultado
+        if now - self.checked_at >= REPLICA_CHECK_INTERVAL and self._check_lock.acquire(blocking=False):
+            try:
+                self.checked_at = now
+                self._check_lag()
+            finally:
+                self._check_lock.release()
+        return time.monotonic() >= self.ejected_until
+
+    def _check_lag(self):
+        try:
+            conn = self.pool.getconn()
+        except Exception as e:
+            self.eject(f"conexão falhou: {e}")
+            return
+        try:
+            cur = conn.cursor()
+            cur.execute(REPLICA_LAG_SQL)
+            self.lag = float(cur.fetchone()[0])
+            cur.close()
             conn.rollback()
+        except Exception as e:
+            self.pool.putconn(conn, close=True)
+            self.eject(f"verificação falhou: {e}")
+            return
+        self.pool.putconn(conn)
+        if self.lag > REPLICA_MAX_LAG:
+            self.eject(f"atraso de {self.lag:.1f}s (máximo {REPLICA_MAX_LAG:.0f}s)")
+
+    def eject(self, reason):
+        self.ejected_until = time.monotonic() + REPLICA_EJECT_SECONDS
+        self.ejections += 1
+        metrics.DB_REPLICA_EJECTIONS.inc(self.name)
+        # Conexões ociosas provavelmente estão quebradas também
+        self.pool.closeall()
+        print(f"Réplica {self.name} fora do rodízio por {REPLICA_EJECT_SECONDS:.0f}s: {reason}")
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'healthy': time.monotonic() >= self.ejected_until,
+            'lag': self.lag,
+            'reads': self.reads,
+            'ejections': self.ejections,
+            'in_use': self.pool.in_use,
+        }
+
+
+_replicas = None
+_replicas_pid = None
+_replica_turn = itertools.count()
+
+
+def _replicas_enabled():
+    if not REPLICA_URLS or BACKEND != 'postgres':
+        return False
+    if WEB_CONCURRENCY > 1 and not cache.CACHE_URL:
+        # O pin gravado por um worker não seria visto pelos outros: read-your-writes quebraria
+        return False
+    return True
+
+
+if REPLICA_URLS and WEB_CONCURRENCY > 1 and not cache.CACHE_URL:
+    print("Aviso: DATABASE_REPLICA_URLS ignorado: com WEB_CONCURRENCY > 1 o pin de primário "
+          "precisa de CACHE_URL=redis://... compartilhado entre os workers.")
+
+
+def get_replicas():
+    """Réplicas do processo atual (lista vazia sem DATABASE_REPLICA_URLS)."""
+    global _replicas, _replicas_pid
+    if not _replicas_enabled():
+        return []
+    pid = os.getpid()
+    if _replicas is not None and _replicas_pid == pid:
+        return _replicas
+    with _pool_lock:
+        if _replicas is None or _replicas_pid != pid:
+            # Como em get_pool(): pools herdados do pai não são fechados aqui
+            _replicas = [Replica(dsn) for dsn in REPLICA_URLS]
+            _replicas_pid = pid
+        return _replicas
+
+
+def _pick_replica():
+    """Próxima réplica saudável em rodízio, ou None se todas estão fora."""
+    replicas = get_replicas()
+    if not replicas:
+        return None
+    start = next(_replica_turn)
+    for i in range(len(replicas)):
+        replica = replicas[(start + i) % len(replicas)]
+        if replica.available():
+            return replica
+    return None
+
+
+def _pin_key(user_id):
+    return f"primary-pin:{user_id}"
+
+
+# Pins do processo (sem CACHE_URL): dicionário próprio, fora do LRU do cache.py,
+# para um pin não ser descartado por falta de espaço antes de expirar
+_pins = {}  # user_id -> expira_em (monotonic)
+_pins_lock = threading.Lock()
+
+
+def pin_primary(user_id):
+    """Faz as leituras do usuário irem ao primário por PRIMARY_PIN_SECONDS.
+
+    Chamado a cada escrita (data_manager.record_change). Com CACHE_URL o
+    marcador fica no Redis e vale para todos os workers; sem ele, num
+    dicionário do processo (réplicas só são usadas com um worker).
+    """
+    if not REPLICA_URLS or not user_id or PRIMARY_PIN_SECONDS <= 0:
+        return
+    if not cache.CACHE_URL:
+        now = time.monotonic()
+        with _pins_lock:
+            if len(_pins) > 10000:
+                for key in [k for k, until in _pins.items() if until <= now]:
+                    del _pins[key]
+            _pins[user_id] = now + PRIMARY_PIN_SECONDS
+        return
+    try:
+        cache.get_backend().set(_pin_key(user_id), b'1', PRIMARY_PIN_SECONDS)
+    except Exception as e:
+        print(f"Aviso: falha ao gravar o pin de primário: {e}")
+
+
+def _pinned(user_id):
+    if not user_id or PRIMARY_PIN_SECONDS <= 0:
+        return False
+    if not cache.CACHE_URL:
+        with _pins_lock:
+            return _pins.get(user_id, 0) > time.monotonic()
+    try:
+        return cache.get_backend().get(_pin_key(user_id)) is not None
+    except Exception:
+        # Sem como saber se o usuário escreveu há pouco: o primário é o seguro
+        return True
+
+
+def read_query(text, params=None, user_id=None):
+    """query() para leituras que toleram réplica.
+
+    Vai para uma réplica saudável quando há DATABASE_REPLICA_URLS, fora de
+    transaction() e se o usuário (user_id) não escreveu nos últimos
+    PRIMARY_PIN_SECONDS; senão, e se a réplica falhar, usa o primário.
+    """
+    if getattr(_local, 'conn', None) is not None or not get_replicas() or _pinned(user_id):
+        return query(text, params)
+    replica = _pick_replica()
+    if replica is None:
+        return query(text, params)
+
+    try:
+        conn = replica.pool.getconn()
+    except Exception as e:
+        replica.eject(f"conexão falhou: {e}")
+        return query(text, params)
+    started = time.perf_counter()
+    broken = None
+    try:
+        data = replica.pool.execute(conn, text, params)
+        conn.rollback()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        # Problema da réplica (queda, conflito com recovery): tenta no primário
+        broken = e
+    except Exception as e:
+        _record_query(text, started, failed=True)
+        raise Exception(f"Erro na consulta SQL: {e}")
+    finally:
+        replica.pool.putconn(conn, close=broken is not None)
+    if broken is not None:
+        _record_query(text, started, failed=True)
+        replica.eject(str(broken).strip())
+        return query(text, params)
+    _record_query(text, started, len(data) if data else 0)
+    replica.reads += 1
+    metrics.DB_REPLICA_READS.inc(replica.name)
+    return data
+
+
+@contextmanager
+def transaction():
+    """Agrupa várias chamadas de query() em uma única conexão e transação.
+
+    Uso:
+        with transaction():
+            create_transaction(...)
+            delete(...)
+
+    Faz commit ao sair normalmente e rollback se ocorrer exceção. Blocos
+    aninhados reutilizam a transação externa.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+
+    pool = get_pool()
+    conn = pool.getconn()
+    _local.conn = conn
+    _local.callbacks = []
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        callbacks, _local.callbacks = _local.callbacks, []
+        _local.conn = None
+        pool.putconn(conn)
+    # Só chega aqui depois de um commit bem-sucedido
+    for callback in callbacks:
+        callback()
+
+
+def in_transaction():
+    return getattr(_local, 'conn', None) is not None
+
+
+@contextmanager
+def savepoint():
+    """SAVEPOINT dentro de transaction(): uma exceção desfaz só o bloco.
+
+    A exceção continua propagando; quem chama decide se a transação segue.
+    Callbacks de after_commit() agendados no bloco desfeito ainda rodam no
+    commit (hoje são só invalidações de cache, inofensivas se sobrarem).
+    """
+    if not in_transaction():
+        raise Exception("savepoint() deve ser chamado dentro de transaction().")
+    depth = getattr(_local, 'savepoints', 0) + 1
+    _local.savepoints = depth
+    name = f"sp_{depth}"
+    try:
+        query(f"SAVEPOINT {name}", fetch_all=False)
+        try:
+            yield
+        except Exception:
+            query(f"ROLLBACK TO SAVEPOINT {name}", fetch_all=False)
+            raise
+        query(f"RELEASE SAVEPOINT {name}", fetch_all=False)
+    finally:
+        _local.savepoints = depth - 1
+
+
+def after_commit(callback):
+    """Agenda callback() para depois do commit da transação atual.
+
+    Fora de transaction() roda na hora (query() já faz commit). Se a
+    transação sofrer rollback, os callbacks são descartados.
+    """
+    if in_transaction():
+        _local.callbacks.append(callback)
+    else:
+        callback()
+
+
+def _collect_pool_metrics():
+    stats = pool_stats()
+    if not stats:
+        return []
+    return [
+        ('db_pool_connections', 'gauge', 'Conexões do pool por estado.', {'state': 'in_use'}, stats['in_use']),
+        ('db_pool_connections', 'gauge', 'Conexões do pool por estado.', {'state': 'idle'}, stats['idle']),
+        ('db_pool_max_size', 'gauge', 'Tamanho máximo do pool.', None, stats['max_size']),
+        ('db_pool_checkouts_total', 'counter', 'Conexões entregues pelo pool.', None, stats['checkouts']),
+        ('db_pool_timeouts_total', 'counter', 'Checkouts que estouraram DB_POOL_TIMEOUT.', None, stats['timeouts']),
+        ('db_pool_created_total', 'counter', 'Conexões abertas pelo pool.', None, stats['created']),
+    ]
+
+
+metrics.register_collector(_collect_pool_metrics)
+
+
+def _record_query(text, started, rows=None, failed=False):
+    """Métricas por statement e log de consulta lenta (compartilhado com adb.py)."""
+    elapsed = time.perf_counter() - started
+    label = text.name if isinstance(text, Statement) else 'adhoc'
+    metrics.DB_QUERY_LATENCY.observe(elapsed, label)
+    if failed:
+        metrics.DB_QUERY_ERRORS.inc(label)
+    elif rows:
+        metrics.DB_QUERY_ROWS.inc(label, amount=rows)
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        metrics.DB_SLOW_QUERIES.inc(label)
+        sql_text = ' '.join(str(text.text if isinstance(text, Statement) else text).split())
+        print(f"Consulta lenta ({elapsed * 1000:.0f} ms) [{label}]: {sql_text[:300]}")
+
+
+def _run_statement(conn, cur, stmt, params):
+    if not USE_PREPARED:
+        cur.execute(stmt.text, params)
+        return
+    prepared = _prepared.setdefault(id(conn), set())
+    if stmt.name not in prepared:
+        cur.execute(stmt.prepare_sql)
+        prepared.add(stmt.name)
+    cur.execute(stmt.execute_sql, params)
+
+
+def _forget_statement(conn, stmt):
+    """Descarta o PREPARE e as colunas guardadas de um statement (schema mudou)."""
+    stmt.columns = None
+    prepared = _prepared.get(id(conn))
+    if prepared is None or stmt.name not in prepared:
+        return
+    prepared.discard(stmt.name)
+    cur = conn.cursor()
+    try:
+        cur.execute(f'DEALLOCATE "{stmt.name}"')
+    finally:
+        cur.close()
+
+
+def _execute_statement(conn, cur, stmt, params):
+    try:
+        _run_statement(conn, cur, stmt, params)
+    except psycopg2.errors.FeatureNotSupported:
+        # "cached plan must not change result type": uma migração mudou a tabela
+        # depois do PREPARE nesta conexão. Fora de transaction() dá para desfazer
+        # e repetir uma vez; dentro, a transação já abortou e o erro sobe (o
+        # PREPARE é refeito na próxima vez que a conexão for usada).
+        conn.rollback()
+        _forget_statement(conn, stmt)
+        if getattr(_local, 'conn', None) is conn:
+            raise
+        _run_statement(conn, cur, stmt, params)
+
+    if not stmt.returns_rows:
+        return None
+    result = cur.fetchall()
+    col_names = stmt.columns
+    if col_names is None or len(col_names) != len(cur.description):
+        col_names = stmt.columns = [desc[0] for desc in cur.description]
+    return [dict(zip(col_names, row)) for row in result]
+
+
+def _execute(conn, text, params):
+    cur = conn.cursor()
+    try:
+        if isinstance(text, Statement):
+            return _execute_statement(conn, cur, text, params)
+
+        cur.execute(text, params)
+
+        # SELECT ou RETURNING: há descrição, então há linhas para converter
+        if cur.description is not None:
+            result = cur.fetchall()
+            col_names = [desc[0] for desc in cur.description]
+            return [dict(zip(col_names, row)) for row in result]
+        # Para INSERT, UPDATE, DELETE e CREATE sem RETURNING
+        return None
+    finally:
+        cur.close()
+
+
+def query(text, params=None, fetch_all=True):
+    """Executa uma consulta SQL e retorna os resultados como lista de dicionários.
+
+    Dentro de um bloco transaction() usa a conexão da transação e não faz
+    commit; fora dele pega uma conexão do pool e faz commit imediatamente.
+    """
+    pool = get_pool()
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        started = time.perf_counter()
+        try:
+            data = pool.execute(conn, text, params)
+        except Exception as e:
+            _record_query(text, started, failed=True)
+            raise Exception(f"Erro na consulta SQL: {e}")
+        _record_query(text, started, len(data) if data else 0)
+        return data
+
+    conn = pool.getconn()
+    started = time.perf_counter()
+    try:
+        data = pool.execute(conn, text, params)
+        conn.commit()
+        _record_query(text, started, len(data) if data else 0)
+        return data
+    except Exception as e:
+        _record_query(text, started, failed=True)
+        conn.rollback()
         # Captura e relança exceções SQL (ex: chave duplicada, erro de constraint)
         raise Exception(f"Erro na consulta SQL: {e}")
     finally:
-        if conn:
-            conn.close()
+        pool.putconn(conn)
+
+
+def is_data_error(exc):
+    """True se a falha de query() veio de um valor inválido enviado pelo cliente.
+
+    query() relança tudo como Exception("Erro na consulta SQL: ..."); a causa
+    original fica na cadeia da exceção. DataError do driver (data, número ou
+    texto fora do tipo da coluna) e erros de conversão do SQLite viram 400 em
+    quem chama, sem repassar o texto do driver.
+    """
+    cause = exc.__cause__ or exc.__context__
+    while cause is not None:
+        if isinstance(cause, (psycopg2.DataError, sqlite3.DataError, ValueError, ArithmeticError)):
+            return True
+        cause = cause.__cause__ or cause.__context__
+    return False
+
 
+def stream(text, params=None, batch_size=STREAM_BATCH_SIZE):
+    """Gera as linhas de um SELECT como dicionários, em lotes de batch_size.
 
-def initialize_db():
-    """Roda o script de criação de tabelas (schema.sql)."""
+    No Postgres usa um cursor nomeado (server-side), então só um lote fica em
+    memória por vez. A conexão fica reservada até o gerador terminar ou ser fechado.
+    """
+    pool = get_pool()
+    conn = getattr(_local, 'conn', None)
+    owned = conn is None
+    if owned:
+        conn = pool.getconn()
+    started = time.perf_counter()
+    count = 0
     try:
-        # Lê o script SQL de um arquivo
-        with open('schema.sql', 'r') as f:
-            sql_script = f.read()
-            
-        # Executa a criação das tabelas
-        query(sql_script, fetch_all=False)
-        print("Tabelas criadas ou já existentes.")
-
-    except FileNotFoundError:
-        print("Aviso: Arquivo schema.sql não encontrado. Não foi possível inicializar o DB.")
+        try:
+            sql_text = text.text if isinstance(text, Statement) else text
+            for row in pool.iterate(conn, sql_text, params, batch_size):
+                count += 1
+                yield row
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            _record_query(text, started, failed=True)
+            raise Exception(f"Erro na consulta SQL: {e}")
+        # Tempo total do stream, incluindo o consumo pelo cliente
+        _record_query(text, started, count)
+        if owned:
+            conn.commit()
+    finally:
+        if owned:
+            # putconn faz rollback se o gerador foi interrompido no meio
+            pool.putconn(conn)
+
+
+def copy_in(copy_sql, file):
+    """COPY ... FROM STDIN na conexão da transação atual (carga em lote)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        raise Exception("copy_in() deve ser chamado dentro de transaction().")
+    try:
+        get_pool().copy_in(conn, copy_sql, file)
     except Exception as e:
-        print(f"Erro ao inicializar o banco de dados: {e}")
-        raise
+        raise Exception(f"Erro na consulta SQL: {e}")
+
+
+def copy_out(copy_sql, params, file):
+    """COPY (SELECT ...) TO STDOUT escrito em file (binário); retorna o nº de linhas.
+
+    Como query(): usa a conexão da transação atual ou pega uma do pool só
+    pelo tempo do COPY.
+    """
+    pool = get_pool()
+    conn = getattr(_local, 'conn', None)
+    owned = conn is None
+    if owned:
+        conn = pool.getconn()
+    started = time.perf_counter()
+    try:
+        rows = pool.copy_out(conn, copy_sql, params, file)
+        if owned:
+            conn.commit()
+    except Exception as e:
+        _record_query(copy_sql, started, failed=True)
+        if owned:
+            conn.rollback()
+        raise Exception(f"Erro na consulta SQL: {e}")
+    finally:
+        if owned:
+            pool.putconn(conn)
+    _record_query(copy_sql, started, rows)
+    return rows
+
 
-# A função initialize_db será chamada no app.py na inicialização.
\ No newline at end of file
+def table_exists(name):
+    """True se a tabela existe no banco (consulta ao catálogo de cada backend)."""
+    if BACKEND == 'sqlite':
+        return bool(query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", (name,)))
+    return query("SELECT to_regclass(%s) IS NOT NULL AS exists", (name,))[0]['exists']
@@ -0,0 +1,88 @@
+# exporter.py - Exportação CSV de transações e contas (GET /api/<coleção>/export)
+#
+# O COPY (SELECT ...) TO STDOUT grava num SpooledTemporaryFile (memória até
+# EXPORT_SPOOL_MAX_BYTES, depois disco) e a conexão volta para o pool logo em
+# seguida; só então o arquivo é enviado ao cliente em pedaços. Assim a memória
+# do worker não cresce com o tamanho da exportação e um cliente lento não
+# segura conexão do banco. O CSV de transações usa as mesmas colunas aceitas
+# pelo importer, então pode ser importado de volta.
+
+import os
+import gzip
+import datetime
+import tempfile
+
+from db import copy_out
+from data_manager import _parse_date
+
+EXPORT_SPOOL_MAX_BYTES = int(os.environ.get('EXPORT_SPOOL_MAX_BYTES', str(8 * 1024 * 1024)))
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+FORMATS = ('csv',)
+
+# Coleção -> (colunas exportadas, coluna de data usada por from/to)
+EXPORTS = {
+    'transactions': (('date', 'description', 'amount', 'category', 'type'), 'date'),
+    'bills': (('description', 'amount', 'due_date', 'paid'), 'due_date'),
+}
+
+
+def _export_sql(collection, has_from, has_to):
+    columns, date_column = EXPORTS[collection]
+    where = ['user_id = %s']
+    if has_from:
+        where.append(f'{date_column} >= %s')
+    if has_to:
+        where.append(f'{date_column} <= %s')
+    return (
+        f"COPY (SELECT {', '.join(columns)} FROM {collection} "
+        f"WHERE {' AND '.join(where)} ORDER BY {date_column}, id) "
+        "TO STDOUT WITH (FORMAT csv, HEADER)"
+    )
+
+
+def export_filename(collection, date_from=None, date_to=None, compressed=False):
+    start = _parse_date(date_from, 'from').isoformat() if date_from else 'inicio'
+    end = _parse_date(date_to, 'to') if date_to else datetime.date.today()
+    parts = [collection, start, end.isoformat()]
+    return '-'.join(parts) + ('.csv.gz' if compressed else '.csv')
+
+
+def export_csv(collection, user_id, date_from=None, date_to=None, compressed=False):
+    """Exporta a coleção para um arquivo temporário; devolve (arquivo, linhas, bytes).
+
+    O arquivo (binário, posicionado no início) é do chamador: iter_file()
+    lê e fecha. Com compressed=True o conteúdo já é .csv.gz.
+    """
+    if collection not in EXPORTS:
+        raise ValueError(f'Exportação não suportada para "{collection}".')
+    params = [user_id]
+    if date_from:
+        params.append(_parse_date(date_from, 'from'))
+    if date_to:
+        params.append(_parse_date(date_to, 'to'))
+
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode='w+b')
+    try:
+        target = gzip.GzipFile(fileobj=spool, mode='wb', mtime=0) if compressed else spool
+        rows = copy_out(_export_sql(collection, bool(date_from), bool(date_to)), tuple(params), target)
+        if compressed:
+            target.close()  # grava o rodapé do gzip; o spool continua aberto
+        size = spool.tell()
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return spool, rows, size
+
+
+def iter_file(file, chunk_size=EXPORT_CHUNK_SIZE):
+    """Gera o conteúdo do arquivo em pedaços e o fecha no fim (ou se o cliente cair)."""
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
@@ -0,0 +1,168 @@
+# hashing.py - bcrypt fora da thread da requisição
+
+import os
+import hmac
+import asyncio
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+import metrics
+
+# Custo (log2 das rodadas) usado em hashes novos; ajuste com "python manage.py tune-bcrypt"
+BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', '12'))
+# Processos dedicados ao bcrypt por worker do gunicorn (0 = roda na própria thread).
+# A thread da requisição espera o resultado: o worker precisa de várias threads
+# (Procfile: --worker-class gthread --threads N) para o resto da API seguir
+# atendendo durante uma rajada de logins.
+HASH_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '2'))
+# Hashes na fila + em execução antes de recusar novas requisições
+HASH_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', str(max(HASH_WORKERS, 1) * 4)))
+# Espera máxima por uma vaga na fila e pelo resultado (s)
+HASH_QUEUE_TIMEOUT = float(os.environ.get('BCRYPT_QUEUE_TIMEOUT', '0.5'))
+HASH_TIMEOUT = float(os.environ.get('BCRYPT_TIMEOUT', '10'))
+
+
+class HashingBusy(Exception):
+    """Fila de hashing cheia: a requisição deve ser recusada (503)."""
+
+
+def _to_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+# Funções executadas nos processos do pool (precisam ser picklable)
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _check(password, pw_hash):
+    return hmac.compare_digest(bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(HASH_MAX_PENDING)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is not None and _executor_pid == pid:
+        return _executor
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            # forkserver evita herdar threads/conexões do worker web
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=context)
+            _executor_pid = pid
+        return _executor
+
+
+def _run(fn, *args):
+    started = time.perf_counter()
+    if HASH_WORKERS <= 0:
+        result = fn(*args)
+    else:
+        if not _pending.acquire(timeout=HASH_QUEUE_TIMEOUT):
+            raise HashingBusy("Fila de hashing de senhas cheia.")
+        try:
+            future = _get_executor().submit(fn, *args)
+        except Exception:
+            _pending.release()
+            raise
+        future.add_done_callback(lambda _: _pending.release())
+        try:
+            result = future.result(timeout=HASH_TIMEOUT)
+        except FutureTimeout:
+            # Pool lento (CPU saturada): 503 com Retry-After em vez de 500
+            raise HashingBusy("Hashing de senha excedeu BCRYPT_TIMEOUT.")
+    metrics.BCRYPT_LATENCY.observe(time.perf_counter() - started, fn.__name__.lstrip('_'))
+    return result
+
+
+async def _run_async(fn, *args):
+    # No event loop não se pode bloquear esperando vaga: fila cheia -> HashingBusy
+    started = time.perf_counter()
+    if HASH_WORKERS <= 0:
+        result = await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+    else:
+        if not _pending.acquire(blocking=False):
+            raise HashingBusy("Fila de hashing de senhas cheia.")
+        try:
+            future = _get_executor().submit(fn, *args)
+        except Exception:
+            _pending.release()
+            raise
+        future.add_done_callback(lambda _: _pending.release())
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), HASH_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HashingBusy("Hashing de senha excedeu BCRYPT_TIMEOUT.")
+    metrics.BCRYPT_LATENCY.observe(time.perf_counter() - started, fn.__name__.lstrip('_'))
+    return result
+
+
+def hash_password(password, rounds=None):
+    """Gera o hash bcrypt (str) com o custo configurado."""
+    return _run(_hash, _to_bytes(password), rounds or BCRYPT_LOG_ROUNDS)
+
+
+def check_password(password, pw_hash):
+    """Compara a senha com o hash armazenado (mesma semântica do Flask-Bcrypt)."""
+    return _run(_check, _to_bytes(password), _to_bytes(pw_hash))
+
+
+async def ahash_password(password, rounds=None):
+    return await _run_async(_hash, _to_bytes(password), rounds or BCRYPT_LOG_ROUNDS)
+
+
+async def acheck_password(password, pw_hash):
+    return await _run_async(_check, _to_bytes(password), _to_bytes(pw_hash))
+
+
+def hash_cost(pw_hash):
+    """Custo embutido no hash ($2b$12$... -> 12), ou None se não for bcrypt."""
+    try:
+        return int(pw_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(pw_hash):
+    cost = hash_cost(pw_hash)
+    return cost is not None and cost < BCRYPT_LOG_ROUNDS
+
+
+def benchmark(cost, runs=3):
+    """Tempo mediano (ms) de um hash com o custo dado, neste processo."""
+    salt = bcrypt.gensalt(rounds=cost)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        bcrypt.hashpw(b'benchmark-password', salt)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def tune_cost(target_ms, min_cost=10, max_cost=16, runs=3):
+    """Maior custo cujo hash leva até target_ms nesta máquina.
+
+    Retorna (custo_escolhido, [(custo, ms), ...]). Nunca fica abaixo de min_cost.
+    """
+    results = []
+    chosen = min_cost
+    for cost in range(4, max_cost + 1):
+        elapsed = benchmark(cost, runs)
+        results.append((cost, elapsed))
+        if elapsed <= target_ms:
+            chosen = max(cost, min_cost)
+        else:
+            break
+    return chosen, results
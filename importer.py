@@ -0,0 +1,253 @@
+# importer.py - Importação em lote de transações (CSV ou NDJSON)
+#
+# O upload é lido e validado antes de abrir a transação: as linhas válidas vão
+# para um SpooledTemporaryFile (memória até IMPORT_SPOOL_MAX_BYTES, depois
+# disco), como no exporter. Só então uma conexão sai do pool, para o COPY na
+# tabela de staging e o INSERT; um cliente lento enviando o arquivo não
+# segura conexão nem transação abertas.
+
+import io
+import os
+import csv
+import json
+import uuid
+import datetime
+import tempfile
+from decimal import Decimal, InvalidOperation
+
+from db import transaction, query, copy_in, BACKEND
+from data_manager import record_change, next_change_seq, columns
+import rollups
+
+# Limites da importação
+MAX_IMPORT_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', '100000'))
+MAX_REPORTED_ERRORS = 1000
+# Linhas validadas guardadas em memória antes de o spool passar para o disco
+IMPORT_SPOOL_MAX_BYTES = int(os.environ.get('IMPORT_SPOOL_MAX_BYTES', str(8 * 1024 * 1024)))
+
+# Namespace fixo: a mesma chave de idempotência sempre gera o mesmo id
+IMPORT_NAMESPACE = uuid.UUID('5d1b3b8e-6f7a-4c55-9a57-1f0c6b0f4e21')
+
+# Limites das colunas de transactions (migrations/0001_baseline.sql)
+MAX_AMOUNT = Decimal('99999999.99')  # NUMERIC(10, 2)
+FIELD_LIMITS = {'description': 255, 'category': 255, 'type': 50, 'idempotency_key': 255}
+
+FORMATS = ('csv', 'ndjson')
+
+
+def detect_format(content_type, explicit=None):
+    if explicit:
+        return explicit.lower() if explicit.lower() in FORMATS else None
+    content_type = (content_type or '').lower()
+    if 'csv' in content_type:
+        return 'csv'
+    if 'ndjson' in content_type or 'jsonl' in content_type or 'json-seq' in content_type:
+        return 'ndjson'
+    return None
+
+
+def parse_rows(stream, fmt):
+    """Lê o upload em streaming e gera (linha, dados, erro) um registro por vez."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            # Linha 1 é o cabeçalho
+            yield reader.line_num, record, None
+    else:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, None, 'JSON inválido.'
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, 'Cada linha deve ser um objeto JSON.'
+                continue
+            yield line_no, record, None
+
+
+def _text(record, field, errors, required=False):
+    value = record.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            errors.append(f'"{field}" é obrigatório.')
+        return None
+    value = str(value).strip()
+    if len(value) > FIELD_LIMITS[field]:
+        errors.append(f'"{field}" excede {FIELD_LIMITS[field]} caracteres.')
+    return value
+
+
+def validate_row(record):
+    """Valida um registro contra o schema de transactions.
+
+    Retorna (valores, erros); valores é None quando há erros.
+    """
+    errors = []
+
+    date = record.get('date')
+    try:
+        date = datetime.date.fromisoformat(str(date).strip().split('T')[0]) if date else None
+    except ValueError:
+        errors.append('"date" inválida (use AAAA-MM-DD).')
+        date = None
+    else:
+        if date is None:
+            errors.append('"date" é obrigatória.')
+
+    description = _text(record, 'description', errors, required=True)
+    category = _text(record, 'category', errors)
+    type_ = _text(record, 'type', errors)
+    key = _text(record, 'idempotency_key', errors)
+
+    amount = record.get('amount')
+    if amount is None or str(amount).strip() == '':
+        errors.append('"amount" é obrigatório.')
+    else:
+        try:
+            amount = Decimal(str(amount).strip()).quantize(Decimal('0.01'))
+            if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+                raise InvalidOperation
+        except InvalidOperation:
+            errors.append('"amount" deve ser um número com até 8 dígitos inteiros.')
+
+    if errors:
+        return None, errors
+    return {
+        'date': date, 'description': description, 'category': category,
+        'type': type_, 'amount': amount, 'idempotency_key': key,
+    }, []
+
+
+def _row_id(user_id, values, line_no, upload_key):
+    # Chave por linha > chave do upload + número da linha > id aleatório
+    if values['idempotency_key']:
+        return str(uuid.uuid5(IMPORT_NAMESPACE, f"{user_id}:{values['idempotency_key']}"))
+    if upload_key:
+        return str(uuid.uuid5(IMPORT_NAMESPACE, f"{user_id}:{upload_key}:{line_no}"))
+    return str(uuid.uuid4())
+
+
+def _insert_staged_sqlite(user_id, seq_base):
+    # O SQLite não aceita INSERT dentro de WITH: insere com RETURNING e soma
+    # cada linha nova ao rollup, na mesma transação
+    inserted = query(f"""
+    INSERT INTO transactions (id, user_id, date, description, category, type, amount, changed_seq)
+    SELECT id, %s, date, description, category, type, amount,
+           %s + ROW_NUMBER() OVER (ORDER BY line_no)
+    FROM import_staging
+    WHERE true
+    ORDER BY line_no
+    ON CONFLICT (id) DO NOTHING
+    RETURNING {columns('transactions')}
+    """, (user_id, seq_base))
+    for row in inserted:
+        rollups.add(row)
+    return inserted
+
+
+def _stage_rows(stream, fmt, user_id, upload_key, atomic, report, spool):
+    """Lê e valida o upload, gravando as linhas válidas em CSV no spool.
+
+    Retorna [(linha, id)] das linhas gravadas, para identificar as duplicadas no fim.
+    """
+    staged = []
+    writer = csv.writer(spool)
+
+    def add_error(line_no, messages):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_no, 'errors': messages})
+
+    for line_no, record, parse_error in parse_rows(stream, fmt):
+        report['received'] += 1
+        if report['received'] > MAX_IMPORT_ROWS:
+            add_error(line_no, [f'Limite de {MAX_IMPORT_ROWS} linhas por importação excedido.'])
+            break
+        if parse_error:
+            add_error(line_no, [parse_error])
+            continue
+        values, errors = validate_row(record)
+        if errors:
+            add_error(line_no, errors)
+            continue
+        if atomic and report['error_count']:
+            continue  # não adianta gravar: a importação será cancelada
+
+        row_id = _row_id(user_id, values, line_no, upload_key)
+        staged.append((line_no, row_id))
+        writer.writerow([
+            row_id, values['date'].isoformat(), values['description'],
+            values['category'], values['type'], values['amount'], line_no
+        ])
+    return staged
+
+
+def import_transactions(stream, fmt, user_id, upload_key=None, atomic=False):
+    """Importa transações de um upload CSV/NDJSON em uma única transação.
+
+    O upload é validado primeiro (linhas válidas num arquivo temporário);
+    depois, já dentro da transação, as linhas vão por COPY para uma tabela
+    temporária e são inseridas de uma vez com ON CONFLICT (id) DO NOTHING.
+    Como os ids derivam das chaves de idempotência, reenviar o mesmo arquivo
+    não duplica nada. Com atomic=True qualquer linha inválida cancela a
+    importação inteira (sem chegar a abrir a transação).
+    """
+    report = {'received': 0, 'inserted': 0, 'duplicates': [], 'errors': [], 'error_count': 0}
+
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MAX_BYTES, mode='w+',
+                                       encoding='utf-8', newline='') as spool:
+        staged = _stage_rows(stream, fmt, user_id, upload_key, atomic, report, spool)
+        if atomic and report['error_count']:
+            report['aborted'] = True
+            return report
+        if not staged:
+            return report
+        spool.seek(0)
+
+        with transaction():
+            query("""
+            CREATE TEMP TABLE import_staging (
+                id VARCHAR(255), date DATE, description VARCHAR(255),
+                category VARCHAR(255), type VARCHAR(50), amount NUMERIC(10, 2),
+                line_no INTEGER
+            ) ON COMMIT DROP
+            """, fetch_all=False)
+            copy_in("COPY import_staging FROM STDIN WITH (FORMAT csv)", spool)
+
+            # Um número da sequência de mudanças por linha copiada (duplicadas
+            # deixam buracos, o que não afeta o sync)
+            seq_base = next_change_seq(user_id, len(staged)) - len(staged)
+
+            if BACKEND == 'sqlite':
+                inserted = _insert_staged_sqlite(user_id, seq_base)
+            else:
+                inserted = query(f"""
+            WITH ins AS (
+                INSERT INTO transactions (id, user_id, date, description, category, type, amount, changed_seq)
+                SELECT id, %s, date, description, category, type, amount,
+                       %s + ROW_NUMBER() OVER (ORDER BY line_no)
+                FROM import_staging
+                ORDER BY line_no
+                ON CONFLICT (id) DO NOTHING
+                RETURNING {columns('transactions')}
+            ), rolled AS (
+                {rollups.bulk_add_sql('ins')}
+            )
+            SELECT id FROM ins
+            """, (user_id, seq_base))
+            if inserted:
+                record_change('transactions', user_id)
+
+    inserted_ids = {row['id'] for row in inserted}
+    report['inserted'] = len(inserted_ids)
+    seen = set()
+    for line_no, row_id in staged:
+        # Já existia no banco ou repetida dentro do próprio upload
+        if row_id not in inserted_ids or row_id in seen:
+            report['duplicates'].append(line_no)
+        seen.add(row_id)
+    return report
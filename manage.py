@@ -0,0 +1,99 @@
+# manage.py - Comandos administrativos (rodar fora do processo web)
+#
+#   python manage.py migrate [--status] [--to VERSAO]
+#   python manage.py rebuild-rollups [--user-id ID] [--check]
+#   python manage.py tune-bcrypt [--target-ms 250]
+#   python manage.py prune-tombstones [--days 90]
+#   python manage.py prune-sessions
+
+import argparse
+import sys
+
+import rollups
+import hashing
+import migrate
+import sync
+import sessions
+
+
+def cmd_migrate(args):
+    if args.status:
+        for version, name, applied in migrate.status():
+            print(f"[{'x' if applied else ' '}] {version:04d}_{name}")
+        return 0
+
+    applied = migrate.migrate(args.to)
+    if not applied:
+        print("Nenhuma migração pendente.")
+    return 0
+
+
+def cmd_rebuild_rollups(args):
+    if args.check:
+        drift = rollups.check(args.user_id)
+        for row in drift:
+            print(
+                f"{row['user_id']} {row['month']} {row['category']!r} {row['type']!r}: "
+                f"esperado={row['expected_total']} ({row['expected_count']}) "
+                f"atual={row['actual_total']} ({row['actual_count']})"
+            )
+        print(f"{len(drift)} bucket(s) divergente(s).")
+        return 1 if drift else 0
+
+    rollups.rebuild(args.user_id)
+    print("Rollups mensais reconstruídos.")
+    return 0
+
+
+def cmd_tune_bcrypt(args):
+    cost, results = hashing.tune_cost(args.target_ms, min_cost=args.min_cost)
+    for rounds, elapsed in results:
+        print(f"custo {rounds:2d}: {elapsed:8.1f} ms")
+    print(f"Custo recomendado para {args.target_ms:.0f} ms: BCRYPT_LOG_ROUNDS={cost}")
+    return 0
+
+
+def cmd_prune_tombstones(args):
+    removed = sync.prune_tombstones(args.days)
+    print(f"{removed} tombstone(s) com mais de {args.days} dia(s) removido(s).")
+    return 0
+
+
+def cmd_prune_sessions(args):
+    removed = sessions.prune_sessions()
+    print(f"{removed} sessão(ões) expirada(s) removida(s).")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comandos administrativos do backend.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('migrate', help="Aplica as migrações pendentes do schema.")
+    p.add_argument('--status', action='store_true', help="Lista as migrações e se já foram aplicadas.")
+    p.add_argument('--to', type=int, help="Para na versão informada.")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser('rebuild-rollups', help="Recalcula monthly_rollups a partir de transactions.")
+    p.add_argument('--user-id', help="Limita a um usuário.")
+    p.add_argument('--check', action='store_true', help="Só verifica o drift, sem alterar nada.")
+    p.set_defaults(func=cmd_rebuild_rollups)
+
+    p = sub.add_parser('tune-bcrypt', help="Mede o bcrypt e sugere BCRYPT_LOG_ROUNDS.")
+    p.add_argument('--target-ms', type=float, default=250.0, help="Latência alvo por hash.")
+    p.add_argument('--min-cost', type=int, default=10, help="Custo mínimo aceitável.")
+    p.set_defaults(func=cmd_tune_bcrypt)
+
+    p = sub.add_parser('prune-tombstones', help="Remove tombstones antigos do sync incremental.")
+    p.add_argument('--days', type=int, default=90, help="Idade mínima (dias) dos tombstones removidos.")
+    p.set_defaults(func=cmd_prune_tombstones)
+
+    p = sub.add_parser('prune-sessions', help="Remove sessões de refresh token expiradas.")
+    p.set_defaults(func=cmd_prune_sessions)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# metrics.py - Métricas do processo no formato texto do Prometheus (/metrics)
+#
+# Registro em memória, sem dependências: contadores e histogramas com labels,
+# mais "coletores" chamados na hora da raspagem (pool, cache). Cada worker do
+# gunicorn tem o próprio registro; o label "pid" de process_info ajuda a
+# identificar qual worker respondeu a raspagem.
+
+import os
+import threading
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+# Limites (s) dos buckets dos histogramas de latência
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+_INF = 'le="+Inf"'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [contagens por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(entry)) for labels, entry in self._values.items())
+        for labels, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, _INF)} {entry[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(entry[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {entry[-1]}")
+        return lines
+
+
+_metrics = []
+_collectors = []
+
+
+def counter(name, help_text, labelnames=()):
+    metric = Counter(name, help_text, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, help_text, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """collect() -> [(nome, tipo, ajuda, {labels} ou None, valor), ...] lido na raspagem."""
+    _collectors.append(collect)
+
+
+# --- Métricas da aplicação ---
+
+HTTP_REQUESTS = counter(
+    'http_requests_total', 'Requisições HTTP por rota, método e status.',
+    ('method', 'route', 'status'))
+HTTP_LATENCY = histogram(
+    'http_request_duration_seconds', 'Latência das requisições HTTP (até o primeiro byte).',
+    ('method', 'route'))
+
+DB_QUERY_LATENCY = histogram(
+    'db_query_duration_seconds', 'Tempo de execução por statement (adhoc = SQL não registrado).',
+    ('statement',))
+DB_QUERY_ROWS = counter(
+    'db_query_rows_total', 'Linhas retornadas por statement.', ('statement',))
+DB_QUERY_ERRORS = counter(
+    'db_query_errors_total', 'Consultas que falharam, por statement.', ('statement',))
+DB_SLOW_QUERIES = counter(
+    'db_slow_queries_total', 'Consultas acima de SLOW_QUERY_MS.', ('statement',))
+DB_CONNECT_LATENCY = histogram(
+    'db_connect_duration_seconds', 'Tempo para abrir uma conexão nova com o banco.')
+DB_POOL_WAIT = histogram(
+    'db_pool_wait_seconds', 'Espera por uma conexão livre no pool (só checkouts que esperaram).')
+DB_REPLICA_READS = counter(
+    'db_replica_reads_total', 'Leituras servidas por réplica.', ('replica',))
+DB_REPLICA_EJECTIONS = counter(
+    'db_replica_ejections_total', 'Vezes que a réplica saiu do rodízio (falha ou atraso).', ('replica',))
+
+RATE_LIMITED = counter(
+    'rate_limited_total', 'Requisições recusadas com 429 por balde vazio.', ('policy',))
+LOAD_SHED = counter(
+    'load_shed_total', 'Requisições recusadas por concorrência (503 global, 429 por usuário).', ('reason',))
+
+BCRYPT_LATENCY = histogram(
+    'bcrypt_duration_seconds', 'Tempo de hash/verificação bcrypt, incluindo a fila do pool.',
+    ('operation',))
+
+
+def render():
+    """Todas as métricas no formato de exposição texto do Prometheus."""
+    lines = [
+        "# HELP process_info Processo (worker) que respondeu a raspagem.",
+        "# TYPE process_info gauge",
+        f'process_info{{pid="{os.getpid()}"}} 1',
+    ]
+    for metric in _metrics:
+        lines.extend(metric.render())
+
+    seen = set()
+    for collect in _collectors:
+        try:
+            samples = collect()
+        except Exception as e:
+            print(f"Aviso: falha ao coletar métricas: {e}")
+            continue
+        for name, kind, help_text, labels, value in samples:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+            label_text = _format_labels(labels.keys(), labels.values()) if labels else ''
+            lines.append(f"{name}{label_text} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,123 @@
+# migrate.py - Migrações versionadas do schema (migrations/NNNN_nome.sql)
+#
+# As migrações rodam fora do boot, com "python manage.py migrate" (fase de
+# release/deploy). Na inicialização o app só confere a versão do banco.
+
+import os
+import re
+
+from db import query, transaction, table_exists, BACKEND, DATABASE_URL
+import sqlite_db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+# Versão de uma migração para outro backend (ex.: 0002_nome.sqlite.sql), usada
+# no lugar da padrão quando o SQL do Postgres não tem tradução direta
+BACKEND_FILE = re.compile(r'^(\d{4})_(\w+)\.(\w+)\.sql$')
+
+# Chave do pg_advisory_xact_lock: impede duas execuções simultâneas do runner
+LOCK_KEY = 727365
+
+# Se o banco estiver atrasado: aplica as migrações no boot (dev) ou falha (produção)
+AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '').lower() in ('1', 'true', 'yes')
+STRICT = os.environ.get('MIGRATIONS_STRICT', '').lower() in ('1', 'true', 'yes')
+
+_VERSIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def discover():
+    """Lista (versão, nome, caminho) das migrações em ordem."""
+    found = []
+    overrides = {}
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+            continue
+        match = BACKEND_FILE.match(filename)
+        if match and match.group(3) == BACKEND:
+            overrides[int(match.group(1))] = os.path.join(MIGRATIONS_DIR, filename)
+    found = [(version, name, overrides.get(version, path)) for version, name, path in found]
+    found.sort()
+    return found
+
+
+def latest_version():
+    migrations = discover()
+    return migrations[-1][0] if migrations else 0
+
+
+def applied_versions():
+    if not table_exists('schema_migrations'):
+        return set()
+    return {row['version'] for row in query("SELECT version FROM schema_migrations")}
+
+
+def current_version():
+    versions = applied_versions()
+    return max(versions) if versions else 0
+
+
+def status():
+    """[(versão, nome, aplicada?)] para o comando "migrate --status"."""
+    applied = applied_versions()
+    return [(version, name, version in applied) for version, name, _ in discover()]
+
+
+def migrate(target=None):
+    """Aplica as migrações pendentes até target (ou todas), cada uma em sua transação."""
+    applied = []
+    for version, name, path in discover():
+        if target is not None and version > target:
+            break
+        with open(path, 'r') as f:
+            sql_script = f.read()
+        with transaction() as conn:
+            # No SQLite vira o lock de escrita do banco (BEGIN IMMEDIATE)
+            query("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+            query(_VERSIONS_TABLE_SQL, fetch_all=False)
+            done = query("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+            if done:
+                continue
+            notices = getattr(conn, 'notices', None)  # só psycopg2
+            if notices is not None:
+                del notices[:]
+            query(sql_script, fetch_all=False)
+            # RAISE NOTICE da migração (ex.: o que uma limpeza de dados removeu)
+            for notice in notices or ():
+                print(f"  {notice.strip()}")
+            query(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name), fetch_all=False
+            )
+        print(f"Migração {version:04d}_{name} aplicada.")
+        applied.append(version)
+    return applied
+
+
+def check_version():
+    """Chamado no boot: só compara a versão do banco com a do código."""
+    expected = latest_version()
+    current = current_version()
+    if current >= expected:
+        return current
+
+    # Um SQLite :memory: sempre começa vazio: aplica o schema no boot
+    if AUTO_MIGRATE or (BACKEND == 'sqlite' and sqlite_db.parse_url(DATABASE_URL) == ':memory:'):
+        migrate()
+        return latest_version()
+
+    message = (
+        f"Banco na versão {current}, código espera {expected}. "
+        "Rode \"python manage.py migrate\"."
+    )
+    if STRICT:
+        raise Exception(message)
+    print(f"Aviso: {message}")
+    return current
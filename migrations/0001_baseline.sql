@@ -1,4 +1,5 @@
--- schema.sql
+-- 0001_baseline.sql
+-- Schema existente antes do controle de versões (idempotente: IF NOT EXISTS)
 
 -- Tabela de Usuários (users)
 CREATE TABLE IF NOT EXISTS users (
@@ -43,4 +44,16 @@ CREATE TABLE IF NOT EXISTS categories (
     id VARCHAR(255) PRIMARY KEY,
     user_id VARCHAR(255) REFERENCES users(id) ON DELETE CASCADE,
     name VARCHAR(255) NOT NULL
-);
\ No newline at end of file
+);
+
+-- Totais mensais por (usuário, mês, categoria, tipo), mantidos incrementalmente
+-- pelo data_manager e reconstruíveis com "python manage.py rebuild-rollups"
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_id VARCHAR(255) REFERENCES users(id) ON DELETE CASCADE,
+    month DATE NOT NULL,
+    category VARCHAR(255) NOT NULL DEFAULT '',
+    type VARCHAR(50) NOT NULL DEFAULT '',
+    total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month, category, type)
+);
@@ -0,0 +1,32 @@
+-- 0002_access_path_indexes.sql
+-- Índices para os caminhos de acesso do data_manager (toda consulta filtra por user_id)
+
+-- Listagens paginadas por (data, id) de cada usuário
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id ON transactions (user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_goals_user_target_date_id ON goals (user_id, target_date, id);
+CREATE INDEX IF NOT EXISTS idx_bills_user_due_date_id ON bills (user_id, due_date, id);
+
+-- Categorias: nome único por usuário. Duplicadas antigas são fundidas na de
+-- menor id: a linha só tem (id, user_id, name) e as transações referenciam a
+-- categoria pelo nome, então nada se perde. A contagem por usuário sai como
+-- NOTICE, impresso pelo "python manage.py migrate".
+DO $$
+DECLARE
+    merged RECORD;
+BEGIN
+    FOR merged IN
+        SELECT c.user_id, COUNT(DISTINCT c.id) AS removed
+        FROM categories c
+        JOIN categories d ON c.user_id = d.user_id AND c.name = d.name AND c.id > d.id
+        GROUP BY c.user_id
+    LOOP
+        RAISE NOTICE 'Categorias duplicadas fundidas: usuário %, % removida(s).', merged.user_id, merged.removed;
+    END LOOP;
+END
+$$;
+
+DELETE FROM categories c
+USING categories d
+WHERE c.user_id = d.user_id AND c.name = d.name AND c.id > d.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_categories_user_name ON categories (user_id, name);
@@ -0,0 +1,15 @@
+-- 0002_access_path_indexes.sqlite.sql
+-- Mesma migração para o backend SQLite (sem DELETE ... USING)
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id ON transactions (user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_goals_user_target_date_id ON goals (user_id, target_date, id);
+CREATE INDEX IF NOT EXISTS idx_bills_user_due_date_id ON bills (user_id, due_date, id);
+
+-- Duplicadas fundidas na de menor id (sem NOTICE no SQLite: não há contagem por usuário)
+DELETE FROM categories
+WHERE EXISTS (
+    SELECT 1 FROM categories d
+    WHERE d.user_id = categories.user_id AND d.name = categories.name AND d.id < categories.id
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_categories_user_name ON categories (user_id, name);
@@ -0,0 +1,9 @@
+-- 0003_collection_versions.sql
+-- Versão por (usuário, coleção), incrementada a cada escrita do data_manager.
+-- Os GETs usam essa versão como ETag e respondem 304 sem ler as tabelas de dados.
+CREATE TABLE IF NOT EXISTS collection_versions (
+    user_id VARCHAR(255) REFERENCES users(id) ON DELETE CASCADE,
+    collection VARCHAR(50) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, collection)
+);
@@ -0,0 +1,72 @@
+-- 0004_change_tracking.sqlite.sql
+-- Mesma migração para o backend SQLite (ADD COLUMN sem IF NOT EXISTS)
+--
+-- Sync incremental (GET /api/sync): sequência de mudanças por usuário,
+-- changed_seq em cada linha e tombstones para os DELETEs.
+
+CREATE TABLE IF NOT EXISTS change_sequences (
+    user_id VARCHAR(255) PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    seq BIGINT NOT NULL DEFAULT 0,
+    -- Maior deleted_seq já removido por "manage.py prune-tombstones": cursores
+    -- anteriores a ele precisam de uma sincronização completa
+    pruned_seq BIGINT NOT NULL DEFAULT 0
+);
+
+ALTER TABLE transactions ADD COLUMN changed_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE goals ADD COLUMN changed_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE bills ADD COLUMN changed_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE categories ADD COLUMN changed_seq BIGINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_changed_seq ON transactions (user_id, changed_seq);
+CREATE INDEX IF NOT EXISTS idx_goals_user_changed_seq ON goals (user_id, changed_seq);
+CREATE INDEX IF NOT EXISTS idx_bills_user_changed_seq ON bills (user_id, changed_seq);
+CREATE INDEX IF NOT EXISTS idx_categories_user_changed_seq ON categories (user_id, changed_seq);
+
+-- Numera as linhas existentes (um número por linha, por usuário) para que a
+-- primeira sincronização também possa ser paginada pela sequência
+INSERT INTO change_sequences (user_id, seq)
+SELECT id, 0 FROM users WHERE true
+ON CONFLICT (user_id) DO NOTHING;
+
+UPDATE transactions SET changed_seq = cs.seq + n.rn
+FROM (SELECT id, user_id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id) AS rn FROM transactions) n
+JOIN change_sequences cs ON cs.user_id = n.user_id
+WHERE transactions.id = n.id;
+UPDATE change_sequences SET seq = change_sequences.seq + c.total
+FROM (SELECT user_id, COUNT(*) AS total FROM transactions GROUP BY user_id) c
+WHERE change_sequences.user_id = c.user_id;
+
+UPDATE goals SET changed_seq = cs.seq + n.rn
+FROM (SELECT id, user_id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id) AS rn FROM goals) n
+JOIN change_sequences cs ON cs.user_id = n.user_id
+WHERE goals.id = n.id;
+UPDATE change_sequences SET seq = change_sequences.seq + c.total
+FROM (SELECT user_id, COUNT(*) AS total FROM goals GROUP BY user_id) c
+WHERE change_sequences.user_id = c.user_id;
+
+UPDATE bills SET changed_seq = cs.seq + n.rn
+FROM (SELECT id, user_id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id) AS rn FROM bills) n
+JOIN change_sequences cs ON cs.user_id = n.user_id
+WHERE bills.id = n.id;
+UPDATE change_sequences SET seq = change_sequences.seq + c.total
+FROM (SELECT user_id, COUNT(*) AS total FROM bills GROUP BY user_id) c
+WHERE change_sequences.user_id = c.user_id;
+
+UPDATE categories SET changed_seq = cs.seq + n.rn
+FROM (SELECT id, user_id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id) AS rn FROM categories) n
+JOIN change_sequences cs ON cs.user_id = n.user_id
+WHERE categories.id = n.id;
+UPDATE change_sequences SET seq = change_sequences.seq + c.total
+FROM (SELECT user_id, COUNT(*) AS total FROM categories GROUP BY user_id) c
+WHERE change_sequences.user_id = c.user_id;
+
+CREATE TABLE IF NOT EXISTS tombstones (
+    user_id VARCHAR(255) REFERENCES users(id) ON DELETE CASCADE,
+    collection VARCHAR(50) NOT NULL,
+    id VARCHAR(255) NOT NULL,
+    deleted_seq BIGINT NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, collection, id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_tombstones_user_deleted_seq ON tombstones (user_id, deleted_seq);
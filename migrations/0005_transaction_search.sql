@@ -0,0 +1,24 @@
+-- 0005_transaction_search.sql
+-- Busca em description/category (GET /api/transactions/search): LIKE por
+-- substring/prefixo sobre o texto em minúsculas e sem acentos, servido por um
+-- índice de trigramas. O user_id entra na mesma GIN (btree_gin), então a
+-- busca só lê entradas do próprio usuário.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+-- unaccent(texto) é STABLE (depende do search_path) e não pode ir para um
+-- índice; com o dicionário fixado o resultado só depende da entrada
+CREATE OR REPLACE FUNCTION search_normalize(value TEXT) RETURNS TEXT AS $$
+    SELECT lower(public.unaccent('public.unaccent'::regdictionary, coalesce(value, '')))
+$$ LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- Texto pesquisável de uma transação: a descrição vem primeiro, então
+-- "começa com" no documento é "começa com" na descrição
+CREATE OR REPLACE FUNCTION transaction_search_text(description TEXT, category TEXT) RETURNS TEXT AS $$
+    SELECT search_normalize(description || ' ' || coalesce(category, ''))
+$$ LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_search ON transactions
+USING gin (user_id, transaction_search_text(description, category) gin_trgm_ops);
@@ -0,0 +1,4 @@
+-- 0005_transaction_search.sqlite.sql
+-- Sem pg_trgm/unaccent: no SQLite search_normalize, transaction_search_text e
+-- word_similarity são funções Python registradas em sqlite_db.py e a busca
+-- percorre as transações do usuário pelo índice (user_id, date, id) da 0002.
@@ -0,0 +1,28 @@
+-- 0006_sessions.sql
+-- Sessões de login: cada login cria uma sessão e o refresh token carrega o
+-- id dela (sid) e o jti vigente. A renovação troca o jti (rotação); o logout
+-- marca revoked_at. Revogações recebem um número de uma versão global, que
+-- os workers usam para sincronizar o deny set em memória (sessions.py).
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id VARCHAR(64) PRIMARY KEY,
+    user_id VARCHAR(255) NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    refresh_jti VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    last_used_at TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP,
+    revoked_version BIGINT
+);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_revoked_version ON sessions (revoked_version)
+WHERE revoked_version IS NOT NULL;
+
+-- Linha única com a versão das revogações
+CREATE TABLE IF NOT EXISTS session_revocations (
+    id SMALLINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO session_revocations (id, version) VALUES (1, 0) ON CONFLICT DO NOTHING;
@@ -0,0 +1,16 @@
+-- 0007_backfill_rollups.sql
+-- Preenche monthly_rollups a partir das transações já existentes: bancos
+-- criados antes da manutenção incremental têm o rollup vazio ou incompleto.
+-- Mesmo DELETE + INSERT ... SELECT ... GROUP BY de rollups.rebuild (e de
+-- "python manage.py rebuild-rollups"), com as escritas em transactions
+-- bloqueadas até o fim da migração.
+LOCK TABLE transactions IN SHARE MODE;
+
+DELETE FROM monthly_rollups;
+
+INSERT INTO monthly_rollups (user_id, month, category, type, total, count)
+SELECT user_id, date_trunc('month', date)::date AS month,
+       COALESCE(category, '') AS category, COALESCE(type, '') AS type,
+       SUM(amount) AS total, COUNT(*) AS count
+FROM transactions
+GROUP BY 1, 2, 3, 4;
@@ -0,0 +1,12 @@
+-- 0007_backfill_rollups.sqlite.sql
+-- Igual à versão do Postgres, sem o LOCK TABLE: a migração já roda com o
+-- lock de escrita do banco (BEGIN IMMEDIATE). date_trunc é a função Python
+-- registrada em sqlite_db.py.
+DELETE FROM monthly_rollups;
+
+INSERT INTO monthly_rollups (user_id, month, category, type, total, count)
+SELECT user_id, date_trunc('month', date) AS month,
+       COALESCE(category, '') AS category, COALESCE(type, '') AS type,
+       SUM(amount) AS total, COUNT(*) AS count
+FROM transactions
+GROUP BY 1, 2, 3, 4;
@@ -0,0 +1,5 @@
+-- 0008_column_types.sql
+-- Nada a fazer no Postgres: NUMERIC e DATE já recusam valores fora do tipo.
+-- A versão do SQLite (0008_column_types.sqlite.sql) cria os triggers que
+-- fazem a mesma checagem.
+SELECT 1;
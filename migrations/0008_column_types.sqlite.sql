@@ -0,0 +1,70 @@
+-- 0008_column_types.sqlite.sql
+-- O SQLite não aplica o tipo declarado: NUMERIC guarda "abc" como texto e DATE
+-- aceita qualquer string. Estes triggers recusam no INSERT/UPDATE o que o
+-- Postgres recusaria com DataError; sqlite_db.py converte o erro "tipo
+-- inválido" em sqlite3.DataError (400 nas rotas, como no Postgres).
+-- Valores numéricos em texto ("10.50") já viram real pela afinidade NUMERIC.
+
+CREATE TRIGGER IF NOT EXISTS transactions_types_insert
+BEFORE INSERT ON transactions
+BEGIN
+    SELECT RAISE(ABORT, 'tipo inválido: transactions.amount')
+    WHERE typeof(NEW.amount) NOT IN ('integer', 'real');
+    SELECT RAISE(ABORT, 'tipo inválido: transactions.date')
+    WHERE typeof(NEW.date) <> 'text' OR date(substr(NEW.date, 1, 10)) IS NOT substr(NEW.date, 1, 10)
+        OR (length(NEW.date) > 10 AND substr(NEW.date, 11, 1) NOT IN ('T', ' '));
+END;
+
+CREATE TRIGGER IF NOT EXISTS transactions_types_update
+BEFORE UPDATE OF amount, date ON transactions
+BEGIN
+    SELECT RAISE(ABORT, 'tipo inválido: transactions.amount')
+    WHERE typeof(NEW.amount) NOT IN ('integer', 'real');
+    SELECT RAISE(ABORT, 'tipo inválido: transactions.date')
+    WHERE typeof(NEW.date) <> 'text' OR date(substr(NEW.date, 1, 10)) IS NOT substr(NEW.date, 1, 10)
+        OR (length(NEW.date) > 10 AND substr(NEW.date, 11, 1) NOT IN ('T', ' '));
+END;
+
+CREATE TRIGGER IF NOT EXISTS goals_types_insert
+BEFORE INSERT ON goals
+BEGIN
+    SELECT RAISE(ABORT, 'tipo inválido: goals.amount')
+    WHERE typeof(NEW.amount) NOT IN ('integer', 'real');
+    SELECT RAISE(ABORT, 'tipo inválido: goals.saved')
+    WHERE NEW.saved IS NOT NULL AND (typeof(NEW.saved) NOT IN ('integer', 'real'));
+    SELECT RAISE(ABORT, 'tipo inválido: goals.target_date')
+    WHERE NEW.target_date IS NOT NULL AND (typeof(NEW.target_date) <> 'text' OR date(substr(NEW.target_date, 1, 10)) IS NOT substr(NEW.target_date, 1, 10)
+        OR (length(NEW.target_date) > 10 AND substr(NEW.target_date, 11, 1) NOT IN ('T', ' ')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS goals_types_update
+BEFORE UPDATE OF amount, saved, target_date ON goals
+BEGIN
+    SELECT RAISE(ABORT, 'tipo inválido: goals.amount')
+    WHERE typeof(NEW.amount) NOT IN ('integer', 'real');
+    SELECT RAISE(ABORT, 'tipo inválido: goals.saved')
+    WHERE NEW.saved IS NOT NULL AND (typeof(NEW.saved) NOT IN ('integer', 'real'));
+    SELECT RAISE(ABORT, 'tipo inválido: goals.target_date')
+    WHERE NEW.target_date IS NOT NULL AND (typeof(NEW.target_date) <> 'text' OR date(substr(NEW.target_date, 1, 10)) IS NOT substr(NEW.target_date, 1, 10)
+        OR (length(NEW.target_date) > 10 AND substr(NEW.target_date, 11, 1) NOT IN ('T', ' ')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS bills_types_insert
+BEFORE INSERT ON bills
+BEGIN
+    SELECT RAISE(ABORT, 'tipo inválido: bills.amount')
+    WHERE typeof(NEW.amount) NOT IN ('integer', 'real');
+    SELECT RAISE(ABORT, 'tipo inválido: bills.due_date')
+    WHERE typeof(NEW.due_date) <> 'text' OR date(substr(NEW.due_date, 1, 10)) IS NOT substr(NEW.due_date, 1, 10)
+        OR (length(NEW.due_date) > 10 AND substr(NEW.due_date, 11, 1) NOT IN ('T', ' '));
+END;
+
+CREATE TRIGGER IF NOT EXISTS bills_types_update
+BEFORE UPDATE OF amount, due_date ON bills
+BEGIN
+    SELECT RAISE(ABORT, 'tipo inválido: bills.amount')
+    WHERE typeof(NEW.amount) NOT IN ('integer', 'real');
+    SELECT RAISE(ABORT, 'tipo inválido: bills.due_date')
+    WHERE typeof(NEW.due_date) <> 'text' OR date(substr(NEW.due_date, 1, 10)) IS NOT substr(NEW.due_date, 1, 10)
+        OR (length(NEW.due_date) > 10 AND substr(NEW.due_date, 11, 1) NOT IN ('T', ' '));
+END;
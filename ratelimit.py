@@ -0,0 +1,350 @@
+# ratelimit.py - Limite de taxa (token bucket) e descarte de carga
+#
+# Cada requisição autenticada gasta uma ficha do balde do usuário
+# (request.user_id, definido no authenticate_token) e as rotas /auth/*
+# gastam do balde do IP. Rotas caras (exportação, importação, busca, resumo,
+# sync, batch) têm ainda um balde próprio; login e registro (bcrypt) gastam
+# do balde "login" do par IP + username enviado, para que um script não
+# esgote o login de todos que saem pelo mesmo IP. Balde vazio -> 429 com
+# Retry-After.
+#
+# O IP do cliente vem do X-Forwarded-For quando RATE_LIMIT_TRUST_PROXY > 0:
+# é o número de proxies confiáveis na frente do app (1 = o roteador da
+# plataforma do Procfile, o padrão). Conta-se do fim do header, pois o
+# começo pode vir forjado pelo cliente. Sem proxy na frente use 0 (senão o
+# cliente escolhe o próprio IP); com CDN + roteador, 2.
+#
+# O descarte de carga olha a concorrência do processo: acima de
+# SHED_MAX_INFLIGHT requisições em andamento as novas recebem 503 na hora,
+# em vez de esperar até DB_POOL_TIMEOUT por uma conexão de um pool já
+# esgotado; acima de RATE_LIMIT_USER_INFLIGHT do mesmo usuário, 429.
+#
+# Os baldes ficam em memória (por worker) por padrão. Com
+# RATE_LIMIT_URL=redis://... são compartilhados entre os workers (script Lua
+# atômico, relógio do Redis). A concorrência é sempre por processo.
+
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+
+import db
+import metrics
+
+
+def _budget(name, default):
+    """Lê "taxa/rajada" (fichas por segundo / tamanho do balde)."""
+    rate, burst = os.environ.get(name, default).split('/')
+    return float(rate), float(burst)
+
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() not in ('0', 'false', 'no')
+RATE_LIMIT_URL = os.environ.get('RATE_LIMIT_URL')
+RATE_LIMIT_PREFIX = os.environ.get('RATE_LIMIT_PREFIX', 'fin:rl:')
+
+
+def _proxy_hops(value):
+    """RATE_LIMIT_TRUST_PROXY: número de proxies (aceita também true/false)."""
+    value = value.strip().lower()
+    if value in ('true', 'yes'):
+        return 1
+    if value in ('false', 'no', ''):
+        return 0
+    return max(0, int(value))
+
+
+# Proxies confiáveis na frente do app (ver o cabeçalho); 0 = usa o remote_addr
+RATE_LIMIT_TRUST_PROXY = _proxy_hops(os.environ.get('RATE_LIMIT_TRUST_PROXY', '1'))
+# Baldes guardados em memória antes de descartar os menos usados (LRU)
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+
+POLICIES = {
+    'user': _budget('RATE_LIMIT_USER', '10/50'),
+    'expensive': _budget('RATE_LIMIT_EXPENSIVE', '0.5/10'),
+    'auth': _budget('RATE_LIMIT_AUTH', '1/20'),
+    'login': _budget('RATE_LIMIT_LOGIN', '0.2/10'),
+}
+
+# Regras de URL (iguais em app.py e asgi.py) que gastam também do balde "expensive"
+EXPENSIVE_ROUTES = frozenset((
+    '/api/transactions/export', '/api/bills/export', '/api/transactions/import',
+    '/api/transactions/search', '/api/summary', '/api/sync', '/api/batch',
+))
+# ... e do balde "login" (por IP)
+LOGIN_ROUTES = frozenset(('/auth/login', '/auth/register'))
+# Nunca limitadas nem descartadas (monitoramento)
+EXEMPT_PATHS = frozenset(('/health', '/metrics'))
+
+# Requisições em andamento por processo antes de responder 503 (0 = sem limite)
+SHED_MAX_INFLIGHT = int(os.environ.get('SHED_MAX_INFLIGHT', str(db.POOL_MAX_SIZE * 2)))
+USER_MAX_INFLIGHT = int(os.environ.get('RATE_LIMIT_USER_INFLIGHT', str(max(1, db.POOL_MAX_SIZE // 2))))
+
+
+class MemoryBackend:
+    """Baldes do processo atual (LRU: acima de max_keys sai o menos usado)."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # chave -> (fichas, atualizado_em)
+        self._lock = threading.Lock()
+
+    def take(self, buckets):
+        """buckets: [(chave, taxa, rajada, custo)]. Gasta de todos ou de nenhum.
+
+        Retorna a espera (s) de cada balde; se alguma for > 0 nada é gasto.
+        """
+        now = time.monotonic()
+        with self._lock:
+            refilled = []
+            for key, rate, burst, cost in buckets:
+                tokens, updated = self._buckets.get(key, (burst, now))
+                refilled.append(min(burst, tokens + (now - updated) * rate))
+            waits = [
+                0.0 if tokens >= cost else (cost - tokens) / rate
+                for tokens, (_, rate, _, cost) in zip(refilled, buckets)
+            ]
+            blocked = any(waits)
+            for tokens, (key, _, _, cost) in zip(refilled, buckets):
+                self._buckets[key] = (tokens if blocked else tokens - cost, now)
+                self._buckets.move_to_end(key)
+            # O mais antigo já encheu de novo (ou está perto): equivale a um balde novo
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return waits
+
+    def stats(self):
+        with self._lock:
+            return {'buckets': len(self._buckets)}
+
+
+# Reabastece todos os baldes e gasta de todos numa operação só, ou de nenhum
+# se algum estiver vazio; devolve a espera (s) de cada um como string
+# (números Lua viram inteiros na resposta do Redis). ARGV: taxa, rajada,
+# custo de cada chave, na ordem de KEYS.
+_TAKE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens, waits, blocked = {}, {}, false
+for i, key in ipairs(KEYS) do
+    local rate, burst, cost = tonumber(ARGV[3 * i - 2]), tonumber(ARGV[3 * i - 1]), tonumber(ARGV[3 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local current = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    current = math.min(burst, current + math.max(0, now - ts) * rate)
+    tokens[i] = current
+    if current >= cost then
+        waits[i] = 0
+    else
+        waits[i] = (cost - current) / rate
+        blocked = true
+    end
+end
+for i, key in ipairs(KEYS) do
+    local rate, burst, cost = tonumber(ARGV[3 * i - 2]), tonumber(ARGV[3 * i - 1]), tonumber(ARGV[3 * i])
+    local current = tokens[i]
+    if not blocked then
+        current = current - cost
+    end
+    redis.call('HSET', key, 'tokens', current, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+    waits[i] = tostring(waits[i])
+end
+return waits
+"""
+
+
+class RedisBackend:
+    """Baldes compartilhados entre workers (requer o pacote "redis")."""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+
+    def take(self, buckets):
+        keys, args = [], []
+        for key, rate, burst, cost in buckets:
+            keys.append(RATE_LIMIT_PREFIX + key)
+            args.extend((rate, burst, cost))
+        return [float(wait) for wait in self._take(keys=keys, args=args)]
+
+    def stats(self):
+        return {'backend_url': RATE_LIMIT_URL}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisBackend(RATE_LIMIT_URL) if RATE_LIMIT_URL else MemoryBackend()
+    return _backend
+
+
+def take(key, *policies):
+    """Gasta uma ficha de cada balde (policy:key) ou de nenhum.
+
+    Retorna 0 ou os segundos até haver ficha em todos. Uma requisição
+    recusada por um balde não gasta dos outros.
+    """
+    return take_buckets([(policy, key) for policy in policies])
+
+
+def take_buckets(pairs):
+    """Como take, com uma chave por balde: pairs = [(policy, key)]."""
+    if not RATE_LIMIT_ENABLED:
+        return 0.0
+    buckets = [(f'{policy}:{key}',) + POLICIES[policy] + (1,) for policy, key in pairs]
+    try:
+        waits = get_backend().take(buckets)
+    except Exception as e:
+        # Falha do backend compartilhado não derruba a API: a requisição passa sem limite
+        print(f"Aviso: falha ao consultar o limite de taxa: {e}")
+        return 0.0
+    for (policy, _), wait in zip(pairs, waits):
+        if wait:
+            metrics.RATE_LIMITED.inc(policy)
+    return max(waits)
+
+
+# --- Requisições (servem para o request do Flask e do Quart) ---
+
+def _route(req):
+    return req.url_rule.rule if req.url_rule else req.path
+
+
+def client_ip(req):
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = [ip.strip() for ip in req.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if forwarded:
+            # O último proxy confiável acrescentou o IP de quem falou com ele
+            return forwarded[-min(RATE_LIMIT_TRUST_PROXY, len(forwarded))]
+    return req.remote_addr or 'desconhecido'
+
+
+def login_username(data):
+    """username do corpo de /auth/login e /auth/register, para a chave do balde "login"."""
+    username = data.get('username') if isinstance(data, dict) else None
+    if not isinstance(username, str):
+        return ''
+    return username.strip().lower()[:255]
+
+
+def login_route(req):
+    return _route(req) in LOGIN_ROUTES
+
+
+def exempt(req):
+    return req.method == 'OPTIONS' or req.path in EXEMPT_PATHS
+
+
+def check_ip(req, username=''):
+    """Baldes por IP das rotas /auth/*; retorna 0 ou a espera em segundos.
+
+    username: login_username do corpo, nas rotas de login e registro.
+    """
+    route = _route(req)
+    if not route.startswith('/auth/'):
+        return 0.0
+    ip = client_ip(req)
+    if route in LOGIN_ROUTES:
+        return take_buckets([('auth', ip), ('login', f'{ip}|{username}')])
+    return take(ip, 'auth')
+
+
+def check_user(req, user_id):
+    """Baldes do usuário autenticado; retorna 0 ou a espera em segundos."""
+    if _route(req) in EXPENSIVE_ROUTES:
+        return take(user_id, 'user', 'expensive')
+    return take(user_id, 'user')
+
+
+def rejection(wait):
+    """Resposta 429 (corpo, status, headers) para Flask ou Quart."""
+    return (
+        {'error': 'Muitas requisições. Tente novamente em instantes.'}, 429,
+        {'Retry-After': str(max(1, math.ceil(wait)))},
+    )
+
+
+def overloaded():
+    return (
+        {'error': 'Servidor ocupado. Tente novamente em instantes.'}, 503,
+        {'Retry-After': '1'},
+    )
+
+
+# --- Descarte de carga por concorrência ---
+
+_inflight = 0
+_inflight_by_user = {}
+_inflight_lock = threading.Lock()
+
+
+def enter():
+    """Reserva uma vaga do processo; False -> responder overloaded()."""
+    global _inflight
+    with _inflight_lock:
+        if 0 < SHED_MAX_INFLIGHT <= _inflight:
+            shed = True
+        else:
+            _inflight += 1
+            shed = False
+    if shed:
+        metrics.LOAD_SHED.inc('inflight')
+    return not shed
+
+
+def leave():
+    global _inflight
+    with _inflight_lock:
+        _inflight -= 1
+
+
+def enter_user(user_id):
+    """Reserva uma vaga do usuário; False -> responder rejection(1)."""
+    with _inflight_lock:
+        current = _inflight_by_user.get(user_id, 0)
+        if RATE_LIMIT_ENABLED and current >= USER_MAX_INFLIGHT:
+            shed = True
+        else:
+            _inflight_by_user[user_id] = current + 1
+            shed = False
+    if shed:
+        metrics.LOAD_SHED.inc('user_inflight')
+    return not shed
+
+
+def leave_user(user_id):
+    with _inflight_lock:
+        current = _inflight_by_user.get(user_id, 0) - 1
+        if current > 0:
+            _inflight_by_user[user_id] = current
+        else:
+            _inflight_by_user.pop(user_id, None)
+
+
+def stats():
+    with _inflight_lock:
+        data = {'inflight': _inflight, 'max_inflight': SHED_MAX_INFLIGHT,
+                'users_inflight': len(_inflight_by_user), 'enabled': RATE_LIMIT_ENABLED}
+    if RATE_LIMIT_ENABLED:
+        data.update(get_backend().stats())
+    return data
+
+
+def _collect_metrics():
+    with _inflight_lock:
+        inflight = _inflight
+    return [
+        ('http_inflight_requests', 'gauge', 'Requisições em andamento no processo.', None, inflight),
+        ('http_max_inflight_requests', 'gauge', 'Limite de SHED_MAX_INFLIGHT.', None, SHED_MAX_INFLIGHT),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,166 @@
+# rollups.py - Totais mensais mantidos incrementalmente
+
+import datetime
+from functools import lru_cache
+from db import query, transaction, statement
+
+# Cada linha de monthly_rollups agrega as transações de um usuário em um
+# (mês, categoria, tipo). create/update/delete de transações aplicam o delta
+# na mesma transação do banco, então o resumo é lido em O(buckets).
+
+INCOME_TYPE = 'Receita'
+EXPENSE_TYPE = 'Despesa'
+
+_ON_CONFLICT_ADD = """
+ON CONFLICT (user_id, month, category, type) DO UPDATE
+SET total = monthly_rollups.total + EXCLUDED.total,
+    count = monthly_rollups.count + EXCLUDED.count
+"""
+
+UPSERT = statement('monthly_rollups_upsert', """
+INSERT INTO monthly_rollups (user_id, month, category, type, total, count)
+VALUES (%s, %s, %s, %s, %s, %s)
+""" + _ON_CONFLICT_ADD, returns_rows=False)
+
+PRUNE = statement('monthly_rollups_prune', """
+DELETE FROM monthly_rollups
+WHERE user_id = %s AND month = %s AND category = %s AND type = %s AND count <= 0
+""", returns_rows=False)
+
+_AGGREGATE_SQL = """
+SELECT user_id, date_trunc('month', date)::date AS month,
+       COALESCE(category, '') AS category, COALESCE(type, '') AS type,
+       SUM(amount) AS total, COUNT(*) AS count
+FROM {source}
+{where}
+GROUP BY 1, 2, 3, 4
+"""
+
+_EXPECTED_SQL = _AGGREGATE_SQL.replace('{source}', 'transactions')
+
+
+def month_of(value):
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value.split('T')[0])
+    return value.replace(day=1)
+
+
+def _bucket(row):
+    return (row['user_id'], month_of(row['date']),
+            row.get('category') or '', row.get('type') or '')
+
+
+def delta_params(row, sign):
+    """Parâmetros de UPSERT (e de PRUNE) para somar (+1) ou subtrair (-1) uma linha."""
+    bucket = _bucket(row)
+    return bucket + (row['amount'] * sign, sign), bucket
+
+
+def add(row):
+    """Soma uma transação (linha retornada pelo INSERT/UPDATE) ao rollup."""
+    upsert_params, _ = delta_params(row, 1)
+    query(UPSERT, upsert_params)
+
+
+def remove(row):
+    """Subtrai uma transação (estado anterior ao UPDATE/DELETE) do rollup."""
+    upsert_params, bucket = delta_params(row, -1)
+    query(UPSERT, upsert_params)
+    query(PRUNE, bucket)
+
+
+def bulk_add_sql(source):
+    """SQL que soma ao rollup todas as linhas de `source` (tabela ou CTE).
+
+    Usado pela importação em lote dentro de um WITH ... RETURNING.
+    """
+    return (
+        "INSERT INTO monthly_rollups (user_id, month, category, type, total, count) "
+        + _AGGREGATE_SQL.format(source=source, where='')
+        + _ON_CONFLICT_ADD
+    )
+
+
+@lru_cache(maxsize=None)
+def _summary_statement(key, has_from, has_to):
+    where = ["user_id = %s"]
+    if has_from:
+        where.append("month >= %s")
+    if has_to:
+        where.append("month <= %s")
+    sql_text = f"""
+    SELECT {key},
+           SUM(CASE WHEN type = %s THEN total ELSE 0 END) AS income,
+           SUM(CASE WHEN type = %s THEN total ELSE 0 END) AS expense,
+           SUM(total) AS total,
+           SUM(count) AS count
+    FROM monthly_rollups
+    WHERE {' AND '.join(where)}
+    GROUP BY {key}
+    ORDER BY {key}
+    """
+    name = f"monthly_rollups_summary_{key}_{int(has_from)}{int(has_to)}"
+    return statement(name, sql_text)
+
+
+def summary_query(user_id, date_from=None, date_to=None, group='month'):
+    """(statement, parâmetros) do resumo; compartilhado com a camada async."""
+    if group not in ('month', 'category'):
+        raise ValueError('Parâmetro "group" deve ser "month" ou "category".')
+
+    params = [INCOME_TYPE, EXPENSE_TYPE, user_id]
+    if date_from:
+        params.append(month_of(date_from))
+    if date_to:
+        params.append(month_of(date_to))
+    return _summary_statement(group, bool(date_from), bool(date_to)), tuple(params)
+
+
+def summary(user_id, date_from=None, date_to=None, group='month'):
+    """Totais de receita/despesa agrupados por mês ou por categoria.
+
+    date_from/date_to são arredondados para o mês (os buckets são mensais).
+    """
+    stmt, params = summary_query(user_id, date_from, date_to, group)
+    return query(stmt, params)
+
+
+def check(user_id=None):
+    """Compara o rollup com o recalculado a partir de transactions.
+
+    Retorna a lista de buckets divergentes (vazia se não houver drift).
+    """
+    where = "WHERE user_id = %s" if user_id else ""
+    params = (user_id, user_id) if user_id else None
+    sql_text = f"""
+    WITH expected AS ({_EXPECTED_SQL.format(where=where)}),
+         actual AS (
+             SELECT user_id, month, category, type, total, count
+             FROM monthly_rollups {where}
+         )
+    SELECT user_id, month, category, type,
+           e.total AS expected_total, a.total AS actual_total,
+           e.count AS expected_count, a.count AS actual_count
+    FROM expected e FULL OUTER JOIN actual a USING (user_id, month, category, type)
+    WHERE e.total IS DISTINCT FROM a.total OR e.count IS DISTINCT FROM a.count
+    ORDER BY user_id, month, category, type
+    """
+    return query(sql_text, params)
+
+
+def rebuild(user_id=None):
+    """Recalcula o rollup do zero (de um usuário ou de todos).
+
+    Bloqueia escritas em transactions durante a reconstrução para que nenhum
+    delta incremental se perca entre o DELETE e o INSERT.
+    """
+    where = "WHERE user_id = %s" if user_id else ""
+    params = (user_id,) if user_id else None
+    with transaction():
+        query("LOCK TABLE transactions IN SHARE MODE", fetch_all=False)
+        query(f"DELETE FROM monthly_rollups {where}", params, fetch_all=False)
+        query(
+            "INSERT INTO monthly_rollups (user_id, month, category, type, total, count) "
+            + _EXPECTED_SQL.format(where=where),
+            params, fetch_all=False
+        )
@@ -0,0 +1,216 @@
+# sessions.py - Sessões de refresh token, rotação e revogação (migração 0006)
+#
+# Login cria uma sessão; o refresh token leva sid + jti e cada renovação
+# troca o jti (o anterior deixa de valer). Reapresentar um jti já trocado é
+# tratado como roubo do token: a sessão inteira é revogada.
+#
+# authenticate_token não consulta o banco: os access tokens levam o sid e a
+# checagem é feita contra um deny set em memória. Cada worker sincroniza esse
+# conjunto no máximo a cada SESSION_DENY_SYNC_INTERVAL segundos, lendo só a
+# versão global das revogações (e as sessões novas quando ela muda). Um
+# logout vale na hora no worker que o atendeu e nos demais após o intervalo.
+
+import os
+import time
+import uuid
+import datetime
+import threading
+
+from db import query, transaction, statement
+
+SESSION_LIFETIME = datetime.timedelta(days=int(os.environ.get('SESSION_LIFETIME_DAYS', '30')))
+DENY_SYNC_INTERVAL = float(os.environ.get('SESSION_DENY_SYNC_INTERVAL', '2'))
+# Recarga completa do deny set (descarta sessões que já expiraram)
+DENY_RELOAD_INTERVAL = float(os.environ.get('SESSION_DENY_RELOAD_INTERVAL', '3600'))
+
+
+class SessionInvalid(Exception):
+    """Refresh token sem sessão válida (expirada, revogada ou jti já usado)."""
+
+
+CREATE_SESSION = statement('sessions_create', """
+    INSERT INTO sessions (id, user_id, refresh_jti, created_at, last_used_at, expires_at)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """, returns_rows=False)
+ROTATE_SESSION = statement('sessions_rotate', """
+    UPDATE sessions SET refresh_jti = %s, last_used_at = %s, expires_at = %s
+    WHERE id = %s AND user_id = %s AND refresh_jti = %s
+      AND revoked_at IS NULL AND expires_at > %s
+    RETURNING id
+    """)
+FIND_SESSION = statement(
+    'sessions_find',
+    "SELECT id, user_id, refresh_jti, revoked_at, expires_at FROM sessions WHERE id = %s"
+)
+BUMP_REVOCATION_VERSION = statement(
+    'session_revocations_bump',
+    "UPDATE session_revocations SET version = version + 1 WHERE id = 1 RETURNING version"
+)
+REVOKE_SESSION = statement('sessions_revoke', """
+    UPDATE sessions SET revoked_at = %s, revoked_version = %s
+    WHERE id = %s AND user_id = %s AND revoked_at IS NULL
+    RETURNING id
+    """)
+REVOKE_USER_SESSIONS = statement('sessions_revoke_user', """
+    UPDATE sessions SET revoked_at = %s, revoked_version = %s
+    WHERE user_id = %s AND revoked_at IS NULL AND expires_at > %s
+    RETURNING id
+    """)
+REVOCATION_VERSION = statement(
+    'session_revocations_version',
+    "SELECT version FROM session_revocations WHERE id = 1"
+)
+REVOKED_SINCE = statement('sessions_revoked_since', """
+    SELECT id FROM sessions
+    WHERE revoked_version > %s AND expires_at > %s
+    """)
+PRUNE_SESSIONS = statement(
+    'sessions_prune',
+    "DELETE FROM sessions WHERE expires_at < %s RETURNING id"
+)
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+def new_session(user_id):
+    """Parâmetros de CREATE_SESSION para uma sessão nova: (sid, jti, params)."""
+    sid, jti, now = uuid.uuid4().hex, uuid.uuid4().hex, utcnow()
+    return sid, jti, (sid, user_id, jti, now, now, now + SESSION_LIFETIME)
+
+
+def create_session(user_id):
+    """Abre uma sessão para o login; retorna (sid, jti do refresh token)."""
+    sid, jti, params = new_session(user_id)
+    query(CREATE_SESSION, params)
+    return sid, jti
+
+
+def rotate_params(sid, user_id, jti):
+    """(novo jti, params de ROTATE_SESSION)."""
+    new_jti, now = uuid.uuid4().hex, utcnow()
+    return new_jti, (new_jti, now, now + SESSION_LIFETIME, sid, user_id, jti, now)
+
+
+def rotate_session(sid, user_id, jti):
+    """Troca o jti do refresh token; retorna o novo ou levanta SessionInvalid.
+
+    Um jti antigo de uma sessão ainda ativa significa que o refresh token foi
+    reutilizado (vazou): a sessão é revogada.
+    """
+    new_jti, params = rotate_params(sid, user_id, jti)
+    if query(ROTATE_SESSION, params):
+        return new_jti
+    session = query(FIND_SESSION, (sid,))
+    if reused(session, user_id):
+        revoke_session(sid, user_id)
+        print(f"Aviso: refresh token reutilizado na sessão {sid}; sessão revogada.")
+    raise SessionInvalid()
+
+
+def reused(session, user_id):
+    """True se a sessão (resultado de FIND_SESSION) está ativa: o jti era antigo."""
+    return bool(session) and session[0]['user_id'] == user_id and session[0]['revoked_at'] is None
+
+
+def revoke_session(sid, user_id):
+    """Logout de uma sessão. Retorna True se ela estava ativa."""
+    with transaction():
+        version = query(BUMP_REVOCATION_VERSION)[0]['version']
+        revoked = query(REVOKE_SESSION, (utcnow(), version, sid, user_id))
+    deny(row['id'] for row in revoked or [])
+    return bool(revoked)
+
+
+def revoke_user_sessions(user_id):
+    """Logout de todas as sessões do usuário. Retorna quantas foram revogadas."""
+    now = utcnow()
+    with transaction():
+        version = query(BUMP_REVOCATION_VERSION)[0]['version']
+        revoked = query(REVOKE_USER_SESSIONS, (now, version, user_id, now))
+    deny(row['id'] for row in revoked or [])
+    return len(revoked or [])
+
+
+def prune_sessions():
+    """Remove sessões expiradas (manage.py prune-sessions)."""
+    return len(query(PRUNE_SESSIONS, (utcnow(),)) or [])
+
+
+# --- Deny set em memória ---
+
+_denied = frozenset()
+_version = None
+_synced_at = 0.0
+_reloaded_at = 0.0
+_sync_lock = threading.Lock()
+
+
+def deny(sids):
+    """Adiciona sessões revogadas por este processo (sem esperar a sincronização).
+
+    Sem lock: no modo async o lock de sincronização pode estar com uma
+    corrotina suspensa na mesma thread. Se a troca coincidir com uma
+    sincronização, a versão já incrementada faz a próxima recuperar o sid.
+    """
+    global _denied
+    _denied = _denied.union(sids)
+
+
+def claim_sync():
+    """True se quem chamou deve sincronizar agora (e então chamar release_sync)."""
+    global _synced_at
+    if time.monotonic() - _synced_at < DENY_SYNC_INTERVAL:
+        return False
+    if not _sync_lock.acquire(blocking=False):
+        return False
+    # Marca antes de consultar: se o banco falhar, tenta de novo só no próximo intervalo
+    _synced_at = time.monotonic()
+    return True
+
+
+def release_sync():
+    _sync_lock.release()
+
+
+def pending_since(version):
+    """Versão a partir da qual buscar revogações (-1 = recarga completa) ou None."""
+    if _version is None or time.monotonic() - _reloaded_at >= DENY_RELOAD_INTERVAL:
+        return -1
+    return _version if version != _version else None
+
+
+def apply_revoked(version, rows, since):
+    """Aplica o resultado de REVOKED_SINCE (chamar com o lock de claim_sync)."""
+    global _denied, _version, _reloaded_at
+    ids = frozenset(row['id'] for row in rows or [])
+    if since < 0:
+        _denied = ids
+        _reloaded_at = time.monotonic()
+    else:
+        _denied = _denied | ids
+    _version = version
+
+
+def sync():
+    version = query(REVOCATION_VERSION)[0]['version']
+    since = pending_since(version)
+    if since is not None:
+        apply_revoked(version, query(REVOKED_SINCE, (since, utcnow())), since)
+
+
+def denied(sid):
+    return sid in _denied
+
+
+def is_revoked(sid):
+    """Checagem do authenticate_token: só memória, salvo a sincronização periódica."""
+    if claim_sync():
+        try:
+            sync()
+        except Exception as e:
+            print(f"Aviso: falha ao sincronizar sessões revogadas: {e}")
+        finally:
+            release_sync()
+    return denied(sid)
@@ -0,0 +1,412 @@
+# sqlite_db.py - Backend SQLite (arquivo ou :memory:) para o db.py
+#
+# Selecionado com DATABASE_URL=sqlite:///caminho.db ou sqlite:///:memory:.
+# Serve para rodar a API, os benchmarks e suítes de regressão sem um Postgres:
+# o SQL do data_manager/rollups/migrations é o mesmo, traduzido aqui para o
+# dialeto do SQLite (placeholders, casts, travas) na primeira execução.
+#
+# SQLitePool implementa a mesma interface de backend de db.ConnectionPool:
+# getconn/putconn/closeall/stats + execute/iterate/copy_in/copy_out.
+
+import io
+import os
+import re
+import csv
+import time
+import sqlite3
+import datetime
+import threading
+import unicodedata
+from decimal import Decimal
+from functools import lru_cache
+
+import metrics
+
+# Espera máxima (ms) pelo lock de escrita do arquivo antes de falhar
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'))
+
+# Colunas NUMERIC(_, 2) do schema e agregados sobre elas. O SQLite guarda
+# NUMERIC como inteiro/real; aqui voltam como Decimal, como no Postgres.
+MONEY_COLUMNS = frozenset([
+    'amount', 'saved', 'total', 'income', 'expense', 'expected_total', 'actual_total',
+])
+_CENT = Decimal('0.01')
+
+# Mensagem do RAISE dos triggers da migração 0008 (valor fora do tipo da coluna)
+TYPE_ERROR_PREFIX = 'tipo inválido:'
+
+
+def _convert_date(value):
+    # Datas são gravadas como texto ISO; aceita também "AAAA-MM-DDT..."
+    return datetime.date.fromisoformat(value[:10].decode('ascii'))
+
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(' '))
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('BOOLEAN', lambda value: value not in (b'0', b''))
+
+
+def _date_trunc(unit, value):
+    """date_trunc('month'|'year'|'day', data) do Postgres, sobre datas ISO."""
+    if value is None:
+        return None
+    day = datetime.date.fromisoformat(str(value)[:10])
+    if unit == 'month':
+        day = day.replace(day=1)
+    elif unit == 'year':
+        day = day.replace(month=1, day=1)
+    elif unit != 'day':
+        raise ValueError(f"date_trunc: unidade não suportada: {unit}")
+    return day.isoformat()
+
+
+def _search_normalize(value):
+    """search_normalize() da migração 0005: minúsculas e sem acentos."""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _transaction_search_text(description, category):
+    return _search_normalize(f"{description or ''} {category or ''}")
+
+
+def _trigrams(text):
+    grams = set()
+    for word in re.findall(r'\w+', text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _word_similarity(needle, haystack):
+    """Aproximação do word_similarity() do pg_trgm: fração dos trigramas da
+    busca presentes no texto."""
+    wanted = _trigrams(needle or '')
+    if not wanted:
+        return 0.0
+    return len(wanted & _trigrams(haystack or '')) / len(wanted)
+
+
+def parse_url(url):
+    """sqlite:///:memory: -> ':memory:', sqlite:///dados.db -> 'dados.db',
+    sqlite:////abs/dados.db -> '/abs/dados.db'."""
+    rest = url.split('://', 1)[1] if '://' in url else ''
+    if rest in ('', '/', '/:memory:', ':memory:'):
+        return ':memory:'
+    return rest[1:] if rest.startswith('/') else rest
+
+
+# --- Tradução do dialeto ---
+
+_LOCK_TABLE = re.compile(r'^\s*LOCK\s+TABLE\b', re.IGNORECASE)
+_ADVISORY_LOCK = re.compile(r'^\s*SELECT\s+pg_advisory_xact_lock\s*\(', re.IGNORECASE)
+_FOR_UPDATE = re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE)
+_CAST = re.compile(r'::[A-Za-z_]\w*')
+_ON_COMMIT_DROP = re.compile(r'\s+ON\s+COMMIT\s+DROP\b', re.IGNORECASE)
+_TEMP_TABLE = re.compile(r'CREATE\s+TEMP(?:ORARY)?\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', re.IGNORECASE)
+
+
+def _split_script(text):
+    """Separa um script (migração) em comandos completos."""
+    statements, current = [], ''
+    for piece in text.split(';'):
+        current += piece + ';'
+        if sqlite3.complete_statement(current):
+            if current.strip(' \t\r\n;'):
+                statements.append(current.strip())
+            current = ''
+    if current.strip(' \t\r\n;'):
+        statements.append(current.strip())
+    return statements
+
+
+@lru_cache(maxsize=1024)
+def translate(text):
+    """SQL no estilo psycopg2/Postgres -> (comandos SQLite, precisa_lock_de_escrita).
+
+    Cada comando é (sql, tabela_temporária_a_remover_no_fim_da_transação).
+    Travas de linha/tabela e advisory locks viram o lock de escrita do banco
+    inteiro (BEGIN IMMEDIATE), que é a única granularidade do SQLite.
+    """
+    if _LOCK_TABLE.match(text) or _ADVISORY_LOCK.match(text):
+        return (), True
+
+    write_lock = bool(_FOR_UPDATE.search(text))
+    converted = _FOR_UPDATE.sub('', text)
+    converted = _CAST.sub('', converted)
+    # "%s" -> "?" e "%%" -> "%" (mesma convenção de Statement.prepare_sql)
+    converted = '%'.join(piece.replace('%s', '?') for piece in converted.split('%%'))
+
+    commands = []
+    for sql_text in _split_script(converted):
+        drop = None
+        if _ON_COMMIT_DROP.search(sql_text):
+            sql_text = _ON_COMMIT_DROP.sub('', sql_text)
+            match = _TEMP_TABLE.search(sql_text)
+            drop = match.group(1) if match else None
+        commands.append((sql_text, drop))
+    return tuple(commands), write_lock
+
+
+def _raise_type_error(e):
+    """Relança o IntegrityError dos triggers de tipo como sqlite3.DataError,
+    como o DataError do psycopg2 para o mesmo valor no Postgres (ver
+    db.is_data_error); outros IntegrityError seguem como estão."""
+    if str(e).startswith(TYPE_ERROR_PREFIX):
+        raise sqlite3.DataError(str(e)) from e
+    raise e
+
+
+def _normalize(col_names, row):
+    item = dict(zip(col_names, row))
+    for name in MONEY_COLUMNS.intersection(item):
+        value = item[name]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            item[name] = Decimal(repr(value)).quantize(_CENT)
+    return item
+
+
+class SQLiteConnection:
+    """Conexão sqlite3 em modo autocommit com BEGIN/COMMIT explícitos.
+
+    A transação começa no primeiro comando após o checkout, como no psycopg2.
+    """
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(
+            path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None,
+            check_same_thread=False, cached_statements=512,
+        )
+        self.raw.create_function('date_trunc', 2, _date_trunc, deterministic=True)
+        self.raw.create_function('search_normalize', 1, _search_normalize, deterministic=True)
+        self.raw.create_function('transaction_search_text', 2, _transaction_search_text, deterministic=True)
+        self.raw.create_function('word_similarity', 2, _word_similarity, deterministic=True)
+        self.raw.execute("PRAGMA foreign_keys = ON")
+        self.raw.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+        if path != ':memory:':
+            self.raw.execute("PRAGMA journal_mode = WAL")
+        self.closed = False
+        self.in_transaction = False
+        self._temp_tables = []
+
+    def begin(self, immediate=False):
+        if not self.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            self.in_transaction = True
+
+    def _finish(self, command):
+        if self.in_transaction:
+            self.in_transaction = False
+            self.raw.execute(command)
+        # Equivalente ao ON COMMIT DROP das tabelas temporárias
+        temp_tables, self._temp_tables = self._temp_tables, []
+        for table in temp_tables:
+            self.raw.execute(f'DROP TABLE IF EXISTS temp."{table}"')
+
+    def commit(self):
+        self._finish("COMMIT")
+
+    def rollback(self):
+        self._finish("ROLLBACK")
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.raw.close()
+
+
+# Banco :memory: de cada processo: sobrevive a close_pool(), senão o schema
+# e os dados sumiriam a cada recriação do pool.
+_memory = {}
+_memory_lock = threading.Lock()
+
+
+class SQLitePool:
+    """Pool de conexões SQLite com a interface de db.ConnectionPool.
+
+    Arquivo: até maxconn conexões (WAL: leitores em paralelo, um escritor).
+    :memory:: uma única conexão compartilhada, entregue a uma thread por vez.
+    """
+
+    dialect = 'sqlite'
+
+    def __init__(self, path, maxconn, timeout):
+        self.path = path
+        self.memory = path == ':memory:'
+        self.maxconn = 1 if self.memory else maxconn
+        self.timeout = timeout
+        self.pid = os.getpid()
+
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._stats = {'checkouts': 0, 'waits': 0, 'wait_time': 0.0, 'timeouts': 0, 'created': 0}
+        self.in_use = 0
+        self.open = 0
+
+        if self.memory:
+            with _memory_lock:
+                conn = _memory.get(self.pid)
+                if conn is None or conn.closed:
+                    conn = _memory[self.pid] = SQLiteConnection(path)
+            self._idle.append(conn)
+            self.open = 1
+
+    def getconn(self):
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            acquired = self._slots.acquire(timeout=self.timeout)
+            waited = time.monotonic() - started
+            metrics.DB_POOL_WAIT.observe(waited)
+            with self._lock:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += waited
+                if not acquired:
+                    self._stats['timeouts'] += 1
+            if not acquired:
+                raise Exception(
+                    f"Pool de conexões esgotado: nenhuma conexão livre em {self.timeout}s."
+                )
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = SQLiteConnection(self.path)
+                with self._lock:
+                    self._stats['created'] += 1
+                    self.open += 1
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self.in_use += 1
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            if conn.in_transaction:
+                try:
+                    conn.rollback()
+                except Exception:
+                    close = not self.memory
+            if close and not self.memory:
+                conn.close()
+                with self._lock:
+                    self.open -= 1
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        if self.memory:
+            return
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                'backend': 'sqlite',
+                'path': self.path,
+                'pid': self.pid,
+                'max_size': self.maxconn,
+                'in_use': self.in_use,
+                'idle': len(self._idle),
+                'open': self.open,
+            })
+        return data
+
+    # --- Interface de execução (mesma de db.ConnectionPool) ---
+
+    def _run(self, conn, text, params):
+        commands, write_lock = translate(text)
+        conn.begin(immediate=write_lock)
+        cur = None
+        for sql_text, temp_table in commands:
+            try:
+                cur = conn.raw.execute(sql_text, params if len(commands) == 1 and params else ())
+            except sqlite3.IntegrityError as e:
+                _raise_type_error(e)
+            if temp_table:
+                conn._temp_tables.append(temp_table)
+        return cur
+
+    def execute(self, conn, stmt, params):
+        # Statement registrado: o cache de statements do sqlite3 faz o papel do PREPARE
+        cur = self._run(conn, getattr(stmt, 'text', stmt), params)
+        if cur is None or cur.description is None:
+            return None
+        col_names = [desc[0] for desc in cur.description]
+        return [_normalize(col_names, row) for row in cur.fetchall()]
+
+    def iterate(self, conn, text, params, batch_size):
+        cur = self._run(conn, text, params)
+        if cur is None or cur.description is None:
+            return
+        col_names = [desc[0] for desc in cur.description]
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _normalize(col_names, row)
+
+    _COPY = re.compile(r'^\s*COPY\s+(\w+)\s*(?:\(([^)]*)\))?\s*FROM\s+STDIN\b', re.IGNORECASE)
+
+    def copy_in(self, conn, copy_sql, file):
+        # Só CSV: COPY tabela [(colunas)] FROM STDIN WITH (FORMAT csv)
+        match = self._COPY.match(copy_sql)
+        if not match:
+            raise Exception(f"COPY não suportado no SQLite: {copy_sql}")
+        rows = [[value if value != '' else None for value in row] for row in csv.reader(file)]
+        if not rows:
+            return
+        conn.begin()
+        placeholders = ', '.join(['?'] * len(rows[0]))
+        table, columns = match.groups()
+        columns = f" ({columns})" if columns else ''
+        try:
+            conn.raw.executemany(f'INSERT INTO "{table}"{columns} VALUES ({placeholders})', rows)
+        except sqlite3.IntegrityError as e:
+            _raise_type_error(e)
+
+    _COPY_OUT = re.compile(r'^\s*COPY\s*\((.*)\)\s*TO\s+STDOUT\b(.*)$', re.IGNORECASE | re.DOTALL)
+
+    def copy_out(self, conn, copy_sql, params, file):
+        # Só CSV: COPY (SELECT ...) TO STDOUT WITH (FORMAT csv[, HEADER])
+        match = self._COPY_OUT.match(copy_sql)
+        if not match:
+            raise Exception(f"COPY não suportado no SQLite: {copy_sql}")
+        select_sql, options = match.groups()
+        cur = self._run(conn, select_sql, params)
+        col_names = [desc[0] for desc in cur.description]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if 'HEADER' in options.upper():
+            writer.writerow(col_names)
+        count = 0
+        while True:
+            rows = cur.fetchmany(500)
+            if not rows:
+                break
+            for row in rows:
+                item = _normalize(col_names, row)
+                # Mesmo texto do COPY do Postgres para booleanos
+                writer.writerow(['t' if v is True else 'f' if v is False else v for v in item.values()])
+            count += len(rows)
+            file.write(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+        file.write(buffer.getvalue().encode('utf-8'))
+        return count
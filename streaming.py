@@ -0,0 +1,65 @@
+# streaming.py - Respostas JSON geradas à medida que as linhas chegam do banco
+
+from itertools import chain
+from flask import Response, current_app, stream_with_context
+
+# Linhas serializadas por pedaço escrito na resposta
+ROWS_PER_CHUNK = 500
+
+FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def wants_stream(req):
+    """Formato de streaming pedido pelo cliente (?stream=json|ndjson ou Accept), ou None."""
+    value = (req.args.get('stream') or '').lower()
+    if value in ('1', 'true', 'json'):
+        return 'json'
+    if value == 'ndjson':
+        return 'ndjson'
+    if 'application/x-ndjson' in req.headers.get('Accept', ''):
+        return 'ndjson'
+    return None
+
+
+def _chunks(rows, fmt, dumps):
+    buffer = []
+    first = True
+    if fmt == 'json':
+        yield '['
+    for row in rows:
+        encoded = dumps(row)
+        if fmt == 'json':
+            buffer.append(encoded if first else ',' + encoded)
+        else:
+            buffer.append(encoded + '\n')
+        first = False
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+    if fmt == 'json':
+        yield ']'
+
+
+def stream_response(rows, fmt='json', status=200):
+    """Response Flask que escreve um array JSON (ou NDJSON) lote a lote.
+
+    A primeira linha é buscada antes de montar a resposta, para que erros de
+    consulta ainda virem um 500 normal em vez de um corpo truncado.
+    """
+    rows = iter(rows)
+    try:
+        first = next(rows)
+        rows = chain([first], rows)
+    except StopIteration:
+        rows = iter(())
+    dumps = current_app.json.dumps
+    return Response(
+        stream_with_context(_chunks(rows, fmt, dumps)),
+        status=status,
+        mimetype=FORMATS[fmt],
+    )
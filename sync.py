@@ -0,0 +1,137 @@
+# sync.py - Sincronização incremental (GET /api/sync?since=<cursor>)
+#
+# Cada escrita do data_manager grava changed_seq (sequência por usuário) na
+# linha e cada DELETE deixa um tombstone (migração 0004). O sync devolve só o
+# que mudou depois do cursor, em todas as coleções, paginado pela sequência:
+# o custo depende do número de edições, não do tamanho dos dados.
+
+import os
+import json
+import base64
+import datetime
+from functools import lru_cache
+
+from db import query, transaction, statement
+from data_manager import SYNC_COLLECTIONS, _ident, columns
+
+DEFAULT_SYNC_LIMIT = 1000
+MAX_SYNC_LIMIT = int(os.environ.get('SYNC_MAX_LIMIT', '5000'))
+
+SYNC_STATE = statement(
+    'change_sequences_state',
+    "SELECT seq, pruned_seq FROM change_sequences WHERE user_id = %s"
+)
+TOMBSTONES_SINCE = statement('tombstones_since', """
+    SELECT collection, id, deleted_seq FROM tombstones
+    WHERE user_id = %s AND deleted_seq > %s AND deleted_seq <= %s
+    ORDER BY deleted_seq
+    LIMIT %s
+    """)
+
+
+@lru_cache(maxsize=None)
+def _changes_statement(table_name):
+    sql_text = (
+        f"SELECT {columns(table_name)} FROM {_ident(table_name)} "
+        "WHERE user_id = %s AND changed_seq > %s AND changed_seq <= %s "
+        "ORDER BY changed_seq LIMIT %s"
+    )
+    return statement(f"{table_name}_changed_since", sql_text)
+
+
+def encode_sync_cursor(seq):
+    raw = json.dumps({'seq': seq}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_sync_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        seq = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))['seq']
+        if not isinstance(seq, int) or seq < 0:
+            raise ValueError
+    except Exception:
+        raise ValueError('Cursor de sincronização inválido.')
+    return seq
+
+
+def changes_since(user_id, cursor=None, limit=DEFAULT_SYNC_LIMIT):
+    """Mudanças do usuário depois do cursor, em todas as coleções.
+
+    Retorna {'changes': {coleção: [linhas]}, 'deleted': {coleção: [ids]},
+    'cursor', 'has_more', 'full'}. Sem cursor (ou com um cursor anterior ao
+    último prune-tombstones) a resposta é uma cópia completa ("full": o
+    cliente descarta o que tem). Dentro de uma página, aplicar primeiro os
+    "deleted" e depois os "changes" é sempre correto: uma linha recriada
+    depois de removida tem sequência maior que o tombstone.
+    """
+    try:
+        limit = int(limit) if limit else DEFAULT_SYNC_LIMIT
+    except (TypeError, ValueError):
+        raise ValueError('Parâmetro "limit" inválido.')
+    limit = max(1, min(limit, MAX_SYNC_LIMIT))
+    full = not cursor
+    since = 0 if full else decode_sync_cursor(cursor)
+
+    entries = []
+    # Uma conexão para a página toda; o limite superior lido no início deixa
+    # de fora escritas que ainda não tinham feito commit
+    with transaction():
+        state = query(SYNC_STATE, (user_id,))
+        upper, pruned = (state[0]['seq'], state[0]['pruned_seq']) if state else (0, 0)
+        if since > upper:
+            raise ValueError('Cursor de sincronização inválido.')
+        if not full and since < pruned:
+            full, since = True, 0
+
+        # Linhas anteriores à migração 0004 podem ter changed_seq = 0
+        lower = -1 if full else since
+        for collection in SYNC_COLLECTIONS:
+            for row in query(_changes_statement(collection), (user_id, lower, upper, limit + 1)):
+                entries.append((row['changed_seq'], collection, row, False))
+        if not full:
+            for row in query(TOMBSTONES_SINCE, (user_id, since, upper, limit + 1)):
+                entries.append((row['deleted_seq'], row['collection'], row['id'], True))
+
+    # Cada coleção trouxe um prefixo (em ordem de sequência) de até limit+1
+    # entradas, então os primeiros "limit" da junção são os globais
+    entries.sort(key=lambda entry: entry[0])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changes = {collection: [] for collection in SYNC_COLLECTIONS}
+    deleted = {collection: [] for collection in SYNC_COLLECTIONS}
+    for _, collection, payload, is_tombstone in entries:
+        if is_tombstone:
+            deleted.setdefault(collection, []).append(payload)
+        else:
+            changes[collection].append(payload)
+
+    next_seq = max(entries[-1][0], since) if has_more else upper
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'cursor': encode_sync_cursor(next_seq),
+        'has_more': has_more,
+        'full': full,
+    }
+
+
+def prune_tombstones(days):
+    """Remove tombstones mais velhos que `days` dias.
+
+    Guarda por usuário a maior sequência removida (pruned_seq): clientes com
+    cursor anterior a ela recebem uma sincronização completa.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    with transaction():
+        query("""
+        UPDATE change_sequences SET pruned_seq = p.max_seq
+        FROM (
+            SELECT user_id, MAX(deleted_seq) AS max_seq FROM tombstones
+            WHERE deleted_at < %s GROUP BY user_id
+        ) p
+        WHERE change_sequences.user_id = p.user_id AND p.max_seq > change_sequences.pruned_seq
+        """, (cutoff,), fetch_all=False)
+        removed = query("DELETE FROM tombstones WHERE deleted_at < %s RETURNING id", (cutoff,))
+    return len(removed)
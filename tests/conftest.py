@@ -0,0 +1,54 @@
+# tests/conftest.py - Suíte de regressão num SQLite em memória
+#
+# O ambiente é definido antes de importar o app: db.py escolhe o backend pelo
+# DATABASE_URL na importação. bcrypt com poucas rodadas e sem limite de taxa
+# para os testes não dependerem do relógio.
+#
+# Uso: python -m pytest -q (na raiz do projeto)
+
+import os
+import sys
+import uuid
+
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+os.environ.setdefault('BCRYPT_WORKERS', '0')
+os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import api
+import migrate
+
+migrate.migrate()
+
+from app import app as flask_app
+
+
+@pytest.fixture
+def client():
+    flask_app.config['TESTING'] = True
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Registra um usuário novo e devolve o corpo do login (token, refreshToken)."""
+    credentials = {'username': f'teste-{uuid.uuid4().hex[:12]}', 'password': 'segredo123'}
+    assert client.post('/auth/register', json=credentials).status_code == 201
+    response = client.post('/auth/login', json=credentials)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+@pytest.fixture
+def headers(login):
+    return {'Authorization': f"Bearer {login['token']}"}
+
+
+@pytest.fixture
+def user_id(headers):
+    claims, _ = api.access_claims(headers['Authorization'])
+    return claims['userId']
@@ -0,0 +1,43 @@
+import data_manager as dm
+
+
+def _transaction(description, amount='10'):
+    return {'method': 'POST', 'path': '/api/transactions', 'body': {
+        'date': '2024-05-01', 'description': description, 'category': 'c',
+        'type': 'Despesa', 'amount': amount}}
+
+
+def test_atomic_batch_rolls_back_everything(client, headers, user_id):
+    operations = [
+        _transaction('gravada e desfeita'),
+        {'method': 'POST', 'path': '/api/categories', 'body': {'name': 'Nova'}},
+        {'method': 'DELETE', 'path': '/api/goals/nao-existe'},
+        _transaction('depois da falha'),
+    ]
+    response = client.post('/api/batch', headers=headers, json={'operations': operations})
+
+    assert response.status_code == 422
+    body = response.get_json()
+    assert body['committed'] is False
+    assert [result['status'] for result in body['results']] == [424, 424, 404, 424]
+    assert dm.find_all('transactions', user_id) == []
+    assert dm.find_category_by_name('Nova', user_id) is None
+    assert dm.find_all('goals', user_id) == []
+
+
+def test_best_effort_keeps_successful_operations(client, headers, user_id):
+    incomplete = {'method': 'POST', 'path': '/api/transactions', 'body': {'description': 'sem data'}}
+    operations = [_transaction('ok'), incomplete, _transaction('ok 2')]
+    response = client.post('/api/batch', headers=headers,
+                           json={'operations': operations, 'mode': 'best_effort'})
+
+    assert response.status_code == 200
+    assert [result['status'] for result in response.get_json()['results']] == [201, 400, 201]
+    assert sorted(t['description'] for t in dm.find_all('transactions', user_id)) == ['ok', 'ok 2']
+
+
+def test_batch_rejects_bad_payload(client, headers):
+    assert client.post('/api/batch', headers=headers, json=[]).status_code == 400
+    assert client.post('/api/batch', headers=headers, json={'operations': []}).status_code == 400
+    assert client.post('/api/batch', headers=headers,
+                       json={'operations': [_transaction('x')], 'mode': 'x'}).status_code == 400
@@ -0,0 +1,51 @@
+import pytest
+
+import data_manager as dm
+
+
+def _transaction(**fields):
+    return {'date': '2024-06-01', 'description': 'x', 'category': 'c',
+            'type': 'Despesa', 'amount': '10.50', **fields}
+
+
+@pytest.mark.parametrize('fields', [
+    {'amount': 'abc'},
+    {'amount': ''},
+    {'date': 'ontem'},
+    {'date': '2024-13-01'},
+    {'date': '2024-02-30'},
+])
+def test_bad_transaction_values_are_400(client, headers, user_id, fields):
+    response = client.post('/api/transactions', headers=headers, json=_transaction(**fields))
+
+    assert response.status_code == 400
+    assert dm.find_all('transactions', user_id) == []
+    assert client.get('/api/summary', headers=headers).get_json() == []
+
+
+def test_numeric_strings_and_iso_datetimes_are_accepted(client, headers):
+    response = client.post('/api/transactions', headers=headers,
+                           json=_transaction(amount='10.50', date='2024-06-01T12:00:00.000Z'))
+    assert response.status_code == 201
+    assert response.get_json()['amount'] == 10.5
+
+
+def test_bad_values_on_update_are_400(client, headers):
+    goal = client.post('/api/goals', headers=headers, json={
+        'name': 'Meta', 'amount': '100', 'saved': '0', 'target_date': None}).get_json()
+    response = client.put(f"/api/goals/{goal['id']}", headers=headers, json={
+        'name': 'Meta', 'amount': '100', 'saved': 'muito', 'target_date': '2025-01-01'})
+    assert response.status_code == 400
+
+    bill = client.post('/api/bills', headers=headers, json={
+        'description': 'Luz', 'amount': '80', 'due_date': '2024-07-10'}).get_json()
+    response = client.put(f"/api/bills/{bill['id']}", headers=headers, json={
+        'description': 'Luz', 'amount': '80', 'due_date': '10/07/2024', 'paid': False})
+    assert response.status_code == 400
+
+
+def test_batch_reports_bad_amount(client, headers):
+    operations = [{'method': 'POST', 'path': '/api/transactions', 'body': _transaction(amount='abc')}]
+    response = client.post('/api/batch', headers=headers,
+                           json={'operations': operations, 'mode': 'best_effort'})
+    assert [result['status'] for result in response.get_json()['results']] == [400]
@@ -0,0 +1,16 @@
+import data_manager as dm
+
+
+def test_dashboard_creates_default_categories_for_new_user(client, headers, user_id):
+    body = client.get('/api/dashboard', headers=headers).get_json()
+    assert [c['name'] for c in body['categories']] == sorted(dm.DEFAULT_CATEGORIES)
+
+    # Criadas uma vez só: a listagem devolve as mesmas
+    listed = client.get('/api/categories', headers=headers).get_json()
+    assert [c['id'] for c in listed] == [c['id'] for c in body['categories']]
+
+
+def test_dashboard_keeps_existing_categories(client, headers, user_id):
+    dm.create_category('Lazer', user_id)
+    body = client.get('/api/dashboard', headers=headers).get_json()
+    assert [c['name'] for c in body['categories']] == ['Lazer']
@@ -0,0 +1,16 @@
+import app as app_module
+
+
+def test_metrics_is_closed_without_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', '')
+    assert client.get('/metrics').status_code == 404
+
+
+def test_metrics_requires_the_configured_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'segredo')
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer outro'}).status_code == 403
+
+    response = client.get('/metrics', headers={'Authorization': 'Bearer segredo'})
+    assert response.status_code == 200
+    assert 'http_requests_total' in response.get_data(as_text=True)
@@ -0,0 +1,46 @@
+import data_manager as dm
+
+
+def _pages(client, headers, path):
+    items, cursor = [], None
+    while True:
+        url = f'{path}?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        items.extend(response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return items
+
+
+def test_goals_keyset_with_null_target_date(client, headers, user_id):
+    dates = ['2025-03-01', None, '2025-01-01', None, '2025-02-01', None, '2025-01-01']
+    for i, target_date in enumerate(dates):
+        dm.create_goal({'name': f'Meta {i}', 'amount': '100', 'saved': '0',
+                        'target_date': target_date}, user_id)
+
+    items = _pages(client, headers, '/api/goals')
+
+    assert len(items) == len(dates)
+    assert len({item['id'] for item in items}) == len(dates)
+    # Datas em ordem crescente, NULLs no fim, empates desfeitos pelo id
+    keys = [(item['target_date'] is None, item['target_date'] or '', item['id']) for item in items]
+    assert keys == sorted(keys)
+    assert [item['target_date'] for item in items][-3:] == [None, None, None]
+
+
+def test_transactions_keyset_desc(client, headers):
+    for day in (3, 1, 2, 2, 5):
+        client.post('/api/transactions', headers=headers, json={
+            'date': f'2024-01-0{day}', 'description': 'x', 'category': 'c',
+            'type': 'Despesa', 'amount': '1'})
+
+    items = _pages(client, headers, '/api/transactions')
+
+    assert [item['date'][:10] for item in items] == [
+        '2024-01-05', '2024-01-03', '2024-01-02', '2024-01-02', '2024-01-01']
+
+
+def test_invalid_cursor_is_400(client, headers):
+    response = client.get('/api/goals?limit=2&cursor=%%%', headers=headers)
+    assert response.status_code == 400
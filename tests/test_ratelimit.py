@@ -0,0 +1,60 @@
+import pytest
+
+import ratelimit
+
+
+class FakeRule:
+    def __init__(self, rule):
+        self.rule = rule
+
+
+class FakeRequest:
+    def __init__(self, path, forwarded=None, remote_addr='10.0.0.1'):
+        self.path = path
+        self.url_rule = FakeRule(path)
+        self.method = 'POST'
+        self.remote_addr = remote_addr
+        self.headers = {'X-Forwarded-For': forwarded} if forwarded else {}
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(ratelimit, '_backend', ratelimit.MemoryBackend())
+    monkeypatch.setitem(ratelimit.POLICIES, 'auth', (0.001, 100))
+    monkeypatch.setitem(ratelimit.POLICIES, 'login', (0.001, 3))
+
+
+def test_client_ip_counts_trusted_proxies_from_the_end(monkeypatch):
+    request = FakeRequest('/auth/login', forwarded='6.6.6.6, 203.0.113.7, 10.1.1.1')
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUST_PROXY', 1)
+    assert ratelimit.client_ip(request) == '10.1.1.1'
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUST_PROXY', 2)
+    assert ratelimit.client_ip(request) == '203.0.113.7'
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUST_PROXY', 0)
+    assert ratelimit.client_ip(request) == '10.0.0.1'
+
+
+@pytest.mark.parametrize('value, hops', [('0', 0), ('1', 1), ('2', 2), ('true', 1), ('no', 0)])
+def test_proxy_hops(value, hops):
+    assert ratelimit._proxy_hops(value) == hops
+
+
+def test_login_bucket_is_per_username(limiter, monkeypatch):
+    # Sem proxy confiável todos os clientes chegam com o IP do proxy
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUST_PROXY', 0)
+    request = FakeRequest('/auth/login')
+
+    for _ in range(3):
+        assert ratelimit.check_ip(request, ratelimit.login_username({'username': 'Alvo'})) == 0
+    assert ratelimit.check_ip(request, 'alvo') > 0
+
+    # Outro usuário atrás do mesmo IP continua entrando
+    assert ratelimit.check_ip(request, ratelimit.login_username({'username': 'outra'})) == 0
+
+
+def test_login_username_ignores_bad_bodies():
+    assert ratelimit.login_username(None) == ''
+    assert ratelimit.login_username(['x']) == ''
+    assert ratelimit.login_username({'username': 7}) == ''
+    assert ratelimit.login_username({'username': ' Ana '}) == 'ana'
@@ -0,0 +1,55 @@
+import rollups
+
+
+def _post(client, headers, **fields):
+    body = {'date': '2024-03-15', 'description': 'x', 'category': 'Mercado',
+            'type': 'Despesa', 'amount': '10.50', **fields}
+    response = client.post('/api/transactions', headers=headers, json=body)
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_rollup_follows_create_update_delete(client, headers, user_id):
+    first = _post(client, headers)
+    second = _post(client, headers, amount='4.50')
+    _post(client, headers, type='Receita', category='Salário', amount='100', date='2024-04-01')
+    assert rollups.check(user_id) == []
+
+    # Muda de mês e de categoria: sai de um bucket e entra em outro
+    response = client.put(f"/api/transactions/{second['id']}", headers=headers, json={
+        'date': '2024-04-20', 'description': 'x', 'category': 'Lazer',
+        'type': 'Despesa', 'amount': '7'})
+    assert response.get_json()['category'] == 'Lazer'
+    assert rollups.check(user_id) == []
+
+    assert client.delete(f"/api/transactions/{first['id']}", headers=headers).status_code == 200
+    assert rollups.check(user_id) == []
+
+    months = {row['month'][:7]: row for row in client.get('/api/summary', headers=headers).get_json()}
+    assert set(months) == {'2024-04'}
+    assert months['2024-04']['income'] == 100.0
+    assert months['2024-04']['expense'] == 7.0
+
+
+def test_summary_by_category(client, headers):
+    _post(client, headers, amount='2')
+    _post(client, headers, amount='3')
+    rows = client.get('/api/summary?group=category', headers=headers).get_json()
+    assert [(row['category'], row['expense'], row['count']) for row in rows] == [('Mercado', 5.0, 2)]
+
+
+def test_summary_rejects_bad_dates_with_the_api_message(client, headers):
+    response = client.get('/api/summary?from=xx', headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Data inválida em "from" (use AAAA-MM-DD).'
+
+    response = client.get('/api/summary?to=2024-13-01', headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Data inválida em "to" (use AAAA-MM-DD).'
+
+
+def test_summary_date_range_rounds_to_month(client, headers):
+    _post(client, headers, date='2024-03-15')
+    _post(client, headers, date='2024-05-02')
+    rows = client.get('/api/summary?from=2024-03-20&to=2024-04-30', headers=headers).get_json()
+    assert [row['month'][:7] for row in rows] == ['2024-03']
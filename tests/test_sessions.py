@@ -0,0 +1,24 @@
+def test_refresh_rotates_and_reuse_revokes_session(client, login):
+    rotated = client.post('/auth/token/refresh', json={'refreshToken': login['refreshToken']})
+    assert rotated.status_code == 200
+    fresh = rotated.get_json()
+    assert fresh['refreshToken'] != login['refreshToken']
+
+    # O refresh token antigo de novo: roubo presumido, a sessão inteira cai
+    reused = client.post('/auth/token/refresh', json={'refreshToken': login['refreshToken']})
+    assert reused.status_code == 403
+
+    assert client.post('/auth/token/refresh', json={'refreshToken': fresh['refreshToken']}).status_code == 403
+    response = client.get('/api/goals', headers={'Authorization': f"Bearer {fresh['token']}"})
+    assert response.status_code == 401
+
+
+def test_logout_revokes_access_token(client, login, headers):
+    assert client.get('/api/goals', headers=headers).status_code == 200
+    assert client.post('/auth/logout', headers=headers, json={}).status_code == 200
+    assert client.get('/api/goals', headers=headers).status_code == 401
+
+
+def test_missing_or_invalid_token(client):
+    assert client.get('/api/goals').status_code == 401
+    assert client.get('/api/goals', headers={'Authorization': 'Bearer x'}).status_code == 403
@@ -0,0 +1,53 @@
+import sync
+
+
+def _transaction(client, headers, description):
+    response = client.post('/api/transactions', headers=headers, json={
+        'date': '2024-02-10', 'description': description, 'category': 'c',
+        'type': 'Despesa', 'amount': '10'})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_full_sync_then_incremental_with_tombstones(client, headers):
+    first = _transaction(client, headers, 'primeira')
+    second = _transaction(client, headers, 'segunda')
+
+    full = client.get('/api/sync', headers=headers).get_json()
+    assert full['full'] and not full['has_more']
+    assert {t['id'] for t in full['changes']['transactions']} == {first['id'], second['id']}
+
+    # Nada mudou: página vazia e o mesmo cursor
+    idle = client.get(f"/api/sync?since={full['cursor']}", headers=headers).get_json()
+    assert not idle['full']
+    assert idle['changes']['transactions'] == [] and idle['deleted']['transactions'] == []
+    assert idle['cursor'] == full['cursor']
+
+    assert client.delete(f"/api/transactions/{first['id']}", headers=headers).status_code == 200
+    third = _transaction(client, headers, 'terceira')
+
+    delta = client.get(f"/api/sync?since={full['cursor']}", headers=headers).get_json()
+    assert delta['deleted']['transactions'] == [first['id']]
+    assert [t['id'] for t in delta['changes']['transactions']] == [third['id']]
+
+
+def test_sync_pages_follow_the_cursor(client, headers):
+    created = [_transaction(client, headers, f't{i}')['id'] for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        url = '/api/sync?limit=2' + (f'&since={cursor}' if cursor else '')
+        page = client.get(url, headers=headers).get_json()
+        seen.extend(t['id'] for t in page['changes']['transactions'])
+        cursor = page['cursor']
+        if not page['has_more']:
+            break
+
+    assert sorted(seen) == sorted(created)
+
+
+def test_sync_rejects_bad_cursor_and_limit(client, headers):
+    assert client.get('/api/sync?since=lixo', headers=headers).status_code == 400
+    ahead = sync.encode_sync_cursor(10 ** 6)
+    assert client.get(f'/api/sync?since={ahead}', headers=headers).status_code == 400
+    assert client.get('/api/sync?limit=abc', headers=headers).status_code == 400